@@ -0,0 +1,18 @@
+"""Import benchmarks
+
+Runs ImportClient.import_dataset end to end on generated datasets, fully offline.
+
+The datastore, the GOB model, the logger and the CBS WFS service are replaced by local stand-ins.
+The GOB typesystem, the enrichers, the validators and the contents writer are the real ones,
+so a gobcore bump or a new validator shows up in the results.
+
+Usage:
+
+    cd src
+    python -m benchmarks [--scales 10000 100000 1000000] [--scenarios metingen ...] [--batch-size N] [--workers N]
+"""
+import os
+import tempfile
+
+# The contents files are written to a temporary shared directory, unless a shared directory has been set
+os.environ.setdefault("GOB_SHARED_DIR", tempfile.mkdtemp(prefix="gobimport_benchmarks_"))
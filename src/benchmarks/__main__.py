@@ -0,0 +1,55 @@
+"""
+Run the import benchmarks
+
+Each scenario and scale runs in a fresh process, so that the peak memory usage is measured per run.
+"""
+import argparse
+import multiprocessing
+import queue
+
+from benchmarks.runner import run
+from benchmarks.scenarios import SCENARIOS
+
+
+DEFAULT_SCALES = [10000, 100000, 1000000]
+
+
+def report(result):
+    if 'failure' in result:
+        print(f"{result['scenario']:<20} {result['rows']:>10} rows FAILED\n{result['failure']}")
+        return
+
+    workers = f" + {result['workers']} x {result['peak_worker_memory_mb']:.0f} MB workers" if result['workers'] else ''
+    print(f"{result['scenario']:<20} {result['rows']:>10} rows {result['duration']:>9.1f} s "
+          f"{result['rows_per_second']:>10.0f} rows/s {result['peak_memory_mb']:>8.0f} MB peak{workers}"
+          f"{'  ERRORS: ' + str(result['errors']) if result['errors'] else ''}")
+    for stage, timing in result['stages'].items():
+        print(f"    {stage:<16} wall {timing['wall']:>9.2f} s   cpu {timing['cpu']:>9.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run end to end import benchmarks on generated datasets")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS.keys(), default=list(SCENARIOS.keys()))
+    parser.add_argument('--scales', nargs='+', type=int, default=DEFAULT_SCALES)
+    parser.add_argument('--batch-size', type=int, help="convert rows in batches of this size")
+    parser.add_argument('--workers', type=int, help="convert rows in this number of worker processes")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+
+    for scenario_name in args.scenarios:
+        for n_rows in args.scales:
+            process = context.Process(target=run, args=(scenario_name, n_rows, args.batch_size, args.workers, results))
+            process.start()
+            process.join()
+            try:
+                result = results.get(timeout=1)
+            except queue.Empty:
+                result = {'scenario': scenario_name, 'rows': n_rows,
+                          'failure': f"Benchmark process exited with exit code {process.exitcode}"}
+            report(result)
+
+
+if __name__ == "__main__":
+    main()
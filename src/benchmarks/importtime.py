@@ -0,0 +1,76 @@
+"""
+Import time report
+
+Reports the import cost of each module at the start of the import service.
+The service module is imported in a fresh interpreter with python -X importtime.
+
+Usage:
+
+    cd src
+    python -m benchmarks.importtime [--module gobimport.__main__] [--top 20]
+"""
+import argparse
+import subprocess
+import sys
+
+from collections import defaultdict
+
+
+def measure(module):
+    """
+    Imports the module in a fresh interpreter
+
+    :param module: name of the module to import
+    :return: list of (module, self time, cumulative time) in microseconds, in order of completion
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"Import of {module} failed:\n{process.stderr}")
+
+    timings = []
+    for line in process.stderr.splitlines():
+        # import time:       123 |        456 |   package.module
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        timings.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return timings
+
+
+def report(module, timings, top):
+    """
+    Prints the total import time, the import time per package and the most expensive modules
+
+    :param module:
+    :param timings: as returned by measure()
+    :param top: number of packages and modules to print
+    :return:
+    """
+    total = sum(self_time for _, self_time, _ in timings)
+    print(f"Import of {module}: {total / 1000:.1f} ms, {len(timings)} modules")
+
+    packages = defaultdict(int)
+    for name, self_time, _ in timings:
+        packages[name.split(".")[0]] += self_time
+
+    print("\nPackages (self time)")
+    for name, self_time in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"    {name:<40} {self_time / 1000:>9.1f} ms")
+
+    print("\nModules (cumulative time, including the modules they import)")
+    for name, _, cumulative in sorted(timings, key=lambda timing: -timing[2])[:top]:
+        print(f"    {name:<60} {cumulative / 1000:>9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the import time of each module at service start")
+    parser.add_argument('--module', default="gobimport.__main__", help="the module to import")
+    parser.add_argument('--top', type=int, default=20, help="the number of packages and modules to report")
+    args = parser.parse_args()
+
+    report(args.module, measure(args.module), args.top)
+
+
+if __name__ == "__main__":
+    main()
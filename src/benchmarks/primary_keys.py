@@ -0,0 +1,109 @@
+"""
+Primary keys benchmark
+
+Compares the duplicate detection of PrimaryKeys with a set of the keys, as it was done before.
+The keys are generated one by one, like the source ids of the imported entities, a set keeps the keys alive.
+PrimaryKeys only reads its keys file back to verify the candidates when duplicates are found.
+
+Usage:
+
+    cd src
+    python -m benchmarks.primary_keys [--keys 1000000 10000000] [--duplicates 0 10] [--repeat 3]
+"""
+import argparse
+import time
+import tracemalloc
+
+from gobimport.validator.primary_keys import PrimaryKeys
+
+
+class KeySet:
+    """
+    Duplicate detection with a set of the keys
+    """
+
+    def __init__(self):
+        self.keys = set()
+        self.found = set()
+
+    def add(self, key):
+        if key in self.keys:
+            self.found.add(key)
+        else:
+            self.keys.add(key)
+
+    def duplicates(self):
+        return self.found
+
+
+IMPLEMENTATIONS = {
+    'set': KeySet,
+    'PrimaryKeys': PrimaryKeys,
+}
+
+
+def generate_keys(n_keys, n_duplicates):
+    """
+    Generates source ids, the last keys are duplicates of the first keys
+
+    :param n_keys:
+    :param n_duplicates:
+    :return:
+    """
+    for i in range(n_keys - n_duplicates):
+        yield f"{i + 10 ** 12}.1"
+    for i in range(n_duplicates):
+        yield f"{i + 10 ** 12}.1"
+
+
+def run(implementation, n_keys, n_duplicates):
+    primary_keys = IMPLEMENTATIONS[implementation]()
+    for key in generate_keys(n_keys, n_duplicates):
+        primary_keys.add(key)
+    return primary_keys.duplicates()
+
+
+def measure(implementation, n_keys, n_duplicates, repeat):
+    """
+    Measures the duration and the peak memory of the duplicate detection
+
+    The peak memory is measured in a separate run, tracemalloc slows down the allocations
+
+    :param implementation:
+    :param n_keys:
+    :param n_duplicates:
+    :param repeat: the number of runs, the shortest duration is reported
+    :return: duration in seconds, peak memory in bytes
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        duplicates = run(implementation, n_keys, n_duplicates)
+        durations.append(time.perf_counter() - start)
+        assert len(duplicates) == n_duplicates, f"{implementation} found {len(duplicates)} duplicates"
+
+    tracemalloc.start()
+    run(implementation, n_keys, n_duplicates)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(durations), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the duplicate detection of primary keys")
+    parser.add_argument('--keys', type=int, nargs='+', default=[1000000], help="the numbers of keys")
+    parser.add_argument('--duplicates', type=int, nargs='+', default=[0, 10], help="the numbers of duplicate keys")
+    parser.add_argument('--repeat', type=int, default=3, help="the number of runs per measurement")
+    args = parser.parse_args()
+
+    for n_keys in args.keys:
+        for n_duplicates in args.duplicates:
+            for implementation in IMPLEMENTATIONS:
+                duration, peak = measure(implementation, n_keys, n_duplicates, args.repeat)
+                print(f"{implementation:<12} {n_keys:>10} keys {n_duplicates:>6} duplicates {duration:>8.2f} s "
+                      f"{n_keys / duration:>12.0f} keys/s {peak / 2 ** 20:>8.1f} MB peak "
+                      f"{peak / n_keys:>6.1f} bytes/key")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark runner
+
+Imports a generated dataset for a scenario, using the local stand-ins
+"""
+import os
+import resource
+import time
+import traceback
+
+from benchmarks.scenarios import SCENARIOS, cbs_features, get_dataset
+
+
+def run(scenario_name, n_rows, batch_size, workers, results):
+    """
+    Import a generated dataset of n_rows rows for the given scenario
+
+    This function runs in its own process
+
+    :return: None, the result is put on the results queue
+    """
+    try:
+        results.put(_run(scenario_name, n_rows, batch_size, workers))
+    except Exception:
+        results.put({'scenario': scenario_name, 'rows': n_rows, 'failure': traceback.format_exc()})
+
+
+def _run(scenario_name, n_rows, batch_size, workers):
+    from gobcore.enum import ImportMode
+    from gobimport.import_client import ImportClient
+    from benchmarks import standins
+
+    scenario = SCENARIOS[scenario_name]
+    collections = {scenario.catalogue: {scenario.entity: scenario.collection}}
+    logger = standins.StandinLogger()
+
+    with standins.install(collections, lambda: scenario.generate_rows(n_rows), cbs_features(), logger):
+        start = time.perf_counter()
+        import_client = ImportClient(dataset=get_dataset(scenario, batch_size, workers),
+                                     msg={'header': {'timings': True}}, logger=logger, mode=ImportMode.FULL)
+        result = import_client.import_dataset()
+        duration = time.perf_counter() - start
+
+    os.remove(result['contents_ref'])
+
+    # ru_maxrss is in kilobytes on Linux
+    # The worker processes have ended, RUSAGE_CHILDREN holds the peak memory of the largest worker
+    peak_memory_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    peak_worker_memory_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024 if workers else 0
+
+    return {
+        'scenario': scenario_name,
+        'rows': result['summary']['num_records'],
+        'duration': duration,
+        'rows_per_second': result['summary']['num_records'] / duration,
+        'peak_memory_mb': peak_memory_mb,
+        'peak_worker_memory_mb': peak_worker_memory_mb,
+        'workers': workers or 0,
+        'errors': logger.counts['error'],
+        'stages': result['summary']['timings']['stages'],
+    }
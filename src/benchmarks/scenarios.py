@@ -0,0 +1,314 @@
+"""
+Benchmark scenarios
+
+Each scenario defines a synthetic collection: its model, its import definition and a generator for its rows.
+The rows are generated deterministically and lazily, so large scales do not inflate the memory usage.
+"""
+import datetime
+import random
+
+from collections import namedtuple
+
+from shapely.geometry import Point
+
+
+Scenario = namedtuple('Scenario', ['catalogue', 'entity', 'application', 'collection', 'mapping', 'generate_rows'])
+
+START_DATE = datetime.date(2000, 1, 1)
+
+
+def _fields(**types):
+    return {name: {'type': type} for name, type in types.items()}
+
+
+def _mapping(**source_mappings):
+    return {name: source_mapping if isinstance(source_mapping, dict) and 'source_mapping' in source_mapping
+            else {'source_mapping': source_mapping} for name, source_mapping in source_mappings.items()}
+
+
+def _date(days):
+    return START_DATE + datetime.timedelta(days=days)
+
+
+# Metingen, enriched by the MeetboutenEnricher
+
+METINGEN_PER_MEETBOUT = 20
+
+
+def _generate_metingen(n_rows):
+    rnd = random.Random(0)
+    for i in range(n_rows):
+        meetbout, meting = divmod(i, METINGEN_PER_MEETBOUT)
+        yield {
+            'identificatie': str(i + 1),
+            'hoort_bij_meetbout': str(10000000 + meetbout),
+            'datum': _date(meting * 30).strftime('%Y-%m-%d'),
+            'hoogte_tov_nap': round(1.0 - 0.0005 * meting + rnd.uniform(-0.0002, 0.0002), 4),
+            'publiceerbaar': None,
+        }
+
+
+METINGEN = Scenario(
+    catalogue='meetbouten',
+    entity='metingen',
+    application='Grondslag',
+    collection={
+        'entity_id': 'identificatie',
+        'all_fields': _fields(identificatie='GOB.String',
+                              hoort_bij_meetbout='GOB.Reference',
+                              datum='GOB.Date',
+                              hoogte_tov_nap='GOB.Decimal',
+                              type_meting='GOB.String',
+                              hoeveelste_meting='GOB.Integer',
+                              aantal_dagen='GOB.Integer',
+                              zakking='GOB.Decimal',
+                              zakking_cumulatief='GOB.Decimal',
+                              zakkingssnelheid='GOB.Decimal',
+                              publiceerbaar='GOB.Boolean'),
+    },
+    mapping=_mapping(identificatie='identificatie',
+                     hoort_bij_meetbout={'source_mapping': {'bronwaarde': 'hoort_bij_meetbout'}},
+                     datum={'source_mapping': 'datum', 'format': '%Y-%m-%d'},
+                     hoogte_tov_nap='hoogte_tov_nap',
+                     type_meting='type_meting',
+                     hoeveelste_meting='hoeveelste_meting',
+                     aantal_dagen='aantal_dagen',
+                     zakking='zakking',
+                     zakking_cumulatief='zakking_cumulatief',
+                     zakkingssnelheid='zakkingssnelheid',
+                     publiceerbaar='publiceerbaar'),
+    generate_rows=_generate_metingen,
+)
+
+
+# Verblijfsobjecten, enriched by the BAGEnricher and validated by the BAGValidator and the StateValidator
+
+def _generate_verblijfsobjecten(n_rows):
+    for i in range(n_rows):
+        woonfunctie = i % 4 != 0
+        yield {
+            'identificatie': f"0363010{i:09d}",
+            'volgnummer': 1,
+            'begin_geldigheid': _date(i % 5000),
+            'eind_geldigheid': None,
+            'gebruiksdoel_code': ['1010' if woonfunctie else '1080'],
+            'gebruiksdoel_omschrijving': ['woonfunctie' if woonfunctie else 'kantoorfunctie'],
+            'woonfunctie_code': '2075' if woonfunctie else None,
+            'woonfunctie_omschrijving': 'Complex, onzelfstandige woning' if woonfunctie else None,
+            'aantal_eenheden_complex': 4 if woonfunctie else None,
+            'fng_code': 501,
+            'pandidentificatie': f"0363100{i // 10:09d};0363100{i // 10 + 1:09d}",
+            'toegang': 'Hoofdtoegang',
+            'aantal_bouwlagen': 3,
+            'verdieping_toegang': 0,
+            'redenopvoer_code': '1',
+            'redenopvoer_omschrijving': 'Nieuwbouw',
+        }
+
+
+VERBLIJFSOBJECTEN = Scenario(
+    catalogue='bag',
+    entity='verblijfsobjecten',
+    application='Neuron',
+    collection={
+        'entity_id': 'identificatie',
+        'has_states': True,
+        'all_fields': _fields(identificatie='GOB.String',
+                              volgnummer='GOB.Integer',
+                              begin_geldigheid='GOB.Date',
+                              eind_geldigheid='GOB.Date',
+                              gebruiksdoel='GOB.JSON',
+                              gebruiksdoel_woonfunctie='GOB.JSON',
+                              aantal_eenheden_complex='GOB.Integer',
+                              financieringscode='GOB.JSON',
+                              ligt_in_panden='GOB.ManyReference',
+                              toegang='GOB.String',
+                              aantal_bouwlagen='GOB.Integer',
+                              verdieping_toegang='GOB.Integer',
+                              redenopvoer='GOB.JSON'),
+    },
+    mapping=_mapping(identificatie='identificatie',
+                     volgnummer='volgnummer',
+                     begin_geldigheid='begin_geldigheid',
+                     eind_geldigheid='eind_geldigheid',
+                     gebruiksdoel={'source_mapping': {'code': 'gebruiksdoel_code',
+                                                      'omschrijving': 'gebruiksdoel_omschrijving'},
+                                   'force_list': True},
+                     gebruiksdoel_woonfunctie={'source_mapping': {'code': 'woonfunctie_code',
+                                                                  'omschrijving': 'woonfunctie_omschrijving'}},
+                     aantal_eenheden_complex='aantal_eenheden_complex',
+                     financieringscode={'source_mapping': {'code': 'fng_code', 'omschrijving': 'fng_omschrijving'}},
+                     ligt_in_panden={'source_mapping': {'bronwaarde': 'pandidentificatie'}},
+                     toegang='toegang',
+                     aantal_bouwlagen='aantal_bouwlagen',
+                     verdieping_toegang='verdieping_toegang',
+                     redenopvoer={'source_mapping': {'code': 'redenopvoer_code',
+                                                     'omschrijving': 'redenopvoer_omschrijving'}}),
+    generate_rows=_generate_verblijfsobjecten,
+)
+
+
+# Buurten, enriched by the GebiedenEnricher and validated by the GebiedenValidator and the StateValidator
+
+BUURT_SIZE = 100
+BUURTEN_PER_ROW = 200
+BUURT_ORIGIN = (110000, 475000)
+CBS_FEATURES = 500
+
+
+def _buurt_cell(i):
+    row, column = divmod(i, BUURTEN_PER_ROW)
+    return BUURT_ORIGIN[0] + column * BUURT_SIZE, BUURT_ORIGIN[1] + row * BUURT_SIZE
+
+
+def _buurt_geometry(i):
+    x, y = _buurt_cell(i)
+    x2, y2 = x + BUURT_SIZE, y + BUURT_SIZE
+    return f"POLYGON (({x} {y}, {x2} {y}, {x2} {y2}, {x} {y2}, {x} {y}))"
+
+
+def cbs_features():
+    """
+    CBS features at the center of the first buurten
+
+    :return: list of CBS features, as returned by the CBS WFS service
+    """
+    return [{
+        'geometrie': Point(_buurt_cell(i)[0] + BUURT_SIZE / 2, _buurt_cell(i)[1] + BUURT_SIZE / 2),
+        'code': f"BU0363{i:04d}",
+        'naam': f"Buurt {i}",
+    } for i in range(CBS_FEATURES)]
+
+
+def _generate_buurten(n_rows):
+    for i in range(n_rows):
+        yield {
+            'identificatie': f"03630000{i:08d}",
+            'volgnummer': 1,
+            'code': f"A{i % 100:02d}{chr(ord('a') + i % 26)}",
+            'naam': f"Buurt {i}",
+            'geometrie': _buurt_geometry(i),
+            'begin_geldigheid': _date(i % 5000),
+            'eind_geldigheid': None,
+            'documentdatum': _date(i % 5000),
+            'registratiedatum': datetime.datetime.combine(_date(i % 5000), datetime.time(12)),
+        }
+
+
+BUURTEN = Scenario(
+    catalogue='gebieden',
+    entity='buurten',
+    application='DGDialog',
+    collection={
+        'entity_id': 'identificatie',
+        'has_states': True,
+        'all_fields': _fields(identificatie='GOB.String',
+                              volgnummer='GOB.Integer',
+                              code='GOB.String',
+                              naam='GOB.String',
+                              cbs_code='GOB.String',
+                              geometrie='GOB.Geo.Polygon',
+                              begin_geldigheid='GOB.Date',
+                              eind_geldigheid='GOB.Date',
+                              documentdatum='GOB.Date',
+                              registratiedatum='GOB.DateTime'),
+    },
+    mapping=_mapping(identificatie='identificatie',
+                     volgnummer='volgnummer',
+                     code='code',
+                     naam='naam',
+                     cbs_code='cbs_code',
+                     geometrie='geometrie',
+                     begin_geldigheid='begin_geldigheid',
+                     eind_geldigheid='eind_geldigheid',
+                     documentdatum='documentdatum',
+                     registratiedatum='registratiedatum'),
+    generate_rows=_generate_buurten,
+)
+
+
+# Kadastrale objecten with several states per object, validated by the StateValidator
+
+STATES_PER_OBJECT = 5
+
+
+def _generate_kadastraleobjecten(n_rows):
+    for i in range(n_rows):
+        object, state = divmod(i, STATES_PER_OBJECT)
+        last_state = state == STATES_PER_OBJECT - 1
+        yield {
+            'identificatie': f"NL.IMKAD.KadastraalObject.{object:012d}",
+            'volgnummer': state + 1,
+            'begin_geldigheid': _date(state * 365),
+            'eind_geldigheid': None if last_state else _date((state + 1) * 365),
+            'kadastrale_gemeente': 'ASD15',
+            'perceelnummer': object % 10000,
+            'grootte': 100 + object % 900,
+            'koopsom': f"{100000 + (i * 7919) % 900000}.00",
+        }
+
+
+KADASTRALEOBJECTEN = Scenario(
+    catalogue='brk',
+    entity='kadastraleobjecten',
+    application='Neuron',
+    collection={
+        'entity_id': 'identificatie',
+        'has_states': True,
+        'all_fields': _fields(identificatie='GOB.String',
+                              volgnummer='GOB.Integer',
+                              begin_geldigheid='GOB.Date',
+                              eind_geldigheid='GOB.Date',
+                              kadastrale_gemeente='GOB.String',
+                              perceelnummer='GOB.Integer',
+                              grootte='GOB.Integer',
+                              koopsom='GOB.Decimal'),
+    },
+    mapping=_mapping(identificatie='identificatie',
+                     volgnummer='volgnummer',
+                     begin_geldigheid='begin_geldigheid',
+                     eind_geldigheid='eind_geldigheid',
+                     kadastrale_gemeente='kadastrale_gemeente',
+                     perceelnummer='perceelnummer',
+                     grootte='grootte',
+                     koopsom='koopsom'),
+    generate_rows=_generate_kadastraleobjecten,
+)
+
+
+SCENARIOS = {
+    'metingen': METINGEN,
+    'verblijfsobjecten': VERBLIJFSOBJECTEN,
+    'buurten': BUURTEN,
+    'kadastraleobjecten': KADASTRALEOBJECTEN,
+}
+
+
+def get_dataset(scenario, batch_size=None, workers=None):
+    """
+    Returns the import definition of a scenario
+
+    :param scenario:
+    :param batch_size: optional batch size for batched conversion
+    :param workers: optional number of worker processes for parallel conversion
+    :return:
+    """
+    dataset = {
+        'version': '0.1',
+        'catalogue': scenario.catalogue,
+        'entity': scenario.entity,
+        'source': {
+            'name': f"benchmark_{scenario.entity}",
+            'application': scenario.application,
+            'entity_id': 'identificatie',
+            'type': 'database',
+            'query': [f"SELECT * FROM {scenario.entity}"],
+            'application_config': {'type': 'benchmark'},
+        },
+        'gob_mapping': scenario.mapping,
+    }
+    if batch_size:
+        dataset['batch_size'] = batch_size
+    if workers:
+        dataset['workers'] = workers
+    return dataset
@@ -0,0 +1,96 @@
+"""
+Local stand-ins for the external dependencies of an import
+
+The stand-ins are installed by patching the names that the gobimport modules have imported.
+"""
+import sys
+
+from collections import Counter
+from contextlib import ExitStack
+from importlib import import_module
+from unittest.mock import patch
+
+from gobcore.model.metadata import FIELD
+
+
+class StandinDatastore:
+    """Datastore that yields generated rows instead of querying a source"""
+
+    user = "benchmark"
+
+    def __init__(self, generate_rows):
+        self.generate_rows = generate_rows
+
+    def connect(self):
+        pass
+
+    def query(self, query):
+        yield from self.generate_rows()
+
+
+class StandinModel:
+    """GOB model that only knows the collections of the benchmark scenarios"""
+
+    collections = {}
+
+    def get_collection(self, catalogue, entity):
+        return self.collections[catalogue][entity]
+
+    def has_states(self, catalogue, entity):
+        return self.get_collection(catalogue, entity).get('has_states', False)
+
+    def get_source_id(self, entity, input_spec):
+        source_id = str(entity[input_spec['source']['entity_id']])
+        if self.has_states(input_spec['catalogue'], input_spec['entity']):
+            seqnr_field = input_spec['gob_mapping'].get(FIELD.SEQNR, {}).get('source_mapping', FIELD.SEQNR)
+            source_id = f"{source_id}.{entity[seqnr_field]}"
+        return source_id
+
+
+class StandinLogger:
+    """Logger that only counts the messages per level"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def __getattr__(self, level):
+        def log(*args, **kwargs):
+            self.counts[level] += 1
+        return log
+
+    def get_summary(self):
+        return {'log_counts': dict(self.counts)}
+
+
+def install(collections, generate_rows, cbs_features, logger):
+    """
+    Install the stand-ins in all loaded gobimport modules
+
+    :param collections: the model collections, by catalogue and entity
+    :param generate_rows: function that generates the rows of the dataset
+    :param cbs_features: the CBS features that are used by the gebieden enricher
+    :param logger: the logger stand-in
+    :return: ExitStack that removes the stand-ins when closed
+    """
+    StandinModel.collections = collections
+
+    # The enrichers and entity validators are imported on first use, import them now to patch them
+    from gobimport.enricher import ENRICHERS
+    from gobimport.entity_validator import VALIDATORS
+    for module_name, _, _ in ENRICHERS + VALIDATORS:
+        import_module(module_name)
+
+    stack = ExitStack()
+    for name, module in list(sys.modules.items()):
+        if not name.startswith("gobimport"):
+            continue
+        if hasattr(module, "GOBModel"):
+            stack.enter_context(patch.object(module, "GOBModel", StandinModel))
+        if hasattr(module, "logger"):
+            stack.enter_context(patch.object(module, "logger", logger))
+
+    stack.enter_context(patch("gobimport.reader.DatastoreFactory.get_datastore",
+                              lambda config, read_config: StandinDatastore(generate_rows)))
+    stack.enter_context(patch("gobimport.enricher.gebieden._get_cbs_features",
+                              lambda url, type: cbs_features))
+    return stack
@@ -2,7 +2,6 @@
 
 This component imports data sources
 """
-from gobconfig.import_.import_config import get_import_definition
 from gobcore.enum import ImportMode
 from gobcore.exceptions import GOBException
 from gobcore.logging.logger import logger
@@ -11,6 +10,7 @@ from gobcore.message_broker.config import IMPORT_OBJECT_QUEUE, IMPORT_OBJECT_RES
 from gobcore.message_broker.messagedriven_service import messagedriven_service
 
 from gobimport.converter import MappinglessConverterAdapter
+from gobimport.definitions import get_import_definition, warm
 from gobimport.import_client import ImportClient
 
 
@@ -102,6 +102,8 @@ SERVICEDEFINITION = {
 
 def init():
     if __name__ == "__main__":
+        # Resolve the import definitions before the first message arrives
+        warm()
         messagedriven_service(SERVICEDEFINITION, "Import")
 
 
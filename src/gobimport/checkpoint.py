@@ -0,0 +1,124 @@
+"""
+Checkpoints
+
+A long running import can save a checkpoint every N rows.
+When the import fails, a retry of the same import message resumes from the last checkpoint.
+
+A checkpoint holds the number of rows that have been processed, the position in the contents file
+and the state of the stateful steps of the import (primary key and entity validation, enrichment and merging).
+On resume the processed rows are skipped and the contents file is truncated at the saved position.
+The source should return the rows in the same order, the source id of the last processed row is checked on resume.
+
+Each checkpoint holds the complete state, so checkpoints are limited to imports whose state does not
+grow with the collection: imports without a merge and without state validation. The primary keys are
+kept in a separate file (keys_path).
+"""
+import os
+import pickle
+
+from gobimport.writer import FileContentsWriter
+
+
+class ResumableContentsWriter(FileContentsWriter):
+    """
+    Contents writer that can continue the contents file of a checkpoint
+    """
+
+    def __init__(self, position=None):
+        """
+        :param position: the position in a contents file to continue, as returned by position()
+        """
+        super().__init__()
+        self.resume_position = position
+
+    def open(self):
+        if self.resume_position is None:
+            return super().open()
+
+        self.filename, offset, self.is_empty = self.resume_position
+        self.contents = open(self.filename, "r+")
+        self.contents.truncate(offset)
+        self.contents.seek(offset)
+
+    def position(self):
+        """
+        Returns the current position in the contents file
+
+        :return: (filename, offset, empty)
+        """
+        self.contents.flush()
+        return self.filename, self.contents.tell(), self.is_empty
+
+
+class Checkpointer:
+
+    def __init__(self, path, every: int, process_id):
+        """
+        :param path: path of the checkpoint file
+        :param every: number of rows between two checkpoints
+        :param process_id: identification of the import, only checkpoints of the same import are resumed
+        """
+        self.path = path
+        self.keys_path = f"{path}.keys"
+        self.every = every
+        self.process_id = process_id
+        # Number of processed rows and source id of the last processed row at the last checkpoint
+        self.last = 0
+        self.last_source_id = None
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def load(self):
+        """
+        Loads the last checkpoint of the import
+
+        :return: the state of the checkpoint, or None if no checkpoint of the import exists
+        """
+        try:
+            with open(self.path, "rb") as file:
+                checkpoint = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        if checkpoint['process_id'] != self.process_id:
+            return None
+
+        self.last = checkpoint['n_rows']
+        self.last_source_id = checkpoint['source_id']
+        return checkpoint['state']
+
+    def due(self, n_rows):
+        """
+        Tells whether a checkpoint should be saved
+
+        :param n_rows: the number of rows that have been processed
+        :return:
+        """
+        return n_rows - self.last >= self.every
+
+    def save(self, n_rows, state, source_id=None):
+        """
+        Saves a checkpoint, the previous checkpoint is replaced atomically
+
+        :param n_rows: the number of rows that have been processed
+        :param state: the state of the import
+        :param source_id: the source id of the last processed row, to check the order of the rows on resume
+        :return:
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump({'process_id': self.process_id, 'n_rows': n_rows, 'source_id': source_id, 'state': state},
+                        file, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        self.last = n_rows
+        self.last_source_id = source_id
+
+    def remove(self):
+        """
+        Removes the checkpoint after a successful import
+
+        :return:
+        """
+        for path in [self.path, self.keys_path]:
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,91 @@
+"""
+Compression
+
+The contents files of an import can be compressed while they are written.
+The codec and level are set in the dataset or in the message header, e.g.:
+
+    "compression": "gzip"
+    "compression": {"codec": "gzip", "level": 3}
+
+The codec is recorded in the header of the result message, so that consumers can decompress the contents.
+"""
+import bz2
+import gzip
+import lzma
+
+from gobcore.exceptions import GOBException
+
+from gobimport.writer import FileContentsWriter
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    # The zstd codec is not available
+    zstandard = None
+
+
+def _open_zstd(filename, mode, level):
+    if zstandard is None:
+        raise GOBException("Compression codec zstd requires the zstandard package")
+    return zstandard.open(filename, mode, cctx=zstandard.ZstdCompressor(level=level), encoding="utf-8")
+
+
+# Codecs: (function to open a file, default level)
+CODECS = {
+    'gzip': (lambda filename, mode, level: gzip.open(filename, mode, compresslevel=level, encoding="utf-8"), 6),
+    'bz2': (lambda filename, mode, level: bz2.open(filename, mode, compresslevel=level, encoding="utf-8"), 9),
+    'lzma': (lambda filename, mode, level: lzma.open(filename, mode, preset=level if "w" in mode else None,
+                                                     encoding="utf-8"), 6),
+    'zstd': (_open_zstd, 3),
+}
+
+
+def get_compression(*specs):
+    """
+    Returns the compression of the last spec that has been set
+
+    :param specs: compression specs, either a codec or a dict with a codec and an optional level
+    :return: (codec, level) or None if no compression has been set
+    """
+    compression = None
+    for spec in specs:
+        if not spec:
+            continue
+        spec = {'codec': spec} if isinstance(spec, str) else spec
+        codec = spec.get('codec')
+        if codec not in CODECS:
+            raise GOBException(f"Unknown compression codec {codec}, expected one of {', '.join(CODECS)}")
+        compression = codec, spec.get('level', CODECS[codec][1])
+    return compression
+
+
+def open_compressed(filename, codec, mode="rt", level=None):
+    """
+    Opens a compressed text file
+
+    :param filename:
+    :param codec:
+    :param mode: "rt" to read, "wt" to write
+    :param level: compression level, the default level of the codec if not set
+    :return:
+    """
+    open_file, default_level = CODECS[codec]
+    return open_file(filename, mode, default_level if level is None else level)
+
+
+class CompressedContentsWriter(FileContentsWriter):
+    """
+    Contents writer that compresses the contents file
+    """
+
+    def __init__(self, codec, level=None):
+        """
+        :param codec:
+        :param level: compression level, the default level of the codec if not set
+        """
+        super().__init__()
+        self.codec = codec
+        self.level = level
+
+    def open_file(self):
+        return open_compressed(self.filename, self.codec, "wt", self.level)
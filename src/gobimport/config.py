@@ -1,3 +1,24 @@
 import os
 
 CONTAINER_BASE = os.getenv("CONTAINER_BASE", "acceptatie")
+
+# Cache for the CBS features that are used to enrich gebieden, disabled when no shared dir is available
+GOB_SHARED_DIR = os.getenv("GOB_SHARED_DIR")
+CBS_CACHE_DIR = os.getenv("CBS_CACHE_DIR", os.path.join(GOB_SHARED_DIR, "cbs_cache") if GOB_SHARED_DIR else None)
+# Number of seconds that cached CBS features are used without revalidation
+CBS_CACHE_TTL = int(os.getenv("CBS_CACHE_TTL", 24 * 60 * 60))
+# In offline mode the CBS features are only read from the cache or from the fixture dir (cbs_<type>.json)
+CBS_OFFLINE = os.getenv("CBS_OFFLINE", "").lower() in ("1", "true", "yes")
+CBS_FIXTURE_DIR = os.getenv("CBS_FIXTURE_DIR")
+
+# Store of the content hashes of the previous import of each collection, for delta imports
+DELTA_DIR = os.getenv("DELTA_DIR", os.path.join(GOB_SHARED_DIR, "delta") if GOB_SHARED_DIR else None)
+
+# Checkpoints of running imports, to resume failed imports
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join(GOB_SHARED_DIR, "checkpoints") if GOB_SHARED_DIR else None)
+
+# Profiles of imports that have been profiled on demand
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(GOB_SHARED_DIR, "profiles") if GOB_SHARED_DIR else None)
+
+# Number of seconds between two checks for changed import definition files
+DEFINITIONS_CHECK_INTERVAL = int(os.getenv("DEFINITIONS_CHECK_INTERVAL", 10))
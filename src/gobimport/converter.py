@@ -8,6 +8,8 @@ Todo:
 """
 import re
 
+from contextlib import contextmanager
+from contextvars import ContextVar
 from decimal import Decimal
 from gobcore.typesystem import get_value, get_gob_type_from_info
 from gobcore.model import GOBModel
@@ -15,12 +17,18 @@ from gobcore.model.metadata import FIELD
 from gobcore.exceptions import GOBException, GOBTypeException
 from gobcore.logging.logger import logger
 
+from gobimport.definitions import get_collection
+
+
+# The extraction errors are collected instead of logged while a list is set, see collect_extract_errors
+_extract_errors = ContextVar('extract_errors', default=None)
+
 
 class Converter:
 
     def __init__(self, catalog_name, entity_name, input_spec):
         self.gob_model = GOBModel()
-        collection = self.gob_model.get_collection(catalog_name, entity_name)
+        collection = get_collection(catalog_name, entity_name)
 
         self.input_spec = input_spec
         self.mapping = input_spec['gob_mapping']
@@ -33,6 +41,13 @@ class Converter:
         # Extract the fields that have a source mapping defined
         self.extract_fields = [field for field, meta in self.mapping.items() if 'source_mapping' in meta]
 
+        # Compile the mapping once into a plan of one extractor per field
+        self.plan = [(field, _compile_field(field,
+                                            self.mapping[field],
+                                            self.fields[field],
+                                            self.entity_id,
+                                            self.seqnr)) for field in self.extract_fields]
+
     def convert(self, row):
         """
         Convert the given data using the definitions in the dataset
@@ -42,12 +57,7 @@ class Converter:
         """
 
         # extract source fields into entity
-        entity = {field: _extract_field(row,
-                                        field,
-                                        self.mapping[field],
-                                        self.fields[field],
-                                        self.entity_id,
-                                        self.seqnr) for field in self.extract_fields}
+        entity = {field: extract(row) for field, extract in self.plan}
 
         # Convert GOBTypes to python objects
         entity = get_value(entity)
@@ -57,6 +67,32 @@ class Converter:
 
         return entity
 
+    def convert_batch(self, rows):
+        """
+        Convert a batch of rows field by field (column-wise)
+
+        Each compiled field extractor is run over the whole batch before the entities are assembled.
+        The result is equal to calling convert for every row.
+
+        :param rows: list of rows in external format
+        :return: list of entities in GOB format, in the order of the rows
+        """
+        columns = [(field, [extract(row) for row in rows]) for field, extract in self.plan]
+
+        get_source_id = self.gob_model.get_source_id
+        input_spec = self.input_spec
+
+        entities = []
+        for idx, row in enumerate(rows):
+            # Convert GOBTypes to python objects
+            entity = get_value({field: values[idx] for field, values in columns})
+
+            # add explicit source id, as string, to entity
+            entity['_source_id'] = get_source_id(entity=row, input_spec=input_spec)
+
+            entities.append(entity)
+        return entities
+
 
 class MappinglessConverterAdapter:
     """Adapter for the Converter. Generates an input specification (mapping) where input row attributes are
@@ -71,7 +107,7 @@ class MappinglessConverterAdapter:
         :param entity_name:
         :param entity_id_attr: The name of the attribute that serves as the entity_id
         """
-        self.collection = GOBModel().get_collection(catalogue_name, entity_name)
+        self.collection = get_collection(catalogue_name, entity_name)
         self.fields = self.collection['fields']
 
         mapping = {
@@ -97,17 +133,45 @@ class MappinglessConverterAdapter:
 
 
 def _apply_filters(raw_value, filters):
-    value = raw_value
-    for filter in filters:
-        name = filter[0]
-        args = filter[1:]
-        if name == "re.sub":
-            value = re.sub(args[0], args[1], value)
-        elif name == "upper":
-            value = value.upper()
-        else:
-            raise GOBException(f"Unknown function {name}")
-    return value
+    return _compile_filters(filters)(raw_value)
+
+
+def _compile_filter(filter):
+    """
+    Compiles a single filter specification into a function of the value
+
+    Unknown filters are only reported when they are applied
+
+    :param filter: filter name followed by its arguments, e.g. ["re.sub", "a", "b"]
+    :return: a function that applies the filter to a value
+    """
+    name = filter[0]
+    args = filter[1:]
+    if name == "re.sub":
+        pattern = re.compile(args[0])
+        return lambda value: pattern.sub(args[1], value)
+    elif name == "upper":
+        return lambda value: value.upper()
+
+    def unknown_filter(value):
+        raise GOBException(f"Unknown function {name}")
+    return unknown_filter
+
+
+def _compile_filters(filters):
+    """
+    Compiles a list of filter specifications into one function of the value
+
+    :param filters: list of filter specifications
+    :return: a function that applies all filters, in order, to a value
+    """
+    compiled_filters = [_compile_filter(filter) for filter in filters]
+
+    def apply_filters(value):
+        for compiled_filter in compiled_filters:
+            value = compiled_filter(value)
+        return value
+    return apply_filters
 
 
 def _is_literal(field):
@@ -182,6 +246,29 @@ def _get_value(row, field):
         return row.get(field)
 
 
+def _compile_value(field):
+    """
+    Compiles the retrieval of a field value from a row
+
+    The literal and object reference tests are done once, the returned function only does the lookup
+
+    :param field: field name
+    :return: a function that returns the value of the specified field in a row
+    """
+    if not isinstance(field, str) or not field:
+        return lambda row: _get_value(row, field)
+    elif _is_literal(field):
+        # Literal value
+        value = _literal_value(field)
+        return lambda row: value
+    elif _is_object_reference(field):
+        column, _ = _split_object_reference(field)
+        return lambda row: row.get(column)
+    else:
+        # Source value
+        return lambda row: row.get(field)
+
+
 def _json_safe_value(value):
     """
     Transforms value to a type that is safe for JSON serialisation.
@@ -194,7 +281,7 @@ def _json_safe_value(value):
     return value
 
 
-def _extract_references(row, field_source, field_type, force_list=False):   # noqa: C901
+def _extract_references(row, field_source, field_type, force_list=False):
     """
     Creates the dictionary as defined in field_source.
     Returns a list of dictionaries if field_type is GOB.ManyReference or force_list is True
@@ -205,20 +292,56 @@ def _extract_references(row, field_source, field_type, force_list=False):   # no
     :param force_list: Force return of list of dicts, even if not a GOB.ManyReference
     :return:
     """
-    FORMAT = "format"  # Optional parameter for ManyReference single string values
+    return _compile_references(field_source, field_type, force_list)(row)
+
+
+def _compile_references(field_source, field_type, force_list=False):
+    """
+    Compiles the extraction of the dictionary (or list of dictionaries) as defined in field_source
+
+    :param field_source: The source_mapping
+    :param field_type: The field_type as string (GOB.xxxx)
+    :param force_list: Force return of list of dicts, even if not a GOB.ManyReference
+    :return: a function that returns the reference(s) for a row
+    """
     if field_type == 'GOB.ManyReference' or force_list:
+        return _compile_many_references(field_source)
+    else:
+        return _compile_single_reference(field_source)
+
+
+def _compile_attribute_sources(field_source):
+    """
+    Compiles the source mappings of the attributes of a reference
+
+    :param field_source: The source_mapping
+    :return: list of (attribute, is literal, value function, referenced attribute or None)
+    """
+    attribute_sources = []
+    for attribute, source_mapping in field_source.items():
+        attr = _split_object_reference(source_mapping)[1] if _is_object_reference(source_mapping) else None
+        attribute_sources.append((attribute, _is_literal(source_mapping), _compile_value(source_mapping), attr))
+    return attribute_sources
+
+
+def _compile_many_references(field_source):  # noqa: C901
+    FORMAT = "format"  # Optional parameter for ManyReference single string values
+
+    # Do not process format specifications
+    attribute_sources = _compile_attribute_sources({k: v for k, v in field_source.items() if k not in [FORMAT]})
+
+    # If a format has been specified then apply the format
+    # Currently only the split format is recognized
+    format = field_source.get(FORMAT, {}).get('split')
+
+    def extract(row):
         value = []
         # For each attribute in the source mapping, loop through all values and add them to the correct dict
-        for attribute, source_mapping in field_source.items():
-            if attribute in [FORMAT]:
-                # Do not process format specifications
-                continue
-            source_value = _get_value(row, source_mapping)
-            if _is_literal(source_mapping):
+        for attribute, is_literal, get_source_value, attr in attribute_sources:
+            source_value = get_source_value(row)
+            if is_literal:
                 value.append({attribute: source_value})
-            elif _is_object_reference(source_mapping) and source_value:
-                column, attr = _split_object_reference(source_mapping)
-
+            elif attr is not None and source_value:
                 for idx, v in enumerate(source_value):
                     if not isinstance(v, dict):
                         raise GOBException("References should be dicts when referencing by attribute")
@@ -229,9 +352,6 @@ def _extract_references(row, field_source, field_type, force_list=False):   # no
                         value.append({attribute: v[attr], **v})
             elif isinstance(source_value, str):
                 # Accept a single string as Many Reference
-                # If a format has been specified then apply the format
-                # Currently only the split format is recognized
-                format = field_source.get(FORMAT, {}).get('split')
                 source_values = source_value.split(format) if format else [source_value]
                 for v in sorted(list(set(source_values))):
                     # unique values
@@ -243,18 +363,24 @@ def _extract_references(row, field_source, field_type, force_list=False):   # no
                         value[idx].update({attribute: v})
                     except IndexError:
                         value.append({attribute: v})
-    else:
+        return value
+
+    return extract
+
+
+def _compile_single_reference(field_source):
+    attribute_sources = _compile_attribute_sources(field_source)
+
+    def extract(row):
         value = {}
 
-        for attribute, source_mapping in field_source.items():
-            source_value = _json_safe_value(_get_value(row, source_mapping))
+        for attribute, _, get_source_value, attr in attribute_sources:
+            source_value = _json_safe_value(get_source_value(row))
 
-            if _is_object_reference(source_mapping) and source_value:
+            if attr is not None and source_value:
                 if not value:
                     value = {**source_value}
 
-                column, attr = _split_object_reference(source_mapping)
-
                 if not isinstance(source_value, dict):
                     raise GOBException("References should be dicts when referencing by attribute")
 
@@ -262,7 +388,9 @@ def _extract_references(row, field_source, field_type, force_list=False):   # no
             else:
                 value[attribute] = source_value
 
-    return value
+        return value
+
+    return extract
 
 
 def _clean_references(value):
@@ -313,6 +441,21 @@ def _extract_field(row, field, metadata, typeinfo, entity_id_field=None, seqnr_f
     :param typeinfo: the GOB model info
     :return: the string value of a field specified by the field's metadata, based on the values in row
     """
+    return _compile_field(field, metadata, typeinfo, entity_id_field, seqnr_field)(row)
+
+
+def _compile_field(field, metadata, typeinfo, entity_id_field=None, seqnr_field=None):
+    """
+    Compile the extraction of a field given the corresponding metadata
+
+    The GOB type, type arguments, source lookup and filters are resolved once.
+    The returned extractor only executes them on a row.
+
+    :param field: the field name
+    :param metadata: the mapping definition
+    :param typeinfo: the GOB model info
+    :return: a function that returns the GOB typed value of the field for a row
+    """
     field_type = typeinfo['type']
     field_source = metadata['source_mapping']
 
@@ -320,27 +463,84 @@ def _extract_field(row, field, metadata, typeinfo, entity_id_field=None, seqnr_f
 
     kwargs = {k: v for k, v in metadata.items() if k not in ['type', 'source_mapping', 'filters']}
 
+    get_source_value = _compile_source(field_source, field_type, metadata.get('force_list', False))
+
+    # Clean all references
+    is_reference = field_type in ('GOB.Reference', 'GOB.ManyReference')
+
+    apply_filters = _compile_field_filters(metadata)
+
+    def extract(row):
+        value = get_source_value(row)
+
+        if is_reference and value is not None:
+            value = _clean_references(value)
+
+        if apply_filters:
+            value = apply_filters(value)
+
+        try:
+            return gob_type.from_value_secure(value, typeinfo, **kwargs)
+        except GOBTypeException:
+            _report_extract_error(row, field, value, entity_id_field, seqnr_field)
+            return gob_type.from_value_secure(None, typeinfo, **kwargs)
+
+    return extract
+
+
+def _compile_source(field_source, field_type, force_list=False):
+    """
+    Compiles the retrieval of the raw value of a field, either a single source value or a reference dict
+
+    :param field_source: The source_mapping
+    :param field_type: The field_type as string (GOB.xxxx)
+    :param force_list: Force return of list of dicts, even if not a GOB.ManyReference
+    :return: a function that returns the raw value for a row
+    """
     if isinstance(field_source, dict):
-        value = _extract_references(row, field_source, field_type, metadata.get('force_list', False))
+        return _compile_references(field_source, field_type, force_list)
     else:
-        value = _get_value(row, field_source)
+        return _compile_value(field_source)
 
-    # Clean all references
-    if field_type in ('GOB.Reference', 'GOB.ManyReference') and value is not None:
-        value = _clean_references(value)
 
-    value = _apply_field_filters(metadata, value)
+def _report_extract_error(row, field, value, entity_id_field=None, seqnr_field=None):
+    """
+    Reports a value that could not be converted to its GOB type
 
-    try:
-        return gob_type.from_value_secure(value, typeinfo, **kwargs)
-    except GOBTypeException:
-        # Convert the raw source row into a GOB-like row
-        report_row = _goblike_row(row, entity_id_field, seqnr_field)
-        report_row[field] = value
+    :param row: the data row
+    :param field: the field name
+    :param value: the value that could not be converted
+    :return: None
+    """
+    # Convert the raw source row into a GOB-like row
+    report_row = _goblike_row(row, entity_id_field, seqnr_field)
+    report_row[field] = value
 
-        id = report_row[FIELD.ID] + (f".{report_row[FIELD.SEQNR]}" if seqnr_field else "")
-        logger.error(f"Error importing object with id {id}. Can't extract value for field {field}")
-        return gob_type.from_value_secure(None, typeinfo, **kwargs)
+    id = report_row[FIELD.ID] + (f".{report_row[FIELD.SEQNR]}" if seqnr_field else "")
+    msg = f"Error importing object with id {id}. Can't extract value for field {field}"
+
+    errors = _extract_errors.get()
+    if errors is None:
+        logger.error(msg)
+    else:
+        errors.append(msg)
+
+
+@contextmanager
+def collect_extract_errors():
+    """
+    Collects the extraction errors that are reported within the context instead of logging them
+
+    A worker process returns the errors to the importing process, that logs them
+
+    :return: the list of the collected error messages
+    """
+    errors = []
+    token = _extract_errors.set(errors)
+    try:
+        yield errors
+    finally:
+        _extract_errors.reset(token)
 
 
 def _goblike_row(row, entity_id_field, seqnr_field=None):
@@ -362,12 +562,30 @@ def _goblike_row(row, entity_id_field, seqnr_field=None):
 
 
 def _apply_field_filters(metadata, value):
-    if "filters" in metadata:
-        # If we are dealing with a dict, apply filters to the correct attribute
-        if isinstance(metadata['filters'], dict):
-            for attribute, filters in metadata['filters'].items():
-                value[attribute] = _apply_filters(value[attribute], filters)
-        else:
-            # Apply any filters to the raw value
-            value = _apply_filters(value, metadata["filters"])
-    return value
+    apply_filters = _compile_field_filters(metadata)
+    return apply_filters(value) if apply_filters else value
+
+
+def _compile_field_filters(metadata):
+    """
+    Compiles the filters of a field, if any
+
+    :param metadata: the mapping definition
+    :return: a function that applies the filters to a value, or None if no filters are defined
+    """
+    if "filters" not in metadata:
+        return None
+
+    # If we are dealing with a dict, apply filters to the correct attribute
+    if isinstance(metadata['filters'], dict):
+        attribute_filters = {attribute: _compile_filters(filters)
+                             for attribute, filters in metadata['filters'].items()}
+
+        def apply_attribute_filters(value):
+            for attribute, apply_filters in attribute_filters.items():
+                value[attribute] = apply_filters(value[attribute])
+            return value
+        return apply_attribute_filters
+    else:
+        # Apply any filters to the raw value
+        return _compile_filters(metadata["filters"])
@@ -0,0 +1,192 @@
+"""
+Definitions
+
+Process wide cache of the import definitions and of the GOBModel collections.
+
+Resolving an import definition reads and parses the definition file, and every step of an import queries the model.
+The cache resolves both once per process, it is warmed when the service starts.
+The cache is cleared when the definition files change. Changes are checked at most once every
+DEFINITIONS_CHECK_INTERVAL seconds.
+"""
+import copy
+import json
+import os
+import threading
+import time
+
+from gobconfig.import_ import import_config
+from gobconfig.import_.import_config import get_import_definition as _get_import_definition, \
+    get_import_definition_by_filename as _get_import_definition_by_filename
+from gobcore.model import GOBModel
+
+from gobimport.config import DEFINITIONS_CHECK_INTERVAL
+
+
+class DefinitionsCache:
+
+    def __init__(self, directory, check_interval: float = DEFINITIONS_CHECK_INTERVAL):
+        """
+        :param directory: the directory of the definition files, changes in this directory invalidate the cache
+        :param check_interval: minimum number of seconds between two checks for changed definition files
+        """
+        self.directory = directory
+        self.check_interval = check_interval
+        self.entries = {}
+        self.signature = None
+        self.checked = None
+        self.lock = threading.Lock()
+
+    def _signature(self):
+        """
+        Returns the number and latest modification time of the definition files
+
+        :return:
+        """
+        n_files, modified = 0, 0
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                try:
+                    modified = max(modified, os.stat(os.path.join(root, file)).st_mtime_ns)
+                except OSError:
+                    continue
+                n_files += 1
+        return n_files, modified
+
+    def _check(self):
+        """
+        Clears the cache if the definition files have changed since the last check
+
+        :return:
+        """
+        now = time.monotonic()
+        if self.checked is not None and now - self.checked < self.check_interval:
+            return
+
+        self.checked = now
+        signature = self._signature()
+        if signature != self.signature:
+            self.entries.clear()
+            self.signature = signature
+
+    def get(self, key, resolve):
+        """
+        Returns the cached value for key, the value is resolved and cached if it is not in the cache
+
+        :param key:
+        :param resolve: function that resolves the value
+        :return:
+        """
+        with self.lock:
+            self._check()
+            try:
+                return self.entries[key]
+            except KeyError:
+                value = self.entries[key] = resolve()
+                return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.signature = self.checked = None
+
+
+_cache = DefinitionsCache(os.path.join(os.path.dirname(import_config.__file__), "data"))
+
+
+def get_import_definition(catalogue, collection, application=None):
+    """
+    Returns the import definition of the given catalogue, collection and application
+
+    Every call returns a new copy, so that an import cannot change the cached definition
+
+    :param catalogue:
+    :param collection:
+    :param application:
+    :return:
+    """
+    definition = _cache.get(('definition', catalogue, collection, application),
+                            lambda: _get_import_definition(catalogue, collection, application))
+    return copy.deepcopy(definition)
+
+
+def get_import_definition_by_filename(filename):
+    """
+    Returns the import definition in the given file
+
+    :param filename:
+    :return:
+    """
+    definition = _cache.get(('filename', filename), lambda: _get_import_definition_by_filename(filename))
+    return copy.deepcopy(definition)
+
+
+def get_collection(catalogue, entity):
+    """
+    Returns the GOBModel collection of the given catalogue and entity
+
+    The collection is shared and should not be changed
+
+    :param catalogue:
+    :param entity:
+    :return:
+    """
+    return _cache.get(('collection', catalogue, entity), lambda: GOBModel().get_collection(catalogue, entity))
+
+
+def has_states(catalogue, entity):
+    """
+    Tells whether the GOBModel collection of the given catalogue and entity has states
+
+    :param catalogue:
+    :param entity:
+    :return:
+    """
+    return _cache.get(('has_states', catalogue, entity), lambda: GOBModel().has_states(catalogue, entity))
+
+
+def _definition_keys():
+    """
+    Yields the catalogue, collection and application of every definition file
+
+    :return:
+    """
+    for root, _, files in os.walk(_cache.directory):
+        for file in sorted(files):
+            if not file.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(root, file)) as f:
+                    definition = json.load(f)
+                yield definition['catalogue'], definition['entity'], definition['source']['application']
+            except (OSError, ValueError, KeyError, TypeError):
+                # Not an import definition
+                continue
+
+
+def warm():
+    """
+    Resolves all import definitions and their collections
+
+    Definitions that cannot be resolved are skipped, they fail when they are imported
+
+    :return: the number of resolved import definitions
+    """
+    n_definitions = 0
+    for catalogue, collection, application in _definition_keys():
+        try:
+            get_import_definition(catalogue, collection, application)
+            get_collection(catalogue, collection)
+            has_states(catalogue, collection)
+        except Exception:
+            continue
+        n_definitions += 1
+    return n_definitions
+
+
+def clear():
+    """
+    Clears the cache
+
+    :return:
+    """
+    _cache.clear()
@@ -0,0 +1,129 @@
+"""
+Delta
+
+In a delta import only the entities that are new or changed since the previous successful import are written.
+The entities that have been deleted since the previous import are written as delete events after the other entities.
+The result message of a delta import has mode delta, the contents are not the complete collection.
+
+A local sqlite store keeps a content hash per _source_id of the previous successful import.
+During an import the hashes are written to a new store, that replaces the previous store on commit.
+Each import has its own new store, imports of the same collection do not remove each others stores.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+
+from gobcore.model.metadata import FIELD
+
+
+# Number of hashes that are inserted at once in the new store
+INSERT_BATCH_SIZE = 1000
+
+# Mode of the result message of a delta import
+DELTA_MODE = "delta"
+
+# A deleted entity is written as its source id with the delete event
+EVENT = "_event"
+DELETE_EVENT = "DELETE"
+
+
+def content_hash(entity):
+    """
+    Returns a hash of the contents of an entity
+
+    :param entity:
+    :return: 16 byte digest
+    """
+    contents = json.dumps(entity, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.blake2b(contents.encode(), digest_size=16).digest()
+
+
+class DeltaWriter:
+
+    def __init__(self, path, write):
+        """
+        :param path: path of the store of the collection
+        :param write: function that writes an entity to the contents file
+        """
+        self.path = path
+        self._write = write
+        self.counts = {'new': 0, 'changed': 0, 'unchanged': 0, 'deleted': 0}
+        self.pending = []
+
+        # The new store is in the same directory, so that it replaces the previous store atomically
+        directory, name = os.path.split(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, self.new_path = tempfile.mkstemp(prefix=f"{name}.", suffix=".new", dir=directory)
+        os.close(fd)
+
+        self.db = sqlite3.connect(self.new_path)
+        self.db.execute("CREATE TABLE hashes (source_id TEXT PRIMARY KEY, hash BLOB)")
+        self.db.execute("ATTACH DATABASE ? AS previous", (path,))
+        self.db.execute("CREATE TABLE IF NOT EXISTS previous.hashes (source_id TEXT PRIMARY KEY, hash BLOB)")
+
+    def write(self, entity):
+        """
+        Writes the entity if it is new or has changed since the previous import
+
+        :param entity:
+        :return:
+        """
+        source_id = entity.get(FIELD.SOURCE_ID)
+        if source_id is None:
+            # Entities without a source id cannot be compared
+            self._write(entity)
+            return
+
+        hash = content_hash(entity)
+        previous = self.db.execute("SELECT hash FROM previous.hashes WHERE source_id = ?", (source_id,)).fetchone()
+        if previous is None:
+            self.counts['new'] += 1
+            self._write(entity)
+        elif previous[0] != hash:
+            self.counts['changed'] += 1
+            self._write(entity)
+        else:
+            self.counts['unchanged'] += 1
+
+        self.pending.append((source_id, hash))
+        if len(self.pending) >= INSERT_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        self.db.executemany("INSERT OR REPLACE INTO hashes (source_id, hash) VALUES (?, ?)", self.pending)
+        self.pending = []
+
+    def write_deleted(self):
+        """
+        Writes a delete event for the entities of the previous import that have not been written in this import
+
+        :return:
+        """
+        self._flush()
+        for source_id, in self.db.execute("SELECT source_id FROM previous.hashes p "
+                                          "WHERE NOT EXISTS (SELECT 1 FROM hashes h WHERE h.source_id = p.source_id)"):
+            self.counts['deleted'] += 1
+            self._write({FIELD.SOURCE_ID: source_id, EVENT: DELETE_EVENT})
+
+    def commit(self):
+        """
+        Replaces the store of the previous import by the store of this import
+
+        :return:
+        """
+        self._flush()
+        self.db.commit()
+        self.db.close()
+        os.replace(self.new_path, self.path)
+
+    def close(self):
+        """
+        Discards the store of this import if it has not been committed
+
+        :return:
+        """
+        self.db.close()
+        if os.path.exists(self.new_path):
+            os.remove(self.new_path)
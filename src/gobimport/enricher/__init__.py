@@ -1,13 +1,30 @@
 """ Enricher
 
 This enricher calls some specific functions for collections to add missing values in the source.
+
+The catalogue specific enrichers are imported on first use.
+Some enrichers depend on heavy packages (shapely, requests) that other catalogues do not need.
 """
-from gobimport.enricher.meetbouten import MeetboutenEnricher
-from gobimport.enricher.gebieden import GebiedenEnricher
-from gobimport.enricher.bag import BAGEnricher
-from gobimport.enricher.brk import BRKEnricher
-from gobimport.enricher.wkpb import WKPBEnricher
-from gobimport.enricher.test_catalogue import TstCatalogueEnricher
+from importlib import import_module
+
+
+# Catalogue specific enrichers: (module, class, catalogue)
+ENRICHERS = [
+    ("gobimport.enricher.gebieden", "GebiedenEnricher", "gebieden"),
+    ("gobimport.enricher.meetbouten", "MeetboutenEnricher", "meetbouten"),
+    ("gobimport.enricher.bag", "BAGEnricher", "bag"),
+    ("gobimport.enricher.brk", "BRKEnricher", "brk"),
+    ("gobimport.enricher.wkpb", "WKPBEnricher", "wkpb"),
+    ("gobimport.enricher.test_catalogue", "TstCatalogueEnricher", "test_catalogue"),
+]
+
+
+def __getattr__(name):
+    # Import an enricher class on first access, e.g. from gobimport.enricher import GebiedenEnricher
+    for module_name, class_name, _ in ENRICHERS:
+        if class_name == name:
+            return getattr(import_module(module_name), class_name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class BaseEnricher:
@@ -20,8 +37,11 @@ class BaseEnricher:
         :param entity_name:
         """
         self.enrichers = []
-        for CatalogueEnricher in [GebiedenEnricher, MeetboutenEnricher, BAGEnricher, BRKEnricher, WKPBEnricher,
-                                  TstCatalogueEnricher]:
+        for module_name, class_name, catalogue in ENRICHERS:
+            if catalogue != catalog_name:
+                # Only the enrichers of the catalogue are imported
+                continue
+            CatalogueEnricher = getattr(import_module(module_name), class_name)
             if CatalogueEnricher.enriches(app_name, catalog_name, entity_name):
                 self.enrichers.append(CatalogueEnricher(app_name, catalog_name, entity_name))
 
@@ -33,3 +53,12 @@ class BaseEnricher:
         """
         for enricher in self.enrichers:
             enricher.enrich(entity)
+
+    def enrich_batch(self, entities):
+        """
+        Enrich a batch of entities for all applicable enrichments
+        :param entities:
+        :return:
+        """
+        for enricher in self.enrichers:
+            enricher.enrich_batch(entities)
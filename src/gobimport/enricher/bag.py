@@ -5,7 +5,8 @@ BAG enrichment
 from gobcore.logging.logger import logger
 
 from gobimport.enricher.enricher import Enricher
-from gobcore.quality.issue import QA_CHECK, QA_LEVEL, Issue, log_issue
+from gobimport.issues import log_issue
+from gobcore.quality.issue import QA_CHECK, QA_LEVEL, Issue
 
 
 CODE_TABLE_FIELDS = ['code', 'omschrijving']
@@ -39,3 +39,15 @@ class Enricher(ABC):
         """
         if self._enrich_entity:
             self._enrich_entity(entity)
+
+    def enrich_batch(self, entities):
+        """
+        Enrich a batch of entities, in order
+
+        Enrichers can override this method to enrich the entities of a batch at once
+
+        :param entities:
+        :return:
+        """
+        for entity in entities:
+            self.enrich(entity)
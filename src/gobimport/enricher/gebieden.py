@@ -2,13 +2,23 @@
 Gebieden enrichment
 
 """
+import hashlib
+import json
+import math
+import os
 import requests
+import time
 
-from gobcore.logging.logger import logger
+from collections import defaultdict
+
+from gobimport.config import CBS_CACHE_DIR, CBS_CACHE_TTL, CBS_OFFLINE, CBS_FIXTURE_DIR
 from gobimport.enricher.enricher import Enricher
-from gobcore.quality.issue import QA_CHECK, QA_LEVEL, Issue, log_issue
+from gobimport.issues import log_issue
+from gobcore.logging.logger import logger
+from gobcore.quality.issue import QA_CHECK, QA_LEVEL, Issue
 
-from shapely.geometry import shape
+from shapely.geometry import Point, shape
+from shapely.prepared import prep
 from shapely.wkt import loads
 from urllib.parse import urlencode
 
@@ -84,7 +94,7 @@ class GebiedenEnricher(Enricher):
         :return: the entities enriched with CBS Code
         """
         if not self.features.get(type):
-            self.features[type] = _get_cbs_features(url, type)
+            self.features[type] = CBSFeatureIndex(_get_cbs_features(url, type))
 
         # Leave entities without datum_einde_geldigheid empty
         if entity['eind_geldigheid']:
@@ -123,25 +133,77 @@ class GebiedenEnricher(Enricher):
                 entity[date] = str(entity[date])[:10]   # len "YYYY-MM-DD" = 10
 
 
+class CBSFeatureIndex:
+    """
+    Grid index on the representative points of CBS features
+
+    The features are assigned to the square grid cells in which their points lay.
+    A geometry is only matched to the features in the cells that overlap with its bounding box.
+    """
+
+    def __init__(self, features):
+        """
+        :param features: the cbs features
+        """
+        self.features = features
+        self.cells = defaultdict(list)
+
+        points = [(feature['geometrie'].x, feature['geometrie'].y) for feature in features]
+        if not points:
+            return
+
+        xs, ys = zip(*points)
+        self.origin = min(xs), min(ys)
+        # About one feature per cell
+        self.cell_size = max(max(xs) - self.origin[0], max(ys) - self.origin[1]) / math.sqrt(len(points)) or 1
+
+        for i, (x, y) in enumerate(points):
+            self.cells[self._cell(x, y)].append(i)
+        self.max_cell = self._cell(max(xs), max(ys))
+
+    def __len__(self):
+        return len(self.features)
+
+    def _cell(self, x, y):
+        return math.floor((x - self.origin[0]) / self.cell_size), math.floor((y - self.origin[1]) / self.cell_size)
+
+    def query(self, geometry):
+        """
+        Returns the features whose point lays within the geometry
+
+        :param geometry: a shapely geometry
+        :return: the matching features, in the order of the features
+        """
+        if not self.cells or geometry.is_empty:
+            # An empty geometry has no (NaN) bounds
+            return []
+
+        min_x, min_y, max_x, max_y = geometry.bounds
+        low, high = self._cell(min_x, min_y), self._cell(max_x, max_y)
+        candidates = sorted(i
+                            for x in range(max(low[0], 0), min(high[0], self.max_cell[0]) + 1)
+                            for y in range(max(low[1], 0), min(high[1], self.max_cell[1]) + 1)
+                            for i in self.cells.get((x, y), []))
+
+        prepared = prep(geometry)
+        return [self.features[i] for i in candidates if prepared.contains(self.features[i]['geometrie'])]
+
+
 def _match_cbs_features(entity, features):
     """
     Match the geometry of an entity to the CBS inside point
 
     :param entity: the entity to match to
-    :param features: the cbs features
+    :param features: the cbs features index
     :return: the matched cbs feature or none
     """
-    geom = loads(entity['geometrie'])
-    match = None
+    matches = features.query(loads(entity['geometrie']))
 
-    for feature in features:
-        if geom.contains(feature['geometrie']) and not match:
-            match = feature
-        elif geom.contains(feature['geometrie']) and match:
-            log_issue(logger, QA_LEVEL.WARNING,
-                      Issue(QA_CHECK.Value_unique, entity, None, 'naam', 'CBS feature', feature['naam']))
+    for feature in matches[1:]:
+        log_issue(logger, QA_LEVEL.WARNING,
+                  Issue(QA_CHECK.Value_unique, entity, None, 'naam', 'CBS feature', feature['naam']))
 
-    return match
+    return matches[0] if matches else None
 
 
 def _get_cbs_features(url, type):
@@ -149,14 +211,67 @@ def _get_cbs_features(url, type):
     Gets the CBS codes from the API and returns a list of dicts with the naam,
     code and geometrie of the feature (wijk or buurt)
 
+    The features are cached in CBS_CACHE_DIR, keyed by url.
+    Cached features are used without revalidation during CBS_CACHE_TTL seconds, after that
+    they are revalidated with the ETag or Last-Modified header of the API response.
+    In offline mode the features are only read from the cache or from the fixture dir.
+
     :param url: the url to the cbs code API
     :param type: the type of entity, needed to get the correct values from the API
     :return: a list of dicts with CBS Code, CBS naam and geometry
     """
-    response = requests.get(url)
-    assert response.ok
-    cbs_result = response.json()
+    path = os.path.join(CBS_CACHE_DIR, hashlib.sha256(url.encode()).hexdigest() + ".json") if CBS_CACHE_DIR else None
+    cached = _read_cbs_cache(path)
+
+    if CBS_OFFLINE:
+        fixture_path = os.path.join(CBS_FIXTURE_DIR, f"cbs_{type}.json") if CBS_FIXTURE_DIR else None
+        cached = cached or _read_cbs_cache(fixture_path)
+        assert cached, f"No cached CBS features available for {url}"
+        return _load_cbs_features(cached)
+
+    if cached and time.time() - cached.get('fetched', 0) < CBS_CACHE_TTL:
+        return _load_cbs_features(cached)
+
+    response = requests.get(url, headers=_revalidation_headers(cached))
+    if cached and response.status_code == 304:
+        # Not modified
+        features = _load_cbs_features(cached)
+    else:
+        assert response.ok
+        features = _parse_cbs_features(response.json(), type)
+        cached = None
+
+    _write_cbs_cache(path, url, _response_validators(response, cached), features)
+    return features
+
+
+def _revalidation_headers(cached):
+    headers = {}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+    return headers
+
+
+def _response_validators(response, cached=None):
+    """
+    Returns the validators of a response to revalidate the features later
+
+    A 304 (not modified) response may omit the validators, then the validators of the cached response are kept
 
+    :param response: the response of the API
+    :param cached: the cache entry that has been revalidated by the response, if any
+    :return: dict with the etag and last_modified
+    """
+    cached = cached or {}
+    return {
+        'etag': response.headers.get('ETag', cached.get('etag')),
+        'last_modified': response.headers.get('Last-Modified', cached.get('last_modified')),
+    }
+
+
+def _parse_cbs_features(cbs_result, type):
     features = []
     for feature in cbs_result['features']:
         # Skip features if they exist only of water
@@ -171,3 +286,69 @@ def _get_cbs_features(url, type):
         }
         features.append(cleaned_feature)
     return features
+
+
+def _is_cbs_feature(feature):
+    return isinstance(feature, dict) and 'code' in feature and 'naam' in feature \
+        and isinstance(feature.get('geometrie'), list) and len(feature['geometrie']) == 2
+
+
+def _read_cbs_cache(path):
+    """
+    Reads cached CBS features
+
+    A cache entry holds the features with the coordinates of their representative point as geometrie, e.g.
+    {"features": [{"code": "BU03630000", "naam": "Kop Zeedijk", "geometrie": [121394.0, 487383.0]}, ...]}
+    An entry in another format, e.g. a partially written file or a WFS response, is not used.
+
+    :param path: the path of the cache file, or None
+    :return: the cache entry, or None if no (valid) cache file exists
+    """
+    try:
+        with open(path) as file:
+            cached = json.load(file)
+    except (TypeError, OSError, ValueError):
+        return None
+
+    if not (isinstance(cached, dict) and isinstance(cached.get('features'), list)
+            and isinstance(cached.get('fetched', 0), (int, float))
+            and all(_is_cbs_feature(feature) for feature in cached['features'])):
+        logger.warning(f"Invalid CBS cache file {path} is not used")
+        return None
+    return cached
+
+
+def _write_cbs_cache(path, url, validators, features):
+    """
+    Writes CBS features to the cache
+
+    The cache file is replaced atomically, so that concurrent imports never read a partial file.
+    Caching is best effort, a cache that cannot be written is skipped.
+
+    :param path: the path of the cache file, or None if caching is disabled
+    :param url: the url of the features
+    :param validators: the etag and last_modified of the API response
+    :param features: the CBS features
+    :return:
+    """
+    if not path:
+        return
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w") as file:
+            json.dump({
+                'url': url,
+                **validators,
+                'fetched': time.time(),
+                'features': [{**feature, 'geometrie': [feature['geometrie'].x, feature['geometrie'].y]}
+                             for feature in features],
+            }, file)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"CBS features are not cached: {e}")
+
+
+def _load_cbs_features(cached):
+    return [{**feature, 'geometrie': Point(*feature['geometrie'])} for feature in cached['features']]
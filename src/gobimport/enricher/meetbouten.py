@@ -1,12 +1,24 @@
 """
 Meetbouten enrichment
 
+Metingen can be enriched one by one, or in batches.
+Batches are enriched with NumPy array operations when NumPy is available.
 """
 import datetime
 import decimal
 
 from gobimport.enricher.enricher import Enricher
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    # Batches of metingen are enriched one by one
+    np = None
+
+
+# Dates are represented by the number of days since EPOCH in batch enrichment
+EPOCH = datetime.datetime(1970, 1, 1)
+
 
 class MeetboutenEnricher(Enricher):
 
@@ -83,6 +95,137 @@ class MeetboutenEnricher(Enricher):
         for attr in update_attributes:
             meting[attr] = meetbout[attr]
 
+    def enrich_batch(self, metingen):
+        """
+        Enrich a batch of metingen
+
+        The metingen are enriched with array operations, with values that are identical to enrich_meting.
+        Batches that cannot be enriched that way (no NumPy, heights that are not floats or dates that
+        are not in YYYY-MM-DD format) are enriched one by one.
+
+        :param metingen: list of metingen
+        :return: None
+        """
+        arrays = _meting_arrays(metingen) if np is not None and self.entity_name == "metingen" else None
+        groups = self._meetbout_groups(metingen, *arrays) if arrays else None
+        if groups is None:
+            return super().enrich_batch(metingen)
+
+        self._enrich_groups(metingen, *arrays, groups)
+
+    def _meetbout_groups(self, metingen, order, ids, datums, hoogtes):
+        """
+        Collects the state of the meetbouten of a batch of metingen
+
+        :param metingen: the metingen
+        :param order: the order of the metingen, grouped by meetbout
+        :param ids: the meetbout number of each meting, in group order
+        :param datums: the datum of each meting, in group order
+        :param hoogtes: the hoogte of each meting, in group order
+        :return: the meetbout ids, the start of each group and the state of each meetbout
+                 or None if the state of a meetbout cannot be used in array operations
+        """
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        meetboutids = list(dict.fromkeys(meting['hoort_bij_meetbout'] for meting in metingen))
+
+        # Number of metingen, previous datum, previous hoogte, first datum and zakking cumulatief for each meetbout
+        state = []
+        for meetboutid, start in zip(meetboutids, starts.tolist()):
+            meetbout = self.meetbouten.get(meetboutid)
+            if meetbout is None:
+                state.append((0, datums[start], hoogtes[start], datums[start], 0.0))
+            elif type(meetbout['_vorige_hoogte']) is float and type(meetbout['zakking_cumulatief']) is float:
+                state.append((meetbout['hoeveelste_meting'], _days(meetbout['_vorige_datum']),
+                              meetbout['_vorige_hoogte'], _days(meetbout['_eerste_datum']),
+                              meetbout['zakking_cumulatief']))
+            else:
+                return None
+
+        counts, vorige_datums, vorige_hoogtes, eerste_datums, zakkingen_cumulatief = zip(*state)
+        return meetboutids, starts, np.array(counts), np.array(vorige_datums), np.array(vorige_hoogtes), \
+            np.array(eerste_datums), zakkingen_cumulatief
+
+    def _enrich_groups(self, metingen, order, ids, datums, hoogtes, groups):
+        """
+        Enrich the metingen of a batch, grouped by meetbout
+
+        :param metingen: the metingen
+        :param order, ids, datums, hoogtes: see _meetbout_groups
+        :param groups: result of _meetbout_groups
+        :return: None
+        """
+        meetboutids, starts, counts, vorige_datums, vorige_hoogtes, eerste_datums, zakkingen_cumulatief = groups
+        ends = np.r_[starts[1:], len(ids)]
+
+        # The previous meting is the previous meting in the group, or the last meting of the meetbout before the batch
+        first = np.zeros(len(ids), dtype=bool)
+        first[starts] = True
+        previous = np.r_[0, np.arange(len(ids) - 1)]
+        aantal_dagen = datums - np.where(first, vorige_datums[ids], datums[previous])
+        zakking = np.where(first, vorige_hoogtes[ids], hoogtes[previous]) * 1000 - hoogtes * 1000
+        hoeveelste_meting = counts[ids] + np.arange(len(ids)) - starts[ids] + 1
+        dagen_sinds_eerste_meting = datums - eerste_datums[ids]
+
+        # Accumulate in the same order as one by one enrichment, to get identical values
+        zakking_cumulatief = np.empty(len(ids))
+        for start, end, cumulatief in zip(starts, ends, zakkingen_cumulatief):
+            segment = zakking[start:end].copy()
+            segment[0] = cumulatief + segment[0]
+            zakking_cumulatief[start:end] = np.cumsum(segment)
+
+        values = list(zip(hoeveelste_meting.tolist(), aantal_dagen.tolist(), zakking.tolist(),
+                          zakking_cumulatief.tolist(), dagen_sinds_eerste_meting.tolist()))
+        for index, (hoeveelste, dagen, zakking_meting, cumulatief, dagen_sinds_eerste) in zip(order.tolist(), values):
+            meting = metingen[index]
+            meting['type_meting'] = 'N' if hoeveelste == 1 else 'H'
+            meting['hoeveelste_meting'] = hoeveelste
+            meting['aantal_dagen'] = dagen
+            meting['zakking'] = zakking_meting
+            meting['zakking_cumulatief'] = cumulatief
+            meting['zakkingssnelheid'] = _calculate_zakkingssnelheid(cumulatief, dagen_sinds_eerste)
+
+        # Store the state of each meetbout for the next metingen
+        for meetboutid, start, end in zip(meetboutids, starts.tolist(), ends.tolist()):
+            last = metingen[order[end - 1]]
+            self.meetbouten[meetboutid] = {
+                **{attr: last[attr] for attr in ['type_meting', 'hoeveelste_meting', 'aantal_dagen', 'zakking',
+                                                 'zakking_cumulatief', 'zakkingssnelheid']},
+                '_eerste_datum': EPOCH + datetime.timedelta(days=int(eerste_datums[ids[start]])),
+                '_vorige_datum': EPOCH + datetime.timedelta(days=int(datums[end - 1])),
+                '_vorige_hoogte': float(hoogtes[end - 1]),
+            }
+
+
+def _days(date):
+    return (date - EPOCH).days
+
+
+def _meting_arrays(metingen):
+    """
+    Converts a batch of metingen to arrays, grouped by meetbout
+
+    :param metingen: the metingen
+    :return: the order of the metingen and their meetbout number, datum (days) and hoogte arrays in group order,
+             or None if the metingen cannot be enriched by array operations
+    """
+    hoogtes = [meting['hoogte_tov_nap'] for meting in metingen]
+    datums = [meting['datum'] for meting in metingen]
+    if not metingen or not all(type(hoogte) is float for hoogte in hoogtes) or \
+            not all(type(datum) is str and len(datum) == 10 for datum in datums):
+        return None
+
+    try:
+        datums = np.array(datums, dtype='datetime64[D]')
+    except ValueError:
+        return None
+    if np.isnat(datums).any():
+        return None
+
+    meetbouten = {}
+    ids = np.array([meetbouten.setdefault(meting['hoort_bij_meetbout'], len(meetbouten)) for meting in metingen])
+    order = np.argsort(ids, kind='stable')
+    return order, ids[order], datums.astype(np.int64)[order], np.array(hoogtes)[order]
+
 
 def _calculate_days_since(previous_date, current_date):
     """
@@ -3,31 +3,61 @@
 Validation will take place after the imported data has been converted into the GOBModel.
 This is done to be able to perform comparisons between dates in the imported data or
 run specific validation for certain collections.
+
+The catalogue specific validators are imported on first use.
+
+Validators that only report warnings (sampled = True) run on the QA sample of the entities.
 """
+from importlib import import_module
+
 from gobcore.exceptions import GOBException
 
-from gobimport.entity_validator.state import StateValidator
-from gobimport.entity_validator.gebieden import GebiedenValidator
-from gobimport.entity_validator.bag import BAGValidator
+from gobimport.issues import sampled_issues
+from gobimport.sampling import QASample
+
+
+# Entity validators: (module, class, catalogue), a validator without catalogue applies to all catalogues
+VALIDATORS = [
+    ("gobimport.entity_validator.state", "StateValidator", None),
+    ("gobimport.entity_validator.gebieden", "GebiedenValidator", "gebieden"),
+    ("gobimport.entity_validator.bag", "BAGValidator", "bag"),
+]
+
+
+def __getattr__(name):
+    # Import a validator class on first access, e.g. from gobimport.entity_validator import StateValidator
+    for module_name, class_name, _ in VALIDATORS:
+        if class_name == name:
+            return getattr(import_module(module_name), class_name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class EntityValidator:
 
-    def __init__(self, catalog_name, entity_name, source_id):
+    def __init__(self, catalog_name, entity_name, source_id, sample: QASample = None):
         """
         Select all applicable entity validators for the given catalog and entity
 
         :param catalog_name:
         :param entity_name:
         :param source_id:
+        :param sample: the QA sample, all validators run on every entity if not set
         """
         self.catalog_name = catalog_name
         self.entity_name = entity_name
+        self.sample = sample or QASample()
 
         self.validators = []
-        for Validator in [StateValidator, GebiedenValidator, BAGValidator]:
+        self.sampled_validators = []
+        for module_name, class_name, catalogue in VALIDATORS:
+            if catalogue not in (None, catalog_name):
+                # Only the validators of the catalogue are imported
+                continue
+            Validator = getattr(import_module(module_name), class_name)
             if Validator.validates(catalog_name, entity_name):
-                self.validators.append(Validator(catalog_name, entity_name, source_id))
+                validators = self.sampled_validators if self.sample.active and getattr(Validator, "sampled", False) \
+                    else self.validators
+                validators.append(Validator(catalog_name, entity_name, source_id))
 
     def validate(self, entity):
         """
@@ -39,6 +69,11 @@ class EntityValidator:
         for validator in self.validators:
             validator.validate(entity)
 
+        if self.sampled_validators and self.sample.includes(entity):
+            with sampled_issues():
+                for validator in self.sampled_validators:
+                    validator.validate(entity)
+
     def result(self):
         """
         Checks for fatal errors
@@ -47,7 +82,7 @@ class EntityValidator:
 
         :return:
         """
-        results = [validator.result() for validator in self.validators]
+        results = [validator.result() for validator in self.validators + self.sampled_validators]
         # Raise an Exception is a fatal validation has failed
         if False in results:
             raise GOBException(
@@ -7,7 +7,9 @@ from collections import defaultdict
 from functools import reduce
 
 from gobcore.logging.logger import logger
-from gobcore.quality.issue import Issue, QA_CHECK, QA_LEVEL, log_issue
+from gobcore.quality.issue import Issue, QA_CHECK, QA_LEVEL
+
+from gobimport.issues import log_issue
 
 VALID_GEBRUIKSDOEL_DOMAIN = [
     'woonfunctie',
@@ -26,6 +28,9 @@ VALID_GEBRUIKSDOEL_DOMAIN = [
 
 class BAGValidator:
 
+    # Only reports warnings, runs on the QA sample of the entities
+    sampled = True
+
     @classmethod
     def validates(cls, catalog_name, entity_name):
         """
@@ -7,11 +7,16 @@ import datetime
 
 from gobcore.logging.logger import logger
 from gobcore.model import FIELD
-from gobcore.quality.issue import QA_CHECK, QA_LEVEL, Issue, log_issue
+from gobcore.quality.issue import QA_CHECK, QA_LEVEL, Issue
+
+from gobimport.issues import log_issue
 
 
 class GebiedenValidator:
 
+    # Only reports warnings, runs on the QA sample of the entities
+    sampled = True
+
     @classmethod
     def validates(cls, catalog_name, entity_name):
         """
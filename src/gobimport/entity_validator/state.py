@@ -1,8 +1,11 @@
-from collections import defaultdict
+from array import array
 
-from gobcore.model import GOBModel, FIELD
+from gobcore.model import FIELD
 from gobcore.logging.logger import logger
-from gobcore.quality.issue import QA_CHECK, QA_LEVEL, Issue, log_issue
+from gobcore.quality.issue import QA_CHECK, QA_LEVEL, Issue
+
+from gobimport.definitions import has_states
+from gobimport.issues import log_issue
 
 
 class StateValidator:
@@ -16,14 +19,16 @@ class StateValidator:
         :param entity_name:
         :return:
         """
-        return GOBModel().has_states(catalog_name, entity_name)
+        return has_states(catalog_name, entity_name)
 
     def __init__(self, catalog_name, entity_name, source_id):
         self.source_id = source_id
 
         self.validated = True
-        self.volgnummers = defaultdict(set)
-        self.end_date = {}
+
+        # The volgnummers and whether an empty eind_geldigheid has been found, by entity identificatie
+        # Stored as 2 * volgnummer + open end for a single volgnummer, else as an array [open end, volgnummers...]
+        self.states = {}
 
     def result(self):
         return self.validated
@@ -49,20 +54,54 @@ class StateValidator:
             self.validated = False
 
         identificatie = str(entity[self.source_id])
-        if entity[FIELD.SEQNR] in self.volgnummers[identificatie]:
+        state = self.states.get(identificatie)
+        volgnummers, open_end = self._get_state(state)
+        if entity[FIELD.SEQNR] in volgnummers:
             log_issue(logger, QA_LEVEL.ERROR,
                       Issue(QA_CHECK.Value_unique, entity, self.source_id, FIELD.SEQNR))
             self.validated = False
 
         # Only one eind_geldigheid may be empty per entity
         if entity[FIELD.END_VALIDITY] is None:
-            if self.end_date.get(identificatie):
+            if open_end:
                 log_issue(logger, QA_LEVEL.WARNING,
                           Issue(QA_CHECK.Value_empty_once, entity, self.source_id, FIELD.END_VALIDITY))
-            self.end_date[identificatie] = True
+            open_end = True
+
+        # Add the volgnummer to the state for this entity identificatie
+        self._set_state(identificatie, state, entity[FIELD.SEQNR], open_end)
 
-        # Add the volgnummer to the set for this entity identificatie
-        self.volgnummers[identificatie].add(entity[FIELD.SEQNR])
+    def _get_state(self, state):
+        """
+        Decodes the state of an entity identificatie
+
+        :param state: the stored state, None if the identificatie has not been found before
+        :return: (volgnummers, open end)
+        """
+        if state is None:
+            return (), False
+        elif isinstance(state, int):
+            volgnummer, open_end = divmod(state, 2)
+            return (volgnummer,), bool(open_end)
+        return state[1:], bool(state[0])
+
+    def _set_state(self, identificatie, state, volgnummer, open_end):
+        """
+        Adds a volgnummer to the state of an entity identificatie
+
+        :param identificatie:
+        :param state: the stored state, None if the identificatie has not been found before
+        :param volgnummer: the volgnummer to add
+        :param open_end: whether an empty eind_geldigheid has been found
+        :return:
+        """
+        if state is None:
+            self.states[identificatie] = 2 * volgnummer + open_end
+        elif isinstance(state, int):
+            self.states[identificatie] = array('q', [open_end, state // 2, volgnummer])
+        else:
+            state[0] = open_end
+            state.append(volgnummer)
 
     def _validate_begin_geldigheid(self, entity):
         if entity[FIELD.START_VALIDITY]:
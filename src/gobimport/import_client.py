@@ -13,19 +13,42 @@ Todo: improve type conversion
 """
 
 import datetime
+import os
 import traceback
 
+from contextlib import nullcontext
+from itertools import islice
+
 from gobcore.enum import ImportMode
+from gobcore.exceptions import GOBException
 from gobcore.message_broker.offline_contents import ContentsWriter
 from gobcore.utils import ProgressTicker
 
-from gobimport.converter import Converter
+from gobimport.checkpoint import Checkpointer, ResumableContentsWriter
+from gobimport.compression import CompressedContentsWriter, get_compression
+from gobimport.config import CHECKPOINT_DIR, DELTA_DIR, PROFILE_DIR
+from gobimport.converter import Converter, collect_extract_errors
+from gobimport.definitions import has_states
+from gobimport.delta import DELTA_MODE, DeltaWriter
 from gobimport.enricher import BaseEnricher
 from gobimport.entity_validator import EntityValidator
 from gobimport.injections import Injector
+from gobimport.issues import ISSUE_SAMPLE_SIZE, IssueAggregator
 from gobimport.merger import Merger
+from gobimport.parallel import ParallelConverter
+from gobimport.profiler import PROFILE_KINDS, Profiler
 from gobimport.reader import Reader
+from gobimport.sampling import QASample
+from gobimport.shards import ShardedContentsWriter
+from gobimport.timer import StageTimer
+from gobimport.utils import iter_chunks
 from gobimport.validator import Validator
+from gobimport.validator.primary_keys import PrimaryKeys
+from gobimport.writer import BufferedWriter, FileContentsWriter
+
+
+# Default number of rows per batch when rows are converted in worker processes
+PARALLEL_BATCH_SIZE = 1000
 
 
 class ImportClient:
@@ -40,13 +63,29 @@ class ImportClient:
     def __init__(self, dataset, msg, logger, mode: ImportMode = ImportMode.FULL):
         self.mode = mode
         self.logger = logger
+        self.delta = None
+        self.filename = None
+        self.checkpointer = None
+        self.writer = None
+        self.profiler = None
+        self.parallel = None
+        # The QA sample is resolved when the import starts, until then all checks run on every entity
+        self.sample = QASample()
 
         self.init_dataset(dataset)
 
-        self.entity_validator = EntityValidator(self.catalogue, self.entity, self.func_source_id)
+        self.entity_validator = EntityValidator(self.catalogue, self.entity, self.func_source_id, self.sample)
         self.merger = Merger(self)
 
         self.header = msg.get('header', {})
+        # The stages are timed when the dataset or the header asks for it, the header overrides the dataset
+        self.timer = StageTimer(enabled=bool(self.header.get('timings', self.dataset.get('timings'))))
+        # The compression and the number of contents files are resolved when the import starts
+        self.compression = None
+        self.shards = 1
+        # Only the first issues of each check are logged individually, all issues are counted
+        # The number of issues that are logged individually is resolved when the import starts
+        self.issues = IssueAggregator()
         self.logger.info(f"Import dataset {self.entity} from {self.source_app} (mode = {self.mode.value}) started")
 
     def init_dataset(self, dataset):
@@ -65,7 +104,8 @@ class ImportClient:
 
         self.injector = Injector(self.source.get("inject"))
         self.enricher = BaseEnricher(self.source_app, self.catalogue, self.entity)
-        self.validator = Validator(self.source_app, self.catalogue, self.entity, self.dataset)
+        # The sample of the import is kept when the dataset of a merge is initialized
+        self.validator = Validator(self.source_app, self.catalogue, self.entity, self.dataset, self.sample)
         self.converter = Converter(self.catalogue, self.entity, self.dataset)
 
     def get_result_msg(self):
@@ -87,8 +127,12 @@ class ImportClient:
         }
 
         summary = {
-            'num_records': self.n_rows
+            'num_records': self.n_rows,
+            'timings': self.timer.summary(self.n_rows),
+            'issues': self.issues.finish(),
         }
+        if self.sample.active:
+            summary['qa_sample'] = self.sample.summary(summary['issues'])
 
         # Log end of import process
         self.logger.info(f"Import dataset {self.entity} from {self.source_app} completed. "
@@ -103,6 +147,22 @@ class ImportClient:
             "contents_ref": self.filename
         }
 
+        if self.compression:
+            header["compression"] = self.compression[0]
+
+        if self.shards > 1:
+            # The contents_ref refers to the manifest of the shards
+            header["shards"] = self.shards
+
+        if self.profiler and (profile := self.profiler.summary()):
+            # A profile that could not be written is left out
+            summary["profile"] = profile
+
+        if self.delta:
+            # Only new, changed and deleted entities are in the contents
+            header["mode"] = DELTA_MODE
+            summary["delta"] = self.delta.counts
+
         return import_message
 
     def import_rows(self, write, progress):
@@ -112,25 +172,53 @@ class ImportClient:
 
         self.logger.info(f"Start import from {self.source_app}")
         self.n_rows = 0
-        for row in reader.read():
-            progress.tick()
 
-            self.row = row
-            self.n_rows += 1
+        rows = reader.read()
+        if self.checkpointer:
+            rows = self.skip_processed_rows(rows)
+            self.n_rows = self.checkpointer.last
 
-            self.injector.inject(row)
+        # Measure the cumulative time of each stage
+        rows = self.timer.iterate('read', rows)
+        timed_write = self.timer.wrap('write', write)
 
-            self.enricher.enrich(row)
+        # Optionally convert the rows in batches, or in worker processes, instead of one by one
+        # The rows of a merge dataset are converted in this process, the workers convert the rows of the dataset
+        batch_size = self.dataset.get("batch_size")
+        if self.parallel:
+            self.import_parallel(rows, timed_write, progress, batch_size or PARALLEL_BATCH_SIZE)
+        elif batch_size:
+            self.import_batches(rows, timed_write, progress, batch_size)
+        else:
+            inject = self.timer.wrap('inject', self.injector.inject)
+            enrich = self.timer.wrap('enrich', self.enricher.enrich)
+            merge = self.timer.wrap('merge', self.merger.merge)
+            convert = self.timer.wrap('convert', self.converter.convert)
+            validate = self.timer.wrap('validate', self.validator.validate)
+            validate_entity = self.timer.wrap('entity_validate', self.entity_validator.validate)
 
-            self.merger.merge(row, write)
+            for row in rows:
+                progress.tick()
 
-            entity = self.converter.convert(row)
+                self.row = row
+                self.n_rows += 1
 
-            self.validator.validate(entity)
+                inject(row)
 
-            self.entity_validator.validate(entity)
+                enrich(row)
 
-            write(entity)
+                # The entities that are written by the merger are timed as merge
+                merge(row, write)
+
+                entity = convert(row)
+
+                validate(entity)
+
+                validate_entity(entity)
+
+                timed_write(entity)
+
+                self.checkpoint()
 
         self.validator.result()
 
@@ -141,23 +229,471 @@ class ImportClient:
             # Default requirement for full imports is a non-empty dataset
             self.logger.error(f"Too few records imported: {self.n_rows} < {min_rows}")
 
+    def prepare_batches(self, rows, progress, batch_size):
+        """
+        Inject, enrich and merge the rows in chunks of batch_size rows
+
+        The rows of a chunk are enriched at once, so that enrichers can enrich them in bulk.
+
+        Entities that are written by the merger are buffered per row so that they can be written
+        before the entity of the row, as in a row by row import.
+
+        :param rows: iterable of rows in external format
+        :param progress: progress ticker
+        :param batch_size: number of rows per batch
+        :return: generator of (batch, merged entities per row)
+        """
+        inject = self.timer.wrap('inject', self.injector.inject)
+        enrich_batch = self.timer.wrap('enrich', self.enricher.enrich_batch)
+        merge = self.timer.wrap('merge', self.merger.merge)
+
+        for batch in iter_chunks(rows, batch_size):
+            for row in batch:
+                progress.tick()
+
+                self.row = row
+                self.n_rows += 1
+
+                inject(row)
+
+            enrich_batch(batch)
+
+            merged = []
+            for row in batch:
+                merged_entities = []
+                merge(row, merged_entities.append)
+                merged.append(merged_entities)
+
+            yield batch, merged
+
+    def write_batch(self, batch, results, merged, write):
+        """
+        Validate and write the converted entities of a batch
+
+        :param batch: the rows of the batch
+        :param results: list of (entity, quality failures or None if the quality checks have not yet been run)
+        :param merged: merged entities per row
+        :param write: function to write an entity
+        :return: None
+        """
+        validate = self.timer.wrap('validate', self.validator.validate)
+        validate_entity = self.timer.wrap('entity_validate', self.entity_validator.validate)
+
+        for row, merged_entities, (entity, quality_failures) in zip(batch, merged, results):
+            # The row of the entity is reported when the import fails
+            self.row = row
+
+            for merged_entity in merged_entities:
+                write(merged_entity)
+
+            validate(entity, quality_failures)
+
+            validate_entity(entity)
+
+            write(entity)
+
+    def find_failed_row(self, batch, n_rows):
+        """
+        Converts and checks the rows of a failed batch one by one, to report the row that fails
+
+        The extraction errors of the rows have already been logged when the batch was converted.
+
+        :param batch: the rows of the batch
+        :param n_rows: the number of rows that have been read up to and including the batch
+        :return: None, the failing row is the current row
+        """
+        with collect_extract_errors():
+            for n_rows, row in enumerate(batch, start=n_rows - len(batch) + 1):
+                self.row = row
+                self.n_rows = n_rows
+                try:
+                    self.validator.check_quality(self.converter.convert(row))
+                except Exception:
+                    return
+
+    def import_batches(self, rows, write, progress, batch_size):
+        """
+        Import the rows in chunks of batch_size rows
+
+        The rows of a chunk are injected, enriched and merged one by one and then converted in one batch.
+
+        :param rows: iterable of rows in external format
+        :param write: function to write an entity
+        :param progress: progress ticker
+        :param batch_size: number of rows per batch
+        :return: None
+        """
+        convert_batch = self.timer.wrap('convert', self.converter.convert_batch)
+
+        for batch, merged in self.prepare_batches(rows, progress, batch_size):
+            try:
+                entities = convert_batch(batch)
+            except Exception:
+                self.find_failed_row(batch, self.n_rows)
+                raise
+            self.write_batch(batch, [(entity, None) for entity in entities], merged, write)
+            self.checkpoint()
+
+    def import_parallel(self, rows, write, progress, batch_size):
+        """
+        Import the rows in chunks of batch_size rows that are converted and checked in worker processes
+
+        Injection, enrichment, merging, primary key and entity validation keep their state in this process.
+        The entities are written in the order of the rows.
+        The convert stage is timed as the time that is spent waiting for the results of the workers.
+
+        :param rows: iterable of rows in external format
+        :param write: function to write an entity
+        :param progress: progress ticker
+        :param batch_size: number of rows per batch
+        :return: None
+        """
+        # The number of rows is kept with each batch, the rows of the next batches are read while a batch is converted
+        batches = ((batch, (batch, merged, self.n_rows))
+                   for batch, merged in self.prepare_batches(rows, progress, batch_size))
+        try:
+            for (batch, merged, _), results in self.parallel.map(batches):
+                self.write_batch(batch, results, merged, write)
+        except Exception:
+            if self.parallel.failed:
+                # The batch has failed in a worker
+                batch, _, n_rows = self.parallel.failed
+                self.find_failed_row(batch, n_rows)
+            raise
+
+    def parallel_converter(self):
+        """
+        Returns the converter of the worker processes when the dataset asks for them (workers: number of processes)
+
+        The worker processes are forked when the converter is entered.
+        It should be entered before any thread is started (profiler, buffered writer, prefetching reader),
+        a forked process only has the forking thread and would inherit the locks of the other threads.
+
+        :return: the parallel converter, or a null context
+        """
+        workers = self.dataset.get("workers")
+        if not workers:
+            return nullcontext()
+        return ParallelConverter(self.converter, self.validator, workers, timer=self.timer)
+
+    def start_delta(self, write):
+        """
+        Starts a delta import when the dataset asks for it
+
+        Delta imports are only possible for full imports, because only then deleted entities can be derived
+
+        :param write: function that writes an entity to the contents file
+        :return: function that writes an entity of the import
+        """
+        if not (self.dataset.get("delta") and self.mode == ImportMode.FULL):
+            return write
+
+        if not DELTA_DIR:
+            self.logger.warning("No delta dir available, a full import is written")
+            return write
+
+        path = os.path.join(DELTA_DIR, f"{self.catalogue}_{self.entity}_{self.source_app}.db")
+        self.delta = DeltaWriter(path, write)
+        return self.delta.write
+
+    def finish_delta(self):
+        """
+        Stores the hashes of this delta import for the next import
+
+        The hashes of an import that has logged errors (e.g. too few records) are not stored,
+        the next import is compared to the last import without errors.
+
+        :return:
+        """
+        if self.logger.get_summary().get('errors'):
+            self.logger.warning("The import has errors, the delta is not stored for the next import")
+            self.delta.close()
+        else:
+            self.delta.commit()
+        self.logger.info(f"Delta import: {self.delta.counts}")
+
+    def _checkpoints_unavailable(self):
+        """
+        Tells why checkpoints are not available for this import
+
+        A checkpoint holds the complete state of the import. The state of merged imports
+        and of the validation of states grows with the collection, these imports are not checkpointed.
+
+        :return: the reason, or None if checkpoints are available
+        """
+        if not CHECKPOINT_DIR or not self.header.get("process_id"):
+            return "no checkpoint dir or process id"
+        if self.dataset.get("workers") or self.dataset.get("delta") or self.compression or self.shards > 1:
+            return "parallel, delta, compressed or sharded import"
+        if self.source.get("merge") or has_states(self.catalogue, self.entity):
+            return "merged import or collection with states"
+        return None
+
+    def init_checkpoints(self):
+        """
+        Initializes checkpoints when the dataset asks for them (checkpoint_every: number of rows)
+
+        The checkpoint file is specific for the import process, concurrent imports do not share a checkpoint
+
+        :return: (checkpointer, state of the checkpoint to resume from) or (None, None)
+        """
+        every = self.dataset.get("checkpoint_every")
+        if not every:
+            return None, None
+
+        reason = self._checkpoints_unavailable()
+        if reason:
+            self.logger.warning(f"Checkpoints are not available for this import: {reason}")
+            return None, None
+
+        process_id = self.header["process_id"]
+        name = f"{self.catalogue}_{self.entity}_{self.source_app}_{process_id}.checkpoint"
+        checkpointer = Checkpointer(os.path.join(CHECKPOINT_DIR, name), every, process_id)
+        return checkpointer, checkpointer.load()
+
+    def skip_processed_rows(self, rows):
+        """
+        Skips the rows that have been processed before the checkpoint to resume from
+
+        The source should return the rows in the same order as before, this is checked
+        by comparing the source id of the last skipped row to the source id at the checkpoint.
+
+        :param rows: iterable of rows in external format
+        :return: iterator of the rows after the checkpoint
+        """
+        rows = iter(rows)
+        row = None
+        for row in islice(rows, self.checkpointer.last):
+            pass
+
+        if self.checkpointer.last and (row and row.get(self.source_id)) != self.checkpointer.last_source_id:
+            # The checkpoint is of no use to a next retry either
+            self.checkpointer.remove()
+            raise GOBException(f"The rows of {self.source_app} are not returned in the same order, "
+                               f"the import cannot resume after row {self.checkpointer.last}")
+        return rows
+
+    def start_checkpoints(self, checkpointer, writer, state):
+        """
+        Starts to save checkpoints, restores the state of the checkpoint to resume from, if any
+
+        :param checkpointer:
+        :param writer: the contents writer
+        :param state: the state of the checkpoint to resume from, or None
+        :return:
+        """
+        self.checkpointer = checkpointer
+        self.writer = writer
+
+        if state:
+            self.logger.info(f"Resume import after row {checkpointer.last}")
+            self.validator.primary_keys = state['primary_keys']
+            self.validator.collection_qa = state['collection_qa']
+            self.validator.fatal = state['fatal']
+            self.entity_validator = state['entity_validator']
+            self.enricher = state['enricher']
+            self.merger.merged = state['merged']
+            self.issues.restore(state['issues'])
+            self.sample = self.validator.sample = state['qa_sample']
+        else:
+            # Keep the primary keys in a file that can be restored
+            self.validator.primary_keys = PrimaryKeys(path=checkpointer.keys_path)
+
+    def checkpoint(self):
+        """
+        Saves a checkpoint when due
+
+        :return:
+        """
+        if self.checkpointer and self.checkpointer.due(self.n_rows):
+            # The issues up to the checkpoint are logged, the issues after the checkpoint are logged again on resume
+            self.issues.flush()
+            self.checkpointer.save(self.n_rows, {
+                'writer': self.writer.position(),
+                'primary_keys': self.validator.primary_keys,
+                'collection_qa': self.validator.collection_qa,
+                'fatal': self.validator.fatal,
+                'entity_validator': self.entity_validator,
+                'enricher': self.enricher,
+                'merged': self.merger.merged,
+                'issues': self.issues,
+                'qa_sample': self.sample,
+            }, self.row.get(self.source_id))
+
+    def finish_import(self):
+        """
+        Finishes a successful import
+
+        :return:
+        """
+        if self.delta:
+            self.finish_delta()
+
+        if self.checkpointer:
+            self.checkpointer.remove()
+
+    def init_profiler(self):
+        """
+        Initializes a profiler when the message header asks for it (profile: cpu or alloc)
+
+        :return: the profiler, or None
+        """
+        kind = self.header.get("profile")
+        if not kind:
+            return None
+
+        if kind not in PROFILE_KINDS or not PROFILE_DIR:
+            self.logger.warning(f"Profile {kind} is not available, the import is not profiled")
+            return None
+
+        timestamp = datetime.datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        return Profiler(kind, PROFILE_DIR, f"{self.catalogue}_{self.entity}_{self.source_app}_{timestamp}_{kind}")
+
+    def contents_writer(self, checkpointer=None, state=None):
+        """
+        Returns a writer for the contents of the import
+
+        :param checkpointer: the checkpointer of the import, if any
+        :param state: the state of the checkpoint to resume from, or None
+        :return:
+        """
+        if checkpointer:
+            return ResumableContentsWriter(state and state['writer'])
+        if self.shards > 1:
+            return ShardedContentsWriter(self.shards, self._file_writer, self.compression and self.compression[0])
+        if self.compression or self.buffered_write():
+            return self._file_writer()
+        # The gobcore contents writer writes the contents when they are not compressed or buffered
+        return ContentsWriter()
+
+    def _file_writer(self):
+        return CompressedContentsWriter(*self.compression) if self.compression else FileContentsWriter()
+
+    def buffered_write(self):
+        """
+        Tells whether the dataset or the header asks to write on a background thread (buffered_write),
+        the header overrides the dataset
+
+        :return:
+        """
+        return bool(self.header.get("buffered_write", self.dataset.get("buffered_write")))
+
+    def buffered_writer(self, writer):
+        """
+        Returns a writer that writes on a background thread when the import asks for it
+
+        :param writer: the open contents writer
+        :return: the buffered writer, or a null context for the contents writer
+        """
+        if self.buffered_write():
+            return BufferedWriter(writer)
+        return nullcontext(writer)
+
+    def init_compression(self):
+        """
+        Resolves the compression of the contents files, the message header overrides the dataset
+
+        An unknown codec fails the import
+
+        :return: (codec, level) or None if the contents files are not compressed
+        """
+        return get_compression(self.dataset.get('compression'), self.header.get('compression'))
+
+    def init_shards(self):
+        """
+        Resolves the number of contents files, sharded by _source_id, the message header overrides the dataset
+
+        An invalid number of shards fails the import
+
+        :return: the number of shards
+        """
+        shards = self.header.get('shards') or self.dataset.get('shards') or 1
+        try:
+            n_shards = int(shards)
+        except (TypeError, ValueError):
+            n_shards = 0
+        if n_shards < 1:
+            raise GOBException(f"The number of shards should be a positive integer, not {shards}")
+        return n_shards
+
+    def init_issue_sample_size(self):
+        """
+        Resolves the number of issues per check, attribute and level that are logged individually
+
+        An invalid sample size fails the import
+
+        :return: the issue sample size
+        """
+        size = self.dataset.get('issue_sample_size', ISSUE_SAMPLE_SIZE)
+        try:
+            sample_size = int(size)
+        except (TypeError, ValueError):
+            sample_size = -1
+        if sample_size < 0:
+            raise GOBException(f"The issue sample size should be a non negative integer, not {size}")
+        return sample_size
+
+    def init_sample(self):
+        """
+        Resolves the QA sample, the WARNING and INFO checks can run on a sample of the entities
+
+        An invalid sample rate fails the import
+
+        :return: None
+        """
+        self.sample = QASample(self.dataset.get("qa_sample_rate"))
+        if self.sample.active:
+            # The validators select the checks that run on the sample when they are created
+            self.validator = Validator(self.source_app, self.catalogue, self.entity, self.dataset, self.sample)
+            self.entity_validator = EntityValidator(self.catalogue, self.entity, self.func_source_id, self.sample)
+
     def import_dataset(self):
         try:
             self.row = None
+            self.timer.start()
 
-            with ContentsWriter() as writer, \
+            self.compression = self.init_compression()
+            self.shards = self.init_shards()
+            self.issues.sample_size = self.init_issue_sample_size()
+            self.init_sample()
+
+            checkpointer, state = self.init_checkpoints()
+
+            self.profiler = self.init_profiler()
+
+            # The worker processes are started first, before any thread is started
+            with self.parallel_converter() as parallel, \
+                    self.issues.collect(), \
+                    self.profiler or nullcontext(), \
+                    self.contents_writer(checkpointer, state) as writer, \
+                    self.buffered_writer(writer) as output, \
                     ProgressTicker(f"Import {self.catalogue} {self.entity}", 10000) as progress:
 
                 self.filename = writer.filename
 
+                write = self.start_delta(output.write)
+
                 self.merger.prepare(progress)
 
-                self.import_rows(writer.write, progress)
+                # The workers convert the rows of the dataset, not the rows of a merge dataset
+                self.parallel = parallel
 
-                self.merger.finish(writer.write)
+                if checkpointer:
+                    self.start_checkpoints(checkpointer, output, state)
+
+                self.import_rows(write, progress)
+
+                self.merger.finish(write)
 
                 self.entity_validator.result()
 
+                if self.delta:
+                    # The deleted entities follow the new and changed entities
+                    self.delta.write_deleted()
+
+            # All entities are in the contents file when the writers have been closed
+            self.finish_import()
+
         except Exception as e:
             # Print error message, the message that caused the error and a short stacktrace
             stacktrace = traceback.format_exc(limit=-5)
@@ -173,5 +709,9 @@ class ImportClient:
                         self.source_id: "" if self.row is None else self.row[self.source_id],
                     }
                 })
+            if self.delta:
+                # The store of the previous import remains the base for the next import
+                self.delta.close()
+                self.delta = None
 
         return self.get_result_msg()
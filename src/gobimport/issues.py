@@ -0,0 +1,248 @@
+"""
+Issues
+
+Aggregated logging of the quality issues of an import
+
+The issues are counted per check, attribute and level.
+Only the first ISSUE_SAMPLE_SIZE issues of each check, attribute and level are kept as individual issues,
+an Issue is only built for these issues. The individual issues are passed to the logger in batches,
+with one log message per check, attribute and level for each batch. When the import finishes the counts are logged
+for the checks that have more issues than have been logged, with a sample of the offending ids and values.
+
+A source that has gone bad can produce millions of issues, logging every issue would dominate the import time.
+
+The aggregator is owned by the ImportClient and collects the issues that are logged with add_issue or log_issue
+of this module while the import runs. Outside an import the issue is logged directly, like log_issue of gobcore.
+
+Issues of checks that only run on a sample of the entities are counted apart, see gobimport.sampling.
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from gobcore.logging.logger import logger
+from gobcore.quality.issue import QA_LEVEL, Issue
+from gobcore.quality.issue import log_issue as _log_issue
+
+
+# Number of issues per check, attribute and level that are logged individually
+ISSUE_SAMPLE_SIZE = 1000
+
+# Number of offending ids and values per check, attribute and level that are reported with the counts
+ISSUE_SAMPLE_VALUES = 10
+
+# Number of individual issues that are passed to the logger at once
+ISSUE_FLUSH_SIZE = 1000
+
+# The data log method of the logger per QA_LEVEL
+DATA_LOG = {
+    QA_LEVEL.FATAL: 'data_error',
+    QA_LEVEL.ERROR: 'data_error',
+    QA_LEVEL.WARNING: 'data_warning',
+    QA_LEVEL.INFO: 'data_info',
+}
+
+# The aggregator of the running import
+_issues = ContextVar('issues', default=None)
+
+# Whether the issues that are logged are issues of checks that only run on a sample of the entities
+_sampled = ContextVar('sampled', default=False)
+
+
+def _sample_value(value):
+    # The samples are reported in the summary of the result message
+    return value if value is None or isinstance(value, (str, int, float, bool)) else str(value)
+
+
+class IssueAggregator:
+
+    def __init__(self, sample_size: int = ISSUE_SAMPLE_SIZE, flush_size: int = ISSUE_FLUSH_SIZE):
+        """
+        :param sample_size: the number of issues per check, attribute and level that are logged individually
+        :param flush_size: the number of individual issues that are passed to the logger at once
+        """
+        self.sample_size = sample_size
+        self.flush_size = flush_size
+        self.counts = Counter()
+        self.samples = {}
+        self.pending = []
+
+    def add(self, level, issue, sampled=False):
+        """
+        Adds an issue
+
+        :param level: the QA_LEVEL of the issue
+        :param issue: the gobcore Issue
+        :param sampled: whether the check only runs on a sample of the entities
+        :return:
+        """
+        key = issue.check.get('msg'), issue.attribute, level, sampled
+        self._sample(key, self._count(key), level, issue)
+
+    def add_check(self, level, check, entity, id_attribute, attribute, sampled=False):
+        """
+        Adds an issue of a check on an entity
+
+        The Issue is only built when the issue is sampled, a failing check on millions of entities
+        only builds the issues that are logged individually.
+
+        :param level: the QA_LEVEL of the issue
+        :param check: the QA_CHECK that failed
+        :param entity: the entity on which the check failed
+        :param id_attribute: the name of the id attribute of the entity
+        :param attribute: the name of the checked attribute
+        :param sampled: whether the check only runs on a sample of the entities
+        :return:
+        """
+        key = check.get('msg'), attribute, level, sampled
+        count = self._count(key)
+        if count <= max(self.sample_size, ISSUE_SAMPLE_VALUES):
+            self._sample(key, count, level, Issue(check, entity, id_attribute, attribute))
+
+    def _count(self, key):
+        count = self.counts[key] = self.counts[key] + 1
+        if count == 1:
+            self.samples[key] = []
+        return count
+
+    def _sample(self, key, count, level, issue):
+        if count <= ISSUE_SAMPLE_VALUES:
+            self.samples[key].append({'id': _sample_value(issue.entity_id), 'value': _sample_value(issue.value)})
+
+        if count <= self.sample_size:
+            self.pending.append((level, issue))
+            if len(self.pending) >= self.flush_size:
+                self.flush()
+
+    def flush(self):
+        """
+        Passes the pending individual issues to the logger
+
+        The issues are added to the issues of the logger, the log gets one message
+        per check, attribute and level for all pending issues instead of one message per issue.
+
+        :return:
+        """
+        batches = defaultdict(list)
+        for level, issue in self.pending:
+            logger.add_issue(issue, level)
+            batches[(issue.check.get('msg'), issue.attribute, level)].append(issue)
+        self.pending = []
+
+        for (msg, attribute, level), issues in batches.items():
+            log = getattr(logger, DATA_LOG[level])
+            log(f"{msg} ({attribute}): {len(issues)} issues", {'data': {
+                'check': msg,
+                'attribute': attribute,
+                'level': level,
+                'count': len(issues),
+                'issues': [{'id': _sample_value(i.entity_id), 'value': _sample_value(i.value)} for i in issues],
+            }})
+
+    def restore(self, issues):
+        """
+        Continues with the counts of the issues of a checkpoint
+
+        :param issues: the aggregator of the checkpoint
+        :return:
+        """
+        self.counts = issues.counts
+        self.samples = issues.samples
+
+    @contextmanager
+    def collect(self):
+        """
+        Collects the issues that are logged within the context
+
+        :return:
+        """
+        token = _issues.set(self)
+        try:
+            yield self
+        finally:
+            _issues.reset(token)
+
+    def summary(self):
+        """
+        Returns the counts per check, attribute and level
+
+        :return:
+        """
+        return [{
+            'check': msg,
+            'attribute': attribute,
+            'level': level,
+            'count': count,
+            'logged': min(count, self.sample_size),
+            'sample': self.samples[(msg, attribute, level, sampled)],
+            'sampled': sampled,
+        } for (msg, attribute, level, sampled), count in self.counts.items()]
+
+    def finish(self):
+        """
+        Logs the pending issues and the counts of the issues that have not all been logged individually
+
+        :return: the counts per check, attribute and level
+        """
+        self.flush()
+        summary = self.summary()
+        for issues in summary:
+            if issues['count'] > issues['logged']:
+                log = logger.error if issues['level'] in (QA_LEVEL.FATAL, QA_LEVEL.ERROR) else logger.warning
+                log(f"{issues['check']} ({issues['attribute']}): {issues['count']} issues, "
+                    f"{issues['count'] - issues['logged']} have not been logged individually",
+                    {'data': issues})
+        return summary
+
+
+def add_issue(logger, level, check, entity, id_attribute, attribute, sampled=False):
+    """
+    Logs an issue of a check on an entity, adds it to the issues of the running import if any
+
+    Within an import the Issue is only built when it is logged individually, see IssueAggregator.add_check.
+
+    :param logger: the logger to log the issue to outside an import
+    :param level: the QA_LEVEL of the issue
+    :param check: the QA_CHECK that failed
+    :param entity: the entity on which the check failed
+    :param id_attribute: the name of the id attribute of the entity
+    :param attribute: the name of the checked attribute
+    :param sampled: whether the check only runs on a sample of the entities
+    :return:
+    """
+    issues = _issues.get()
+    if issues is None:
+        _log_issue(logger, level, Issue(check, entity, id_attribute, attribute))
+    else:
+        issues.add_check(level, check, entity, id_attribute, attribute, sampled or _sampled.get())
+
+
+def log_issue(logger, level, issue, sampled=False):
+    """
+    Logs an issue, adds it to the issues of the running import if any
+
+    :param logger: the logger to log the issue to outside an import
+    :param level: the QA_LEVEL of the issue
+    :param issue: the gobcore Issue
+    :param sampled: whether the check only runs on a sample of the entities
+    :return:
+    """
+    issues = _issues.get()
+    if issues is None:
+        _log_issue(logger, level, issue)
+    else:
+        issues.add(level, issue, sampled or _sampled.get())
+
+
+@contextmanager
+def sampled_issues():
+    """
+    Marks the issues that are logged within the context as issues of checks that only run on a sample
+
+    :return:
+    """
+    token = _sampled.set(True)
+    try:
+        yield
+    finally:
+        _sampled.reset(token)
@@ -12,10 +12,81 @@ A merging definition always consists of configuration in model.json and code in
 The only merging logic that is implemented is to merge DIVA into DGDialog ("diva_into_dgdialog")
 
 Note: The data to be merged is kept in memory during the import.
+Once more than spill_size entities (merge definition, default MERGE_SPILL_SIZE) have been collected
+the data is spilled to a local sqlite database, so that the memory usage remains bounded.
 When large data collections need to be merged then GOB-Prepare is considered a better place
 Data can then be merged using a database
 """
-from gobconfig.import_.import_config import get_import_definition_by_filename
+import os
+import pickle
+import sqlite3
+import tempfile
+
+from itertools import groupby
+from operator import itemgetter
+
+from gobimport.definitions import get_import_definition_by_filename
+
+
+# Number of collected entities after which the merge items are spilled to disk
+MERGE_SPILL_SIZE = 100000
+
+# Number of entities that are inserted at once in the spill database
+SPILL_BATCH_SIZE = 1000
+
+
+class SpilledMergeItems:
+    """
+    Merge items that are stored in a local sqlite database instead of in memory
+
+    Offers the part of the dict interface that is used by the Merger.
+    The items are returned in the order in which their keys were first added.
+    """
+
+    def __init__(self, merge_items=None):
+        """
+        :param merge_items: optional in memory merge items to start with
+        """
+        self.dir = tempfile.TemporaryDirectory(prefix="merge_")
+        self.db = sqlite3.connect(os.path.join(self.dir.name, "merge_items.db"))
+        self.db.execute("CREATE TABLE keys (seq INTEGER PRIMARY KEY, key)")
+        self.db.execute("CREATE INDEX keys_key ON keys (key)")
+        self.db.execute("CREATE TABLE entities (seq INTEGER PRIMARY KEY, key, entity BLOB)")
+        self.db.execute("CREATE INDEX entities_key ON entities (key)")
+        self.pending = []
+
+        for key, merge_item in (merge_items or {}).items():
+            for entity in merge_item["entities"]:
+                self.add(key, entity)
+
+    def add(self, key, entity):
+        self.pending.append((key, pickle.dumps(entity, pickle.HIGHEST_PROTOCOL)))
+        if len(self.pending) >= SPILL_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.db.executemany("INSERT INTO keys (key) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM keys WHERE key IS ?)",
+                                ((key, key) for key, _ in self.pending))
+            self.db.executemany("INSERT INTO entities (key, entity) VALUES (?, ?)", self.pending)
+            self.pending = []
+
+    def get(self, key, default=None):
+        self._flush()
+        rows = self.db.execute("SELECT entity FROM entities WHERE key IS ? ORDER BY seq", (key,))
+        entities = [pickle.loads(entity) for entity, in rows]
+        return {"entities": entities} if entities else default
+
+    def items(self):
+        self._flush()
+        rows = self.db.execute("SELECT e.key, e.entity FROM keys k JOIN entities e ON e.key IS k.key "
+                               "ORDER BY k.seq, e.seq")
+        for key, group in groupby(rows, key=itemgetter(0)):
+            yield key, {"entities": [pickle.loads(entity) for _, entity in group]}
+
+    def close(self):
+        self.db.close()
+        self.dir.cleanup()
 
 
 class Merger:
@@ -30,7 +101,8 @@ class Merger:
         self.import_client = import_client
         self.merge_def = None
         self.merge_items = {}
-        self.merged = []
+        self.n_collected = 0
+        self.merged = set()
 
     def _collect_entity(self, entity, merge_def):
         """
@@ -40,9 +112,17 @@ class Merger:
         :return:
         """
         on = entity[merge_def["on"]]
+        if isinstance(self.merge_items, SpilledMergeItems):
+            self.merge_items.add(on, entity)
+            return
+
         self.merge_items[on] = self.merge_items.get(on, {"entities": []})
         self.merge_items[on]["entities"].append(entity)
 
+        self.n_collected += 1
+        if self.n_collected > merge_def.get("spill_size", MERGE_SPILL_SIZE):
+            self.merge_items = SpilledMergeItems(self.merge_items)
+
     def _merge_diva_into_dgdialog(self, entity, write, entities):
         """
         DIVA entities are merged into DGDialog by matching volgnummer 1 in DGDialog with the highest volgnummer in DIVA
@@ -112,7 +192,7 @@ class Merger:
 
                 self.merge_func(entity, write, entities)
 
-                self.merged.append(entity[on])
+                self.merged.add(entity[on])
 
     def finish(self, write):
         """
@@ -127,4 +207,6 @@ class Merger:
                 if on not in self.merged:
                     for entity in merge_item["entities"]:
                         write(entity)
+            if isinstance(self.merge_items, SpilledMergeItems):
+                self.merge_items.close()
             self.merge_items = {}
@@ -0,0 +1,111 @@
+"""
+Parallel conversion
+
+Converts batches of rows and runs the stateless quality checks on the resulting entities
+in a pool of worker processes.
+
+The stateful steps of an import (injection, enrichment, merging, primary key validation,
+entity validation and writing) remain in the importing process.
+The results are returned in the order in which the batches were submitted.
+The workers do not log, the extraction errors of a batch are returned with its results and
+logged by the importing process.
+
+The worker processes are forked from the importing process, so they inherit the
+(compiled) converter and validator without them having to be pickled.
+"""
+import multiprocessing
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from gobcore.logging.logger import logger
+
+from gobimport.converter import collect_extract_errors
+
+
+# The converter and validator that are used by the worker processes
+_worker = None
+
+
+def _convert_batch(rows):
+    """
+    Convert a batch of rows and run the quality checks on the resulting entities
+
+    This function runs in a worker process
+
+    :param rows:
+    :return: list of (entity, quality failures), list of extraction errors
+    """
+    converter, validator = _worker
+    with collect_extract_errors() as errors:
+        results = [(entity, validator.check_quality(entity)) for entity in converter.convert_batch(rows)]
+    return results, errors
+
+
+def _result(future):
+    return future.result()
+
+
+class ParallelConverter:
+
+    def __init__(self, converter, validator, workers: int, max_pending: int = None, timer=None):
+        """
+        :param converter: the converter for the rows
+        :param validator: the validator that runs the quality checks
+        :param workers: the number of worker processes
+        :param max_pending: the maximum number of batches that are being processed at any time
+        :param timer: optional StageTimer to time the waiting for results as the convert stage
+        """
+        self.converter = converter
+        self.validator = validator
+        self.workers = workers
+        self.max_pending = max_pending or 2 * workers
+        self.pool = None
+        self._result = timer.wrap('convert', _result) if timer else _result
+        # The context of the batch that has failed in a worker, if any
+        self.failed = None
+
+    def __enter__(self):
+        global _worker
+        _worker = (self.converter, self.validator)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('fork'))
+        # Start the workers now. The converter is entered before any other thread of the import is started
+        # (profiler, buffered writer, prefetching reader), a forked worker would inherit the locks of these threads
+        self.pool.submit(int).result()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global _worker
+        self.pool.shutdown(wait=True, cancel_futures=exc_type is not None)
+        self.pool = None
+        _worker = None
+
+    def map(self, batches):
+        """
+        Convert and check the rows of the given batches
+
+        Batches are read lazily, at most max_pending batches are submitted to the workers at any time
+
+        :param batches: iterable of (rows, context)
+        :return: generator of (context, [(entity, quality failures), ...]) in the order of the batches
+        """
+        pending = deque()
+        for rows, context in batches:
+            pending.append((context, self.pool.submit(_convert_batch, rows)))
+            if len(pending) >= self.max_pending:
+                yield self._next(pending)
+
+        while pending:
+            yield self._next(pending)
+
+    def _next(self, pending):
+        context, future = pending.popleft()
+        try:
+            results, errors = self._result(future)
+        except Exception:
+            self.failed = context
+            raise
+
+        for error in errors:
+            logger.error(error)
+        return context, results
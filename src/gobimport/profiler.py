@@ -0,0 +1,187 @@
+"""
+Profiler
+
+An import can be profiled on demand by setting profile in the header of the import message:
+
+    "profile": "cpu"    cProfile statistics of the import and sampled (wall clock) call stacks of all threads
+    "profile": "alloc"  tracemalloc snapshot of the memory that is held at the end of the import
+
+Besides the profile a collapsed stack file is written, one line per call stack with its number of samples
+or allocated bytes, that can be turned into a flamegraph, e.g. with flamegraph.pl or speedscope.
+The files are written to PROFILE_DIR and referenced in the summary of the result message.
+A profile that cannot be written is logged as a warning, it does not fail the import.
+"""
+import cProfile
+import os
+import sys
+import threading
+import tracemalloc
+
+from collections import Counter
+from functools import partial
+
+from gobcore.exceptions import GOBException
+from gobcore.logging.logger import logger
+
+
+PROFILE_KINDS = ('cpu', 'alloc')
+
+# Number of seconds between two samples of the call stacks
+SAMPLE_INTERVAL = 0.01
+
+# Number of frames that are stored for each allocation
+ALLOC_FRAMES = 32
+
+
+def _frame_name(frame):
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+def _stack(frame):
+    """
+    Returns the call stack of a frame
+
+    :param frame:
+    :return: tuple of frame names, the outermost frame first
+    """
+    stack = []
+    while frame is not None:
+        stack.append(_frame_name(frame))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+def write_collapsed(filename, stacks: Counter):
+    """
+    Writes the stacks in collapsed format, a line "frame;frame;frame count" per stack
+
+    :param filename:
+    :param stacks: count per call stack
+    :return:
+    """
+    with open(filename, "w") as file:
+        for stack, count in stacks.most_common():
+            file.write(f"{';'.join(frame.replace(';', ':') for frame in stack)} {count}\n")
+
+
+class StackSampler:
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        """
+        :param interval: the number of seconds between two samples
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """
+        Counts the current call stack of each thread, except the thread of the sampler
+
+        :return:
+        """
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != threading.get_ident():
+                self.stacks[(names.get(ident, str(ident)),) + _stack(frame)] += 1
+
+
+class Profiler:
+
+    def __init__(self, kind, directory, name):
+        """
+        :param kind: cpu or alloc
+        :param directory: the directory to write the profile to
+        :param name: the name of the profile files
+        """
+        if kind not in PROFILE_KINDS:
+            raise GOBException(f"Unknown profile {kind}, expected one of {', '.join(PROFILE_KINDS)}")
+        self.kind = kind
+        self.directory = directory
+        self.path = os.path.join(directory, name)
+        self.files = {}
+        self.peak = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # A failed import is profiled as well
+        self.stop()
+
+    def start(self):
+        if self.kind == 'cpu':
+            self.sampler = StackSampler()
+            self.sampler.start()
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            tracemalloc.start(ALLOC_FRAMES)
+
+    def stop(self):
+        """
+        Stops profiling and writes the profile and the collapsed stacks
+
+        The files are only referenced in the summary when they have all been written
+
+        :return:
+        """
+        if self.kind == 'cpu':
+            self.profile.disable()
+            self.sampler.stop()
+            write = self._write_cpu
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            write = partial(self._write_alloc, snapshot)
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.files = write()
+        except OSError as e:
+            logger.warning(f"The {self.kind} profile could not be written: {e}")
+
+    def _write_cpu(self):
+        files = {'profile': f"{self.path}.prof", 'collapsed': f"{self.path}.collapsed"}
+        self.profile.dump_stats(files['profile'])
+        write_collapsed(files['collapsed'], self.sampler.stacks)
+        return files
+
+    def _write_alloc(self, snapshot):
+        files = {'profile': f"{self.path}.tracemalloc", 'collapsed': f"{self.path}.collapsed"}
+        snapshot.dump(files['profile'])
+        stacks = Counter()
+        for stat in snapshot.statistics('traceback'):
+            # The frames of a traceback are ordered from the oldest to the most recent frame
+            stacks[tuple(f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in stat.traceback)] \
+                += stat.size
+        write_collapsed(files['collapsed'], stacks)
+        return files
+
+    def summary(self):
+        """
+        Returns the references to the profile files
+
+        :return: the summary, or None if the profile has not been written
+        """
+        if not self.files:
+            return None
+
+        summary = {'kind': self.kind, **self.files}
+        if self.peak is not None:
+            summary['peak_bytes'] = self.peak
+        return summary
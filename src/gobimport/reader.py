@@ -3,15 +3,30 @@ Reader
 
 Contains logic to connect and read from a variety of datasources
 """
+import queue
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 from gobcore.typesystem import GOB_SECURE_TYPES
 from gobcore.enum import ImportMode
-from gobcore.model import GOBModel
 from gobcore.secure.crypto import read_protect
 
 from gobcore.logging.logger import logger
 from gobconfig.datastore.config import get_datastore_config
 from gobcore.datastore.factory import DatastoreFactory
 
+from gobimport.definitions import get_collection
+from gobimport.utils import iter_chunks
+
+
+# Number of rows that are passed at once from the prefetch thread to the reader
+PREFETCH_BATCH_SIZE = 1000
+
+# Number of rows that are read protected at once by a protect thread
+PROTECT_BATCH_SIZE = 1000
+
 
 class Reader:
 
@@ -22,6 +37,9 @@ class Reader:
         application: name of the application or source that holds the data, e.g. Neuron, DIVA, ...
         query:       any query to run on the dataset that is being imported, e.g. a SQL query
         config:      any configuration parameters, e.g. encoding
+        read_config: read configuration, passed to the datastore.
+                     prefetch: the number of row batches to read ahead in a background thread
+                     protect_workers: the number of threads that read protect secure values
 
         :param source: source definition object
         :param app: name of the import (often equal to source.application)
@@ -35,7 +53,7 @@ class Reader:
 
         catalogue = dataset['catalogue']
         entity = dataset['entity']
-        gob_attributes = GOBModel().get_collection(catalogue, entity)["all_fields"]
+        gob_attributes = get_collection(catalogue, entity)["all_fields"]
 
         self.secure_attributes = []
         self.set_secure_attributes(mapping, gob_attributes)
@@ -75,19 +93,57 @@ class Reader:
 
         logger.info(f"Connection to {self.app} {self.datastore.user} has been made.")
 
-    def _protect_row(self, row):
-        for attr in row.keys():
-            if attr in self.secure_attributes:
+    def _secure_columns(self):
+        """
+        Returns the source columns that hold secure values, without duplicates
+
+        :return:
+        """
+        return tuple(dict.fromkeys(attr for attr in self.secure_attributes if isinstance(attr, str)))
+
+    def _protect_row(self, row, columns=None):
+        # Only visit the secure columns of the row
+        for attr in self._secure_columns() if columns is None else columns:
+            if attr in row:
                 row[attr] = read_protect(row[attr])
         return row
 
+    def _protect_rows(self, rows, columns):
+        return [self._protect_row(row, columns) for row in rows]
+
     def _query(self, query):
         if self.secure_attributes:
-            for result in query:
-                yield self._protect_row(result)
+            columns = self._secure_columns()
+            workers = self.source.get('read_config', {}).get('protect_workers')
+            if workers:
+                yield from self._query_protect_parallel(query, columns, workers)
+            else:
+                for result in query:
+                    yield self._protect_row(result, columns)
         else:
             yield from query
 
+    def _query_protect_parallel(self, query, columns, workers):
+        """
+        Read protects batches of rows in a pool of threads
+
+        The rows are yielded in the order of the query, at most 2 * workers batches are protected at any time
+
+        :param query: the rows to protect
+        :param columns: the secure columns
+        :param workers: the number of threads
+        :return: generator of protected rows
+        """
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="protect") as pool:
+            pending = deque()
+            for batch in iter_chunks(query, PROTECT_BATCH_SIZE):
+                pending.append(pool.submit(self._protect_rows, batch, columns))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+
+            while pending:
+                yield from pending.popleft().result()
+
     def read(self):  # noqa: C901
         """Read the data from the data source
 
@@ -108,4 +164,68 @@ class Reader:
                 logger.error(f"Unknown import mode for the collection: '{self.mode.value}'")
                 raise e
 
-        return self._query(self.datastore.query("\n".join(source_query)))
+        rows = self._query(self.datastore.query("\n".join(source_query)))
+
+        # Optionally read ahead in a background thread, so that fetching overlaps with processing
+        prefetch = self.source.get('read_config', {}).get('prefetch')
+        return iter(Prefetcher(rows, prefetch)) if prefetch else rows
+
+
+class _PrefetchError:
+    """Wraps an exception that occurred in the prefetch thread"""
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class Prefetcher:
+    """
+    Reads rows in a background thread into a bounded queue of row batches
+
+    The rows are yielded in the original order.
+    Any exception that occurs while reading is raised in the consuming thread.
+    """
+
+    _END = object()
+
+    def __init__(self, rows, depth: int, batch_size: int = PREFETCH_BATCH_SIZE):
+        """
+        :param rows: the rows to read
+        :param depth: the maximum number of row batches in the queue
+        :param batch_size: the number of rows per batch
+        """
+        self.rows = rows
+        self.batch_size = batch_size
+        self.batches = queue.Queue(maxsize=depth)
+        self.stopped = threading.Event()
+
+    def _put(self, item):
+        # Stop waiting for room in the queue when the consumer has stopped
+        while not self.stopped.is_set():
+            try:
+                self.batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _fill(self):
+        try:
+            for batch in iter_chunks(self.rows, self.batch_size):
+                if not self._put(batch):
+                    return
+            self._put(self._END)
+        except Exception as e:
+            self._put(_PrefetchError(e))
+
+    def __iter__(self):
+        thread = threading.Thread(target=self._fill, name="prefetch", daemon=True)
+        thread.start()
+
+        try:
+            while (batch := self.batches.get()) is not self._END:
+                if isinstance(batch, _PrefetchError):
+                    raise batch.exception
+                yield from batch
+        finally:
+            self.stopped.set()
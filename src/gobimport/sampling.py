@@ -0,0 +1,110 @@
+"""
+QA sampling
+
+The WARNING and INFO quality checks of an import can run on a sample of the entities, e.g.:
+
+    "qa_sample_rate": 0.1
+
+FATAL and ERROR checks and the primary key checks always run on every entity.
+
+The sample is chosen by a hash of the _source_id of an entity, so the same entities are checked
+in every import and in every process. The counts of the issues of the sampled checks are extrapolated
+to the whole collection.
+"""
+import zlib
+
+from gobcore.exceptions import GOBException
+from gobcore.model.metadata import FIELD
+from gobcore.quality.issue import QA_LEVEL
+
+
+# The levels of the checks that run on the sample
+QA_SAMPLE_LEVELS = (QA_LEVEL.WARNING, QA_LEVEL.INFO)
+
+# The sample is chosen by the crc32 of the _source_id, it is cheap compared to the checks that it saves
+_HASH_RANGE = 2 ** 32
+
+
+def in_sample(source_id, rate: float):
+    """
+    Tells whether the entity with the given source id is in the sample
+
+    Entities without source id are always in the sample
+
+    :param source_id:
+    :param rate: the fraction of the entities in the sample
+    :return:
+    """
+    if rate >= 1 or source_id is None:
+        return True
+    return zlib.crc32(str(source_id).encode()) < rate * _HASH_RANGE
+
+
+class QASample:
+
+    def __init__(self, rate=None):
+        """
+        :param rate: the fraction of the entities on which the sampled checks run, all entities if not set
+        """
+        try:
+            self.rate = 1 if rate is None else float(rate)
+        except (TypeError, ValueError):
+            self.rate = 0
+        if not 0 < self.rate <= 1:
+            raise GOBException(f"QA sample rate should be > 0 and <= 1, not {rate}")
+        self.entities = 0
+        self.sampled = 0
+
+    @property
+    def active(self):
+        return self.rate < 1
+
+    def includes(self, entity):
+        """
+        Tells whether the sampled checks should run on the entity
+
+        :param entity:
+        :return:
+        """
+        return in_sample(entity.get(FIELD.SOURCE_ID), self.rate)
+
+    def count(self, entity):
+        """
+        Counts the entity, for the extrapolation of the issue counts
+
+        :param entity:
+        :return: whether the sampled checks should run on the entity
+        """
+        included = self.includes(entity)
+        self.entities += 1
+        self.sampled += included
+        return included
+
+    def extrapolate(self, count: int):
+        """
+        Returns the extrapolated count of issues that have been found in the sample
+
+        :param count:
+        :return:
+        """
+        return round(count * self.entities / self.sampled) if self.sampled else count
+
+    def summary(self, issues):
+        """
+        Returns the summary of the sample, with the extrapolated counts of the sampled issues
+
+        :param issues: the summary of the issues of the import
+        :return:
+        """
+        return {
+            'rate': self.rate,
+            'entities': self.entities,
+            'sampled': self.sampled,
+            'issues': [{
+                'check': issue['check'],
+                'attribute': issue['attribute'],
+                'level': issue['level'],
+                'count': issue['count'],
+                'extrapolated': self.extrapolate(issue['count']),
+            } for issue in issues if issue.get('sampled')],
+        }
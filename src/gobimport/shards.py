@@ -0,0 +1,151 @@
+"""
+Shards
+
+The entities of an import can be written to multiple contents files (shards), so that the next steps
+can process the shards in parallel. An entity is written to the shard of the hash of its _source_id.
+
+The shards are listed in a manifest, with the number of entities and the checksum of each shard.
+The contents_ref of the result message refers to the manifest.
+"""
+import hashlib
+import json
+import os
+
+from gobcore.model.metadata import FIELD
+
+
+# Version of the manifest layout
+MANIFEST_VERSION = 1
+
+# Number of bytes that are read at once to calculate the checksum of a shard
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+
+def get_shard(source_id, n_shards: int):
+    """
+    Returns the shard of the given source id
+
+    The shard is stable over processes and imports
+
+    :param source_id:
+    :param n_shards:
+    :return: shard index
+    """
+    if source_id is None:
+        return 0
+    digest = hashlib.blake2b(str(source_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % n_shards
+
+
+def file_checksum(filename):
+    """
+    Returns the sha256 checksum of a file
+
+    :param filename:
+    :return:
+    """
+    checksum = hashlib.sha256()
+    with open(filename, "rb") as file:
+        while block := file.read(CHECKSUM_BLOCK_SIZE):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+class ShardedContentsWriter:
+
+    def __init__(self, n_shards: int, new_writer, compression=None):
+        """
+        :param n_shards: the number of shards
+        :param new_writer: function that returns a new contents writer
+        :param compression: codec of the contents writers, if any, reported in the manifest
+        """
+        self.writers = [new_writer() for _ in range(n_shards)]
+        self.rows = [0] * n_shards
+        self.compression = compression
+        self.filename = f"{self.writers[0].filename}.manifest.json"
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        for writer in self.writers:
+            writer.open()
+
+    def _shard(self, entity):
+        return get_shard(entity.get(FIELD.SOURCE_ID), len(self.writers))
+
+    def serialize(self, entity):
+        """
+        Serializes the entity by the writer of its shard
+
+        :param entity:
+        :return: (shard, serialized entity)
+        """
+        shard = self._shard(entity)
+        return shard, self.writers[shard].serialize(entity)
+
+    def write_serialized(self, items):
+        """
+        Writes serialized entities, the entities of each shard are written at once
+
+        :param items: list of (shard, serialized entity)
+        :return:
+        """
+        shards = [[] for _ in self.writers]
+        for shard, item in items:
+            shards[shard].append(item)
+
+        for shard, shard_items in enumerate(shards):
+            if shard_items:
+                self.writers[shard].write_serialized(shard_items)
+                self.rows[shard] += len(shard_items)
+
+    def write(self, entity):
+        """
+        Writes the entity to its shard
+
+        :param entity:
+        :return:
+        """
+        self.write_serialized([self.serialize(entity)])
+
+    def flush(self):
+        for writer in self.writers:
+            writer.flush()
+
+    def manifest(self):
+        """
+        Returns the manifest of the closed shards
+
+        :return:
+        """
+        return {
+            'version': MANIFEST_VERSION,
+            'sharding': {'key': FIELD.SOURCE_ID, 'hash': "blake2b-64", 'shards': len(self.writers)},
+            'compression': self.compression,
+            'rows': sum(self.rows),
+            'shards': [{
+                'shard': shard,
+                'filename': writer.filename,
+                'rows': rows,
+                'sha256': file_checksum(writer.filename),
+            } for shard, (writer, rows) in enumerate(zip(self.writers, self.rows))],
+        }
+
+    def close(self):
+        """
+        Closes the shards and writes the manifest
+
+        :return:
+        """
+        for writer in self.writers:
+            writer.close()
+
+        tmp_filename = f"{self.filename}.tmp"
+        with open(tmp_filename, "w") as file:
+            json.dump(self.manifest(), file, indent=2)
+        os.replace(tmp_filename, self.filename)
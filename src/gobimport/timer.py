@@ -0,0 +1,92 @@
+"""
+Stage timer
+
+Measures the total duration of an import and, when enabled, the cumulative wall time and CPU time of its stages.
+A disabled timer returns the functions and iterables of the stages as they are, so it adds no overhead.
+"""
+import time
+
+
+class StageTimer:
+
+    def __init__(self, enabled: bool = True):
+        """
+        :param enabled: time the stages
+        """
+        self.enabled = enabled
+        # Cumulative [wall time, cpu time] in seconds by stage name, in the order in which the stages are timed
+        self.stages = {}
+        self.started = None
+
+    def start(self):
+        """
+        Starts the clock of the total duration
+
+        :return:
+        """
+        self.started = time.perf_counter()
+
+    def _totals(self, stage):
+        return self.stages.setdefault(stage, [0.0, 0.0])
+
+    def wrap(self, stage, func):
+        """
+        Returns a function that calls func and adds the time of each call to the given stage
+
+        :param stage: name of the stage
+        :param func: the function to time
+        :return: the timed function, or func itself if the timer is disabled
+        """
+        if not self.enabled:
+            return func
+
+        totals = self._totals(stage)
+
+        def timed(*args, **kwargs):
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                totals[0] += time.perf_counter() - wall
+                totals[1] += time.process_time() - cpu
+
+        return timed
+
+    def iterate(self, stage, iterable):
+        """
+        Iterates over iterable and adds the time that is spent to get each next item to the given stage
+
+        :param stage: name of the stage
+        :param iterable: the iterable to time
+        :return: generator of the items of the iterable, or the iterable itself if the timer is disabled
+        """
+        if not self.enabled:
+            return iterable
+        return self._iterate(self._totals(stage), iter(iterable))
+
+    def _iterate(self, totals, iterator):
+        while True:
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                totals[0] += time.perf_counter() - wall
+                totals[1] += time.process_time() - cpu
+            yield item
+
+    def summary(self, n_rows):
+        """
+        Summarizes the timings
+
+        :param n_rows: the number of rows that have been processed
+        :return: dict with the wall and cpu time (in seconds) per stage, the total duration and the rows per second
+        """
+        duration = 0 if self.started is None else time.perf_counter() - self.started
+        return {
+            'stages': {stage: {'wall': round(wall, 3), 'cpu': round(cpu, 3)}
+                       for stage, (wall, cpu) in self.stages.items()},
+            'duration': round(duration, 3),
+            'rows_per_second': round(n_rows / duration, 1) if duration else 0,
+        }
@@ -1,4 +1,5 @@
 from functools import reduce
+from itertools import islice
 
 
 def split_field_reference(ref: str):
@@ -17,3 +18,18 @@ def get_nested_item(data, *keys):
     :return:
     """
     return reduce(lambda d, key: d.get(key, None) if isinstance(d, dict) else None, keys, data)
+
+
+def iter_chunks(iterable, size: int):
+    """
+    Split an iterable in lists of at most size items
+
+    Example: list(iter_chunks(range(5), 2)) = [[0, 1], [2, 3], [4]]
+
+    :param iterable:
+    :param size:
+    :return:
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
@@ -8,20 +8,54 @@ In order to prepare a more generic validation approach the validation has been s
 """
 import re
 
-from gobimport.utils import get_nested_item, split_field_reference
+from gobimport.definitions import get_collection
+from gobimport.issues import add_issue
+from gobimport.sampling import QA_SAMPLE_LEVELS, QASample
+from gobimport.utils import split_field_reference
+from gobimport.validator.primary_keys import PrimaryKeys
 
 from gobcore.exceptions import GOBException
-from gobcore.model import GOBModel
 from gobcore.model.metadata import FIELD
 from gobcore.logging.logger import logger
 
-from gobcore.quality.issue import QA_CHECK, QA_LEVEL, Issue, log_issue
+from gobcore.quality.issue import QA_CHECK, QA_LEVEL
 
 
 # Log message formats
 MISSING_ATTR_FMT = "{attr} missing in entity: {entity}"
 QA_CHECK_FAILURE_FMT = "{msg}. Value was: {value}"
 
+# Coordinates in a WKT geometry
+COORD_PATTERN = re.compile(r'([0-9]+\.[0-9]+)')
+
+# Separators of the coordinates in a WKT geometry
+WKT_SEPARATORS = str.maketrans("(),", "   ")
+
+
+def coordinate_bounds(value):
+    """
+    Returns the bounds of the x and y coordinates of a geometry
+
+    The coordinates of a WKT geometry are split on the separators after the geometry type,
+    even coords are x values, uneven are y values.
+    Geometries with multiple geometry types, e.g. geometry collections, are scanned for decimal coordinates.
+    A parsed geometry (e.g. shapely) provides its own bounds.
+
+    :param value: a WKT geometry, or a geometry with bounds
+    :return: [(min x, max x), (min y, max y)], only the axes that have coordinates
+    """
+    if hasattr(value, 'bounds'):
+        if value.is_empty:
+            return []
+        min_x, min_y, max_x, max_y = value.bounds
+        return [(min_x, max_x), (min_y, max_y)]
+
+    try:
+        coords = list(map(float, value[value.find('(') + 1:].translate(WKT_SEPARATORS).split()))
+    except ValueError:
+        coords = list(map(float, COORD_PATTERN.findall(value)))
+    return [(min(axis), max(axis)) for axis in (coords[0::2], coords[1::2]) if axis]
+
 
 ENTITY_CHECKS = {
     "test_entity": {},
@@ -245,26 +279,31 @@ ENTITY_CHECKS = {
 
 class Validator:
 
-    def __init__(self, source_app, catalogue, entity_name, input_spec):
+    def __init__(self, source_app, catalogue, entity_name, input_spec, sample: QASample = None):
         self.source_app = source_app
         self.catalogue = catalogue
         self.entity_name = entity_name
-        self.entity_id = GOBModel().get_collection(self.catalogue, self.entity_name).get('entity_id')
+        self.entity_id = get_collection(self.catalogue, self.entity_name).get('entity_id')
         self.input_spec = input_spec
 
         self.qa_checks = ENTITY_CHECKS.get(catalogue, {}).get(entity_name, {})
         self.collection_qa = {f"num_invalid_{attr}": 0 for attr in self.qa_checks.keys()}
         self.fatal = False
 
-        self.primary_keys = set()
-        self.duplicates = set()
+        self.primary_keys = PrimaryKeys()
+
+        # The WARNING and INFO checks can run on a sample of the entities
+        self.sample = sample or QASample()
 
+        # Functions that compile a check into a function that tells whether a value is valid
         self.validate_functions = {
             'boolean': self._is_boolean,
             'regex': self._regex_check,
             'between': self._between_check,
             'geometry': self._geometry_check,
         }
+        self.checks = self._compile_checks(sampled=False)
+        self.sampled_checks = self._compile_checks(sampled=True)
 
     def result(self):
         if self.fatal:
@@ -272,24 +311,32 @@ class Validator:
                 f"Quality assurance failed for {self.entity_name}"
             )
 
-        if self.duplicates:
+        duplicates = self.primary_keys.duplicates()
+        if duplicates:
             raise GOBException(f"Duplicate primary key(s) found in source: "
-                               f"[{', '.join([str(dup) for dup in self.duplicates])}]")
+                               f"[{', '.join([str(dup) for dup in sorted(duplicates)])}]")
 
         logger.info("Quality assurance passed")
 
-    def validate(self, entity):
+    def validate(self, entity, quality_failures=None):
         """
         Validate a single entity
 
-        :param self:
+        The quality checks can be run beforehand, e.g. in a worker process, by check_quality.
+        Their failures are then passed and only reported here.
+
+        :param entity:
+        :param quality_failures: result of check_quality for the entity, if already known
         :return:
         """
         # Validate uniqueness of primary key
         self._validate_primary_key(entity)
 
         # Run quality checks on the collection and individual entities
-        self._validate_quality(entity)
+        in_sample = self.sample.count(entity)
+        if quality_failures is None:
+            quality_failures = self.check_quality(entity, in_sample)
+        self._validate_quality(entity, quality_failures)
 
     def _validate_primary_key(self, entity):
         """
@@ -302,12 +349,66 @@ class Validator:
 
         if entity_source_id is not None:
             # Only add ids that are not None, None id's can occur for imports of collections without ids
-            if entity_source_id not in self.primary_keys:
-                self.primary_keys.add(entity_source_id)
-            else:
-                self.duplicates.add(entity_source_id)
+            self.primary_keys.add(entity_source_id)
+
+    def check_quality(self, entity, in_sample=None):
+        """
+        Run the quality checks on a single entity.
+
+        The checks do not log or change the state of the validator, so they can run in any process.
+
+        :param entity: a single entity
+        :param in_sample: whether the entity is in the QA sample, if already known
+        :return: list of (issue check, level, attr) for all failed checks
+        """
+        failures = [failure for failure in (check(entity) for check in self.checks) if failure]
+        if self.sampled_checks and (self.sample.includes(entity) if in_sample is None else in_sample):
+            failures.extend(failure for failure in (check(entity) for check in self.sampled_checks) if failure)
+        return failures
+
+    def _is_sampled(self, level):
+        return self.sample.active and level in QA_SAMPLE_LEVELS
+
+    def _compile_checks(self, sampled):
+        """
+        Compile the quality checks for the source app into check functions
 
-    def _validate_entity(self, entity):
+        :param sampled: compile the checks that run on the QA sample, else the checks that run on every entity
+        :return: list of check functions, in the order of the checks
+        """
+        return [self._compile_check(check, attr)
+                for attr, entity_checks in self.qa_checks.items()
+                for check in entity_checks
+                # Checks can be made app specific by setting the source_app attribute
+                if check.get("source_app", self.source_app) == self.source_app
+                and self._is_sampled(check["level"]) == sampled]
+
+    def _compile_check(self, check, attr):
+        """
+        Compile a quality check on a (nested) attribute
+
+        :param check: the quality check
+        :param attr: the (nested) attribute, eg status.code
+        :return: function that returns the failure of the check on an entity, or None if the check succeeds
+        """
+        key_list = split_field_reference(attr)
+        is_valid = self.validate_functions[check['type']](check)
+        missing = (QA_CHECK.Attribute_exists, check["level"], attr)
+        failed = (check, check["level"], attr)
+
+        def run_check(entity):
+            # Check if (nested) attr is available in entity
+            value = entity
+            for key in key_list:
+                if key in value:
+                    value = value[key]
+                else:
+                    return missing
+            return None if is_valid(value) else failed
+
+        return run_check
+
+    def _validate_entity(self, entity, quality_failures):
         """
         Validate a single entity.
 
@@ -315,101 +416,53 @@ class Validator:
         Warns on any warning validation check
         All info validation checks are counted
 
-        :param entity_name: the entity name
         :param entity: a single entity
+        :param quality_failures: the failed checks for the entity
         :return: Result of the qa checks
         """
         invalid_attrs = set()
-        for attr, entity_checks in self.qa_checks.items():
-            for check in entity_checks:
-                if check.get("source_app", self.source_app) != self.source_app:
-                    # Checks can be made app specific by setting the source_app attribute
-                    continue
-                # Check if the attribute is available
-                if not self._attr_check(check, attr, entity):
-                    # Add the attribute to the set of non-valid attributes for count
-                    invalid_attrs.add(attr)
-                    continue
-
-                if not self._qa_check(check, attr, entity):
-                    # Add the attribute to the set of non-valid attributes for count
-                    invalid_attrs.add(attr)
-
-        return invalid_attrs
-
-    def _attr_check(self, check, attr, entity):
-        level = check["level"]
-        # Check if (nested) attr is available in entity
-        key_list = split_field_reference(attr)
-        _current_level = entity
-        for key in key_list:
-            if key in _current_level:
-                _current_level = _current_level[key]
-            else:
-                # If a fatal check has failed, mark the validation as fatal
-                if level == QA_LEVEL.FATAL:
-                    self.fatal = True
-
-                log_issue(logger, level, Issue(QA_CHECK.Attribute_exists, entity, self.entity_id, attr))
-                return False
-        return True
-
-    # TODO: fix too complex
-    def _qa_check(self, check, attr, entity):   # noqa: C901
-        level = check["level"]
-        key_list = split_field_reference(attr)
-        value = get_nested_item(entity, *key_list)
-
-        validate_function = self.validate_functions.get(check['type'])
-        is_correct = validate_function(check, value)
-
-        # If the value doesn't pass the qa check, handle the correct way
-        if not is_correct:
+        for check, level, attr in quality_failures:
             # If a fatal check has failed, mark the validation as fatal
             if level == QA_LEVEL.FATAL:
                 self.fatal = True
-            log_issue(logger, level, Issue(check, entity, self.entity_id, attr))
-            return False
 
-        return True
+            add_issue(logger, level, check, entity, self.entity_id, attr, sampled=self._is_sampled(level))
 
-    def _is_boolean(self, check, value):
+            # Add the attribute to the set of non-valid attributes for count
+            invalid_attrs.add(attr)
+
+        return invalid_attrs
+
+    def _is_boolean(self, check):
         # Check if Null values are allowed else return true if value is a boolean.
         allow_null = check.get('allow_null')
-        if allow_null and value is None:
-            return True
-        return isinstance(value, bool)
+        return lambda value: (allow_null and value is None) or isinstance(value, bool)
 
-    def _regex_check(self, check, value):
+    def _regex_check(self, check):
         # Check if Null values are allowed
         allow_null = check.get('allow_null')
-        if allow_null and value is None:
-            return True
-        elif not allow_null and value is None:
-            return False
-        return re.compile(check['pattern']).match(str(value))
+        match = re.compile(check['pattern']).match
+        return lambda value: bool(allow_null) if value is None else match(str(value))
 
-    def _between_check(self, check, value):
+    def _between_check(self, check):
         values = check.get('values')
         assert values, 'Between values should be configured for this check'
-        return float(value) >= values[0] and float(value) <= values[1] if value is not None else False
+        low, high = values[0], values[1]
+        return lambda value: low <= float(value) <= high if value is not None else False
 
-    def _geometry_check(self, check, value):
+    def _geometry_check(self, check):
         values = check.get('values')
         assert values, 'Geometry values should be configured for this check'
-        coords = re.findall(r'([0-9]+\.[0-9]+)', value)
-        # Loop through all coords and check if they fill within the supplied range
-        # Even coords are x values, uneven are y values
-        coord_types = ['x', 'y']
-        for count, coord in enumerate(coords):
-            # Get the coord type
-            coord_type = coord_types[count % 2]
-            # If the coord is outside of the boundaries, retun false
-            if not(values[coord_type]['min'] <= float(coord) <= values[coord_type]['max']):
-                return False
-        return True
-
-    def _validate_quality(self, entity):
+        bounds = [(values[coord_type]['min'], values[coord_type]['max']) for coord_type in ['x', 'y']]
+
+        def check_geometry(value):
+            # The geometry is valid if the bounds of its coordinates fall within the supplied range
+            return all(low <= min_value and max_value <= high
+                       for (low, high), (min_value, max_value) in zip(bounds, coordinate_bounds(value)))
+
+        return check_geometry
+
+    def _validate_quality(self, entity, quality_failures):
         """
         Validate an entity.
 
@@ -417,12 +470,11 @@ class Validator:
         Warns on any warning validation check
         All info validation checks are counted
 
-        :param entity_name: the entity name
         :param entity: a single entity
-        :param source_id: the column defining the unique identifier
+        :param quality_failures: the failed checks for the entity
         :return: Result of the qa checks, and a boolean if fatal errors have been found
         """
         # Validate on individual entities
-        invalid_attrs = self._validate_entity(entity)
+        invalid_attrs = self._validate_entity(entity, quality_failures)
         for attr in invalid_attrs:
             self.collection_qa[f"num_invalid_{attr}"] += 1
@@ -0,0 +1,178 @@
+"""
+Primary keys
+
+Compact detection of duplicate primary keys
+
+Instead of keeping all keys in memory, only a 64-bit hash of each key is kept.
+The keys are added in batches. The hashes of a batch are sorted and looked up in sorted runs of the hashes of the
+previous batches with NumPy, runs of about equal length are merged. The runs take 8 bytes per key, a merge
+temporarily takes twice the length of the merged runs.
+
+The keys themselves are written to a file, a temporary file unless the primary keys are saved in a checkpoint.
+A key whose hash has already been added is a candidate duplicate. The candidates are verified by reading
+the keys from the file, so the reported duplicates are exact.
+
+Run python -m benchmarks.primary_keys to compare with a set of the keys.
+"""
+import struct
+import tempfile
+
+from collections import Counter
+
+import numpy as np
+
+
+# Number of keys that are added at once
+BATCH_SIZE = 65536
+
+# Number of keys of a batch in the keys file, followed by the lengths of the keys and the keys
+BATCH_LENGTH = struct.Struct("<I")
+
+# Type of the length of a key in the keys file
+KEY_LENGTH = np.dtype("<u4")
+
+
+class PrimaryKeys:
+
+    def __init__(self, path: str = None, batch_size: int = BATCH_SIZE):
+        """
+        :param path: optional path of the keys file, required to save the primary keys in a checkpoint
+        :param batch_size: the number of keys that are added at once
+        """
+        self.batch_size = batch_size
+        # The keys that have not yet been added to the hashes
+        self.pending = []
+        # Sorted arrays of different hashes, each run is more than twice as long as the next run
+        self.runs = []
+        # The candidate duplicates, the keys whose hash has been added more than once
+        self.candidates = set()
+        self.path = path
+        self.keys = open(path, "w+b") if path else tempfile.TemporaryFile(prefix="primary_keys_")
+
+    def __getstate__(self):
+        # The hashes are process specific, only the keys file is saved, the hashes are rebuilt on restore
+        assert self.path, "Primary keys without a keys file cannot be saved"
+        self._flush()
+        self.keys.flush()
+        return {'path': self.path, 'size': self.keys.seek(0, 2), 'batch_size': self.batch_size}
+
+    def __setstate__(self, state):
+        self.__init__(batch_size=state['batch_size'])
+        self.path = state['path']
+        self.keys.close()
+        self.keys = open(self.path, "r+b")
+        self.keys.truncate(state['size'])
+        for keys in self._read_batches():
+            self._add_batch(keys)
+        self.keys.seek(0, 2)
+
+    @property
+    def size(self):
+        """
+        The number of different keys
+
+        :return:
+        """
+        self._flush()
+        return sum(len(run) for run in self.runs)
+
+    def add(self, key):
+        """
+        Add a primary key
+
+        :param key:
+        :return:
+        """
+        # This runs for every entity, the pending keys are added in batches
+        pending = self.pending
+        pending.append(str(key))
+        if len(pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        """
+        Writes the pending keys to the keys file and adds their hashes
+
+        :return:
+        """
+        keys, self.pending = self.pending, []
+        if keys:
+            self._write_batch(keys)
+            self._add_batch(keys)
+
+    def _write_batch(self, keys):
+        """
+        Writes a batch of keys to the keys file
+
+        :param keys:
+        :return:
+        """
+        data = "".join(keys).encode()
+        lengths = np.fromiter(map(len, keys), dtype=KEY_LENGTH, count=len(keys))
+        if len(data) != lengths.sum():
+            # Some keys have multi byte characters
+            encoded = [key.encode() for key in keys]
+            data = b"".join(encoded)
+            lengths = np.fromiter(map(len, encoded), dtype=KEY_LENGTH, count=len(keys))
+        self.keys.write(BATCH_LENGTH.pack(len(keys)) + lengths.tobytes() + data)
+
+    def _add_batch(self, keys):
+        """
+        Adds the hashes of a batch of keys to the runs
+
+        :param keys:
+        :return:
+        """
+        if not keys:
+            return
+
+        hashes = np.sort(np.fromiter(map(hash, keys), dtype=np.int64, count=len(keys)))
+
+        # A hash is a duplicate if it occurs earlier in the batch or in one of the runs
+        duplicate = np.zeros(len(hashes), dtype=bool)
+        duplicate[1:] = hashes[1:] == hashes[:-1]
+        for run in self.runs:
+            duplicate |= run[np.searchsorted(run, hashes).clip(max=len(run) - 1)] == hashes
+
+        if duplicate.any():
+            # Duplicates are rare, only then the keys are hashed again to find them
+            duplicate_hashes = set(hashes[duplicate].tolist())
+            self.candidates.update(key for key in keys if hash(key) in duplicate_hashes)
+        self._add_run(hashes[~duplicate])
+
+    def _add_run(self, run):
+        if not len(run):
+            return
+
+        self.runs.append(run)
+        # Merge the last runs until each run is more than twice as long as the next one,
+        # so that there are at most log2(n / batch size) runs and each hash is merged at most that many times
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            run = self.runs.pop()
+            # The concatenation of two sorted runs is merged in linear time by the stable sort (timsort)
+            self.runs[-1] = np.sort(np.concatenate((self.runs[-1], run)), kind='stable')
+
+    def _read_batches(self):
+        self.keys.flush()
+        self.keys.seek(0)
+        while header := self.keys.read(BATCH_LENGTH.size):
+            count, = BATCH_LENGTH.unpack(header)
+            lengths = np.frombuffer(self.keys.read(count * KEY_LENGTH.itemsize), dtype=KEY_LENGTH)
+            data = self.keys.read(int(lengths.sum()))
+            ends = np.cumsum(lengths).tolist()
+            yield [data[start:end].decode() for start, end in zip([0] + ends, ends)]
+
+    def duplicates(self):
+        """
+        Returns the keys that have been added more than once
+
+        :return: set of duplicate keys
+        """
+        self._flush()
+        if not self.candidates:
+            return set()
+
+        # Verify the candidates on the keys themselves, keys with equal hashes are not necessarily equal
+        counts = Counter(key for keys in self._read_batches() for key in keys if key in self.candidates)
+        self.keys.seek(0, 2)
+        return {key for key, count in counts.items() if count > 1}
@@ -0,0 +1,187 @@
+"""
+Contents writers
+
+The contents writer serializes the entities of an import and writes them to the contents file.
+Serializing and writing are separate steps, so that the serialized entities can be written in batches.
+
+The buffered writer writes the entities on a background thread, so that writing to the shared volume
+(and compressing) does not block the conversion of the next rows. It is enabled by the dataset or the
+header of the import message:
+
+    "buffered_write": true
+
+The entities are serialized on the calling thread, an entity can be changed after it has been written.
+The serialized entities are passed to the background thread in batches. The number of batches that wait
+to be written is bounded, a fast import waits for the writer instead of keeping the entities in memory.
+An error on the background thread is raised on the next write, flush or close on the main thread.
+"""
+import json
+import queue
+import threading
+
+from gobcore.message_broker.offline_contents import ContentsWriter
+from gobcore.typesystem.json import GobTypeJSONEncoder
+
+
+# Number of entities that are passed at once to the background thread
+WRITE_BATCH_SIZE = 1000
+
+# Maximum number of batches that wait to be written
+WRITE_QUEUE_SIZE = 4
+
+# Separator between two entities in a contents file
+SEPARATOR = ",\n"
+
+
+class FileContentsWriter(ContentsWriter):
+    """
+    Contents writer that writes serialized entities to a contents file
+
+    Only the name of the contents file is taken from the gobcore contents writer,
+    the file is written in the same format, a JSON list of entities.
+    It is used when the contents are compressed, buffered, sharded or checkpointed,
+    the gobcore contents writer writes the other imports.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.contents = None
+        self.is_empty = True
+
+    def open_file(self):
+        """
+        Opens the contents file for writing
+
+        :return: a text file
+        """
+        return open(self.filename, "w")
+
+    def open(self):
+        self.contents = self.open_file()
+        self.contents.write("[")
+        self.is_empty = True
+
+    def serialize(self, entity):
+        """
+        Serializes an entity
+
+        :param entity:
+        :return: the serialized entity, to be written by write_serialized
+        """
+        return json.dumps(entity, cls=GobTypeJSONEncoder)
+
+    def write_serialized(self, items):
+        """
+        Writes serialized entities at once
+
+        :param items: list of serialized entities
+        :return:
+        """
+        if not items:
+            return
+        text = SEPARATOR.join(items)
+        self.contents.write(text if self.is_empty else SEPARATOR + text)
+        self.is_empty = False
+
+    def write(self, entity):
+        self.write_serialized([self.serialize(entity)])
+
+    def flush(self):
+        self.contents.flush()
+
+    def close(self):
+        self.contents.write("]")
+        self.contents.close()
+
+
+class BufferedWriter:
+
+    def __init__(self, writer, batch_size: int = WRITE_BATCH_SIZE, queue_size: int = WRITE_QUEUE_SIZE):
+        """
+        :param writer: an open contents writer with serialize and write_serialized methods
+        :param batch_size: the number of entities that are passed at once to the background thread
+        :param queue_size: the maximum number of batches that wait to be written
+        """
+        self.writer = writer
+        self.batch_size = batch_size
+        self.batch = []
+        self.batches = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="BufferedWriter", daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # On an exception in the import the exception of the import is raised, not a write error
+        self.close(raise_error=exc_type is None)
+
+    def _run(self):
+        while (batch := self.batches.get()) is not None:
+            try:
+                if self.error is None:
+                    self.writer.write_serialized(batch)
+            except Exception as e:
+                # Skip the next batches, the error is raised on the main thread
+                self.error = e
+            finally:
+                self.batches.task_done()
+        self.batches.task_done()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def _put(self):
+        self._raise_error()
+        if self.batch:
+            self.batches.put(self.batch)
+            self.batch = []
+
+    def write(self, entity):
+        """
+        Serializes the entity and writes it on the background thread
+
+        :param entity:
+        :return:
+        """
+        self.batch.append(self.writer.serialize(entity))
+        if len(self.batch) >= self.batch_size:
+            self._put()
+
+    def flush(self):
+        """
+        Waits until all written entities are in the contents file
+
+        :return:
+        """
+        self._put()
+        self.batches.join()
+        self._raise_error()
+        self.writer.flush()
+
+    def position(self):
+        """
+        Returns the position in the contents file after all written entities
+
+        :return:
+        """
+        self.flush()
+        return self.writer.position()
+
+    def close(self, raise_error=True):
+        """
+        Writes the remaining entities and stops the background thread
+
+        :param raise_error: raise the error of the background thread, if any
+        :return:
+        """
+        if self.thread.is_alive():
+            if self.error is None:
+                self.batches.put(self.batch)
+            self.batch = []
+            self.batches.put(None)
+            self.thread.join()
+        if raise_error:
+            self._raise_error()
@@ -19,3 +19,22 @@ class TestEnricher(unittest.TestCase):
         enricher = BaseEnricher('app', 'test', 'test')
         for entity in self.entities:
             enricher.enrich(entity)
+
+    @mock.patch("gobimport.enricher.import_module")
+    def test_lazy_import(self, mock_import_module):
+        enricher = BaseEnricher('app', 'meetbouten', 'metingen')
+        mock_import_module.assert_called_once_with('gobimport.enricher.meetbouten')
+        self.assertEqual(enricher.enrichers,
+                         [mock_import_module.return_value.MeetboutenEnricher.return_value])
+
+        mock_import_module.reset_mock()
+        BaseEnricher('app', 'test', 'test')
+        mock_import_module.assert_not_called()
+
+    def test_getattr(self):
+        import gobimport.enricher
+        from gobimport.enricher.gebieden import GebiedenEnricher
+
+        self.assertEqual(gobimport.enricher.GebiedenEnricher, GebiedenEnricher)
+        with self.assertRaises(AttributeError):
+            gobimport.enricher.AnyEnricher
@@ -1,11 +1,22 @@
+import hashlib
+import json
+import os
+import tempfile
 import unittest
 from unittest import mock
 
-from gobimport.enricher.gebieden import GebiedenEnricher, CBS_WIJKEN_WEESP_API, CBS_BUURTEN_WEESP_API
+from shapely.geometry import Point
+from shapely.wkt import loads
+
+from gobimport.enricher.gebieden import GebiedenEnricher, CBSFeatureIndex, CBS_WIJKEN_WEESP_API, \
+    CBS_BUURTEN_WEESP_API, _match_cbs_features, _get_cbs_features
 
 
 class MockResponse:
 
+    status_code = 200
+    headers = {'ETag': '"any etag"'}
+
     @property
     def ok(self):
         return True
@@ -83,6 +94,7 @@ class MockResponse:
         ]}
 
 
+@mock.patch("gobimport.enricher.gebieden.CBS_CACHE_DIR", None)
 @mock.patch("gobimport.enricher.gebieden.logger", mock.MagicMock())
 @mock.patch("gobimport.enricher.gebieden.log_issue", mock.MagicMock())
 class TestEnricher(unittest.TestCase):
@@ -139,6 +151,142 @@ class TestEnricher(unittest.TestCase):
         # Expect an empty string when datum_einde_geldigheid is not empty
         self.assertEqual('', self.entities[2]['cbs_code'])
 
+    def test_cbs_feature_index(self):
+        features = [{'geometrie': Point(x + 0.5, y + 0.5), 'code': f"{x}.{y}"} for x in range(10) for y in range(10)]
+        features.append({'geometrie': Point(2.5, 2.5), 'code': 'double'})
+        index = CBSFeatureIndex(features)
+        self.assertEqual(len(index), 101)
+
+        self.assertEqual([f['code'] for f in index.query(loads('POLYGON((2 2,3 2,3 3,2 3,2 2))'))], ['2.2', 'double'])
+        self.assertEqual([f['code'] for f in index.query(loads('POLYGON((-5 -5,1 -5,1 1,-5 1,-5 -5))'))], ['0.0'])
+        self.assertEqual(len(index.query(loads('POLYGON((-50 -50,50 -50,50 50,-50 50,-50 -50))'))), 101)
+        self.assertEqual(index.query(loads('POLYGON((20 20,21 20,21 21,20 21,20 20))')), [])
+
+        # Features on the border of a geometry are not within the geometry
+        self.assertEqual(index.query(loads('POLYGON((0 0,0.5 0,0.5 0.5,0 0.5,0 0))')), [])
+
+        self.assertEqual(CBSFeatureIndex([]).query(loads('POLYGON((0 0,1 0,1 1,0 1,0 0))')), [])
+        self.assertEqual(index.query(loads('POLYGON EMPTY')), [])
+        self.assertEqual(index.query(loads('GEOMETRYCOLLECTION EMPTY')), [])
+        self.assertEqual(len(CBSFeatureIndex([{'geometrie': Point(1, 1)}]).query(Point(1, 1).buffer(1))), 1)
+
+    @mock.patch('gobimport.enricher.gebieden.Issue')
+    def test_match_cbs_features(self, mock_issue):
+        features = CBSFeatureIndex([
+            {'geometrie': Point(0.5, 0.5), 'naam': 'first'},
+            {'geometrie': Point(1.5, 1.5), 'naam': 'other'},
+            {'geometrie': Point(0.6, 0.6), 'naam': 'second'},
+        ])
+        match = _match_cbs_features(self.entities[0], features)
+        self.assertEqual(match['naam'], 'first')
+        mock_issue.assert_called_once_with(mock.ANY, self.entities[0], None, 'naam', 'CBS feature', 'second')
+
+        self.assertIsNone(_match_cbs_features(self.entities[2], features))
+        self.assertIsNone(_match_cbs_features({'geometrie': 'POLYGON EMPTY'}, features))
+
+
+class TestCBSFeatures(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.patches = [
+            mock.patch("gobimport.enricher.gebieden.CBS_CACHE_DIR", self.dir.name),
+            mock.patch("gobimport.enricher.gebieden.time.time", lambda: 1000),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.dir.cleanup()
+
+    @mock.patch('gobimport.enricher.gebieden.requests.get')
+    def test_get_cbs_features(self, mock_get):
+        mock_get.return_value = MockResponse()
+        features = _get_cbs_features("any url", "buurt")
+        self.assertEqual([f['code'] for f in features], ['BU03630001', 'BU03630002', 'BU03630003'])
+        mock_get.assert_called_once_with("any url", headers={})
+
+        # Within the TTL the cached features are used
+        mock_get.reset_mock()
+        cached = _get_cbs_features("any url", "buurt")
+        mock_get.assert_not_called()
+        self.assertEqual(cached, features)
+
+        # After the TTL the cached features are revalidated
+        with mock.patch("gobimport.enricher.gebieden.CBS_CACHE_TTL", 0):
+            mock_get.return_value = mock.MagicMock(status_code=304, headers={})
+            cached = _get_cbs_features("any url", "buurt")
+            mock_get.assert_called_once_with("any url", headers={'If-None-Match': '"any etag"'})
+            self.assertEqual(cached, features)
+
+            # The validators of the cached response are kept when the 304 response does not send them
+            mock_get.reset_mock()
+            _get_cbs_features("any url", "buurt")
+            mock_get.assert_called_once_with("any url", headers={'If-None-Match': '"any etag"'})
+
+            # Modified features replace the cached features
+            mock_get.return_value = mock.MagicMock(status_code=200, ok=True, headers={'Last-Modified': 'any date'})
+            mock_get.return_value.json.return_value = {'features': []}
+            self.assertEqual(_get_cbs_features("any url", "buurt"), [])
+
+        with open(os.path.join(self.dir.name, os.listdir(self.dir.name)[0])) as file:
+            self.assertEqual(json.load(file), {
+                'url': "any url",
+                'etag': None,
+                'last_modified': 'any date',
+                'fetched': 1000,
+                'features': []
+            })
+
+    @mock.patch('gobimport.enricher.gebieden.logger')
+    @mock.patch('gobimport.enricher.gebieden.requests.get')
+    def test_get_cbs_features_invalid_cache(self, mock_get, mock_logger):
+        mock_get.return_value = MockResponse()
+        path = os.path.join(self.dir.name, hashlib.sha256(b"any url").hexdigest() + ".json")
+
+        # A partial cache file or a cache file in another format is a cache miss
+        for contents in ['{"features": [', '{"features": []', json.dumps(MockResponse().json()),
+                         json.dumps({'features': [{'code': 'any code', 'geometrie': [1.0, 2.0]}]}),
+                         json.dumps({'fetched': 'yesterday', 'features': []})]:
+            with open(path, "w") as file:
+                file.write(contents)
+            mock_get.reset_mock()
+            features = _get_cbs_features("any url", "buurt")
+            mock_get.assert_called_once_with("any url", headers={})
+            self.assertEqual(len(features), 3)
+            os.remove(path)
+
+        self.assertEqual(mock_logger.warning.call_count, 3)
+
+    @mock.patch('gobimport.enricher.gebieden.logger')
+    @mock.patch('gobimport.enricher.gebieden.requests.get')
+    def test_get_cbs_features_cache_not_writable(self, mock_get, mock_logger):
+        mock_get.return_value = MockResponse()
+        # Caching is best effort
+        with mock.patch("gobimport.enricher.gebieden.CBS_CACHE_DIR", os.path.join(self.dir.name, "file", "cache")):
+            open(os.path.join(self.dir.name, "file"), "w").close()
+            features = _get_cbs_features("any url", "buurt")
+
+        self.assertEqual(len(features), 3)
+        mock_logger.warning.assert_called_once()
+
+    @mock.patch("gobimport.enricher.gebieden.CBS_OFFLINE", True)
+    @mock.patch('gobimport.enricher.gebieden.requests.get')
+    def test_get_cbs_features_offline(self, mock_get):
+        with mock.patch("gobimport.enricher.gebieden.CBS_FIXTURE_DIR", None), self.assertRaises(AssertionError):
+            _get_cbs_features("any url", "buurt")
+
+        with open(os.path.join(self.dir.name, "cbs_buurt.json"), "w") as file:
+            json.dump({'features': [{'geometrie': [1.0, 2.0], 'code': 'any code', 'naam': 'any naam'}]}, file)
+
+        with mock.patch("gobimport.enricher.gebieden.CBS_FIXTURE_DIR", self.dir.name):
+            features = _get_cbs_features("any url", "buurt")
+
+        self.assertEqual(features, [{'geometrie': Point(1.0, 2.0), 'code': 'any code', 'naam': 'any naam'}])
+        mock_get.assert_not_called()
+
 
 class TestGGWPEnricher(unittest.TestCase):
 
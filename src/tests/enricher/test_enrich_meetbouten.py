@@ -1,9 +1,12 @@
+import copy
 import decimal
+import random
 import unittest
 from unittest import mock
 
 from gobimport.enricher.meetbouten import MeetboutenEnricher
 
+
 class TestEnricher(unittest.TestCase):
 
     def setUp(self):
@@ -58,3 +61,60 @@ class TestEnricher(unittest.TestCase):
         self.assertEqual(2, self.entities[1]['hoeveelste_meting'])
         self.assertEqual(10, self.entities[1]['aantal_dagen'])
         self.assertEqual(-100.0, float(self.entities[1]['zakking_cumulatief']))
+
+
+    def _metingen(self, n):
+        rnd = random.Random(0)
+        return [{
+            'identificatie': str(i),
+            'hoort_bij_meetbout': str(rnd.randint(1, 10)),
+            'datum': f"20{i // 300:02d}-{i // 25 % 12 + 1:02d}-{rnd.randint(1, 28):02d}",
+            'hoogte_tov_nap': rnd.uniform(-1, 1),
+        } for i in range(n)]
+
+    def test_enrich_batch(self):
+        metingen = self._metingen(500)
+        expected = copy.deepcopy(metingen)
+
+        enricher = MeetboutenEnricher("app", "meetbouten", "metingen")
+        for meting in expected:
+            enricher.enrich(meting)
+
+        enricher = MeetboutenEnricher("app", "meetbouten", "metingen")
+        for start in range(0, 300, 100):
+            enricher.enrich_batch(metingen[start:start + 100])
+        # Batch and one by one enrichment can be mixed
+        for meting in metingen[300:350]:
+            enricher.enrich(meting)
+        enricher.enrich_batch(metingen[350:])
+
+        self.assertEqual(metingen, expected)
+        for meting, expected_meting in zip(metingen, expected):
+            for key, value in meting.items():
+                self.assertIs(type(value), type(expected_meting[key]))
+
+    @mock.patch.object(MeetboutenEnricher, "enrich")
+    def test_enrich_batch_one_by_one(self, mock_enrich):
+        enricher = MeetboutenEnricher("app", "meetbouten", "metingen")
+
+        # Only float heights and YYYY-MM-DD dates are enriched by array operations
+        for metingen in [
+            self.entities,
+            [{**self.entities[0], 'hoogte_tov_nap': 0.1, 'datum': '2000-1-1'}],
+            [{**self.entities[0], 'hoogte_tov_nap': 0.1, 'datum': '2000/01/01'}],
+        ]:
+            mock_enrich.reset_mock()
+            enricher.enrich_batch(metingen)
+            mock_enrich.assert_called_once_with(metingen[0])
+
+        # The state of a meetbout that has been enriched with decimal heights is not used in array operations
+        mock_enrich.reset_mock()
+        enricher.meetbouten['1'] = {'_vorige_hoogte': decimal.Decimal(0.1), 'zakking_cumulatief': 0}
+        metingen = [{**self.entities[0], 'hoogte_tov_nap': 0.1}]
+        enricher.enrich_batch(metingen)
+        mock_enrich.assert_called_once_with(metingen[0])
+
+        with mock.patch("gobimport.enricher.meetbouten.np", None):
+            mock_enrich.reset_mock()
+            enricher.enrich_batch(metingen)
+            mock_enrich.assert_called_once_with(metingen[0])
@@ -28,7 +28,7 @@ class TestEntityValidator(unittest.TestCase):
              patch.object(StateValidator, 'result', lambda *args: True), \
              patch.object(GebiedenValidator, 'result', lambda *args: False), \
              self.assertRaises(GOBException):
-            validator = EntityValidator("catalog", "collection", "id")
+            validator = EntityValidator("gebieden", "collection", "id")
             validator.result()
 
         with patch.object(StateValidator, 'validates', lambda *args: True), \
@@ -36,5 +36,46 @@ class TestEntityValidator(unittest.TestCase):
              patch.object(StateValidator, 'result', lambda *args: False), \
              patch.object(GebiedenValidator, 'result', lambda *args: True), \
              self.assertRaises(GOBException):
-            validator = EntityValidator("catalog", "collection", "id")
+            validator = EntityValidator("gebieden", "collection", "id")
             validator.result()
+
+    @patch("gobimport.entity_validator.sampled_issues")
+    def test_entity_validate_sample(self, mock_sampled_issues):
+        sample = MagicMock(active=True)
+        with patch.object(StateValidator, 'validates', lambda *args: True), \
+             patch.object(GebiedenValidator, 'validates', lambda *args: True), \
+             patch.object(StateValidator, 'validate') as mock_state_validate, \
+             patch.object(GebiedenValidator, 'validate') as mock_gebieden_validate:
+            validator = EntityValidator("gebieden", "collection", "id", sample)
+            self.assertEqual([type(v) for v in validator.validators], [StateValidator])
+            self.assertEqual([type(v) for v in validator.sampled_validators], [GebiedenValidator])
+
+            # Validators that only report warnings run on the sample
+            sample.includes.return_value = False
+            validator.validate({'id': 1})
+            mock_state_validate.assert_called_once_with({'id': 1})
+            mock_gebieden_validate.assert_not_called()
+
+            sample.includes.return_value = True
+            validator.validate({'id': 2})
+            self.assertEqual(mock_state_validate.call_count, 2)
+            mock_gebieden_validate.assert_called_once_with({'id': 2})
+            mock_sampled_issues.assert_called_once_with()
+
+    @patch("gobimport.entity_validator.import_module")
+    def test_lazy_import(self, mock_import_module):
+        EntityValidator("gebieden", "collection", "id")
+        self.assertEqual([args[0] for args, _ in mock_import_module.call_args_list],
+                         ['gobimport.entity_validator.state', 'gobimport.entity_validator.gebieden'])
+
+        mock_import_module.reset_mock()
+        EntityValidator("catalog", "collection", "id")
+        mock_import_module.assert_called_once_with('gobimport.entity_validator.state')
+
+    def test_getattr(self):
+        import gobimport.entity_validator
+        from gobimport.entity_validator.bag import BAGValidator
+
+        self.assertEqual(gobimport.entity_validator.BAGValidator, BAGValidator)
+        with self.assertRaises(AttributeError):
+            gobimport.entity_validator.AnyValidator
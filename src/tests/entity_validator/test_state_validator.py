@@ -1,9 +1,10 @@
 import datetime
 import unittest
+
+from array import array
 from unittest.mock import MagicMock, patch
 
 from gobcore.exceptions import GOBException
-from gobcore.model import GOBModel
 from gobcore.typesystem import GOB
 from gobimport.entity_validator import StateValidator
 
@@ -15,20 +16,17 @@ from gobimport.entity_validator import StateValidator
 class TestEntityValidator(unittest.TestCase):
 
     def setUp(self):
-        self.mock_model = MagicMock(spec=GOBModel)
-
         self.entities = []
 
-    @patch('gobimport.entity_validator.state.GOBModel')
-    def test_entity_validate_without_state(self, mock_model):
-        mock_model.return_value = self.mock_model
-        self.mock_model.has_states.return_value = False
+    @patch('gobimport.entity_validator.state.has_states')
+    def test_entity_validate_without_state(self, mock_has_states):
+        mock_has_states.return_value = False
         self.assertFalse(StateValidator.validates('catalogue', 'collection'))
+        mock_has_states.assert_called_with('catalogue', 'collection')
 
-    @patch('gobimport.entity_validator.state.GOBModel')
-    def test_entity_validate_with_state(self, mock_model):
-        mock_model.return_value = self.mock_model
-        self.mock_model.has_states.return_value = True
+    @patch('gobimport.entity_validator.state.has_states')
+    def test_entity_validate_with_state(self, mock_has_states):
+        mock_has_states.return_value = True
         self.assertTrue(StateValidator.validates('catalogue', 'collection'))
 
     def test_validate_entity_state_valid(self):
@@ -134,4 +132,24 @@ class TestEntityValidator(unittest.TestCase):
             self.assertTrue(validator.result())
 
             # Expect Log Issue to be called
-            mock_log_issue.assert_called()
\ No newline at end of file
+            mock_log_issue.assert_called()
+
+    def test_states(self):
+        validator = StateValidator('catalogue', 'collection', 'identificatie')
+        for identificatie, volgnummer, eind_geldigheid in [
+            ('1', 1, datetime.datetime(2019, 1, 1)),
+            ('2', 1, None),
+            ('1', 2, None),
+            ('1', 3, datetime.datetime(2019, 1, 1)),
+        ]:
+            validator.validate({
+                'identificatie': identificatie,
+                'volgnummer': volgnummer,
+                'begin_geldigheid': datetime.datetime(2018, 1, 1),
+                'eind_geldigheid': eind_geldigheid,
+            })
+
+        self.assertEqual(validator._get_state(validator.states['1']), (array('q', [1, 2, 3]), True))
+        self.assertEqual(validator._get_state(validator.states['2']), ((1,), True))
+        self.assertEqual(validator._get_state(None), ((), False))
+        self.assertTrue(validator.result())
\ No newline at end of file
@@ -0,0 +1,73 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from gobimport.checkpoint import Checkpointer, ResumableContentsWriter
+from gobimport.validator.primary_keys import PrimaryKeys
+
+
+class TestCheckpointer(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "checkpoints", "any collection.checkpoint")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_checkpoints(self):
+        checkpointer = Checkpointer(self.path, 10, "any process")
+        self.assertIsNone(checkpointer.load())
+        self.assertFalse(checkpointer.due(9))
+        self.assertTrue(checkpointer.due(10))
+
+        checkpointer.save(10, {'any': 'state'}, 'any id')
+        self.assertFalse(checkpointer.due(19))
+        self.assertTrue(checkpointer.due(20))
+
+        # Only checkpoints of the same process are resumed
+        self.assertIsNone(Checkpointer(self.path, 10, "other process").load())
+
+        checkpointer = Checkpointer(self.path, 10, "any process")
+        self.assertEqual(checkpointer.load(), {'any': 'state'})
+        self.assertEqual(checkpointer.last, 10)
+        self.assertEqual(checkpointer.last_source_id, 'any id')
+
+        with open(checkpointer.keys_path, "w"):
+            pass
+        checkpointer.remove()
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [])
+        self.assertIsNone(checkpointer.load())
+
+    def test_resumable_contents_writer(self):
+        with ResumableContentsWriter() as writer:
+            writer.write({'id': 1})
+            position = writer.position()
+            writer.write({'id': 2})
+
+        with ResumableContentsWriter(position) as writer:
+            self.assertEqual(writer.filename, position[0])
+            writer.write({'id': 3})
+            self.assertFalse(writer.is_empty)
+
+        with open(writer.filename) as file:
+            self.assertEqual(file.read(), '[{"id": 1},\n{"id": 3}]')
+        os.remove(writer.filename)
+
+    def test_primary_keys(self):
+        primary_keys = PrimaryKeys(path=os.path.join(self.dir.name, "keys"))
+        for key in ["a", "b", "a"]:
+            primary_keys.add(key)
+        state = pickle.dumps(primary_keys)
+        primary_keys.add("c")
+
+        # The primary keys are restored at the saved state
+        restored = pickle.loads(state)
+        self.assertEqual(restored.size, 2)
+        for key in ["c", "b"]:
+            restored.add(key)
+        self.assertEqual(restored.duplicates(), {"a", "b"})
+
+        with self.assertRaises(AssertionError):
+            pickle.dumps(PrimaryKeys())
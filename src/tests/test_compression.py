@@ -0,0 +1,45 @@
+import json
+import os
+import unittest
+
+from unittest.mock import patch
+
+from gobcore.exceptions import GOBException
+
+from gobimport.compression import CODECS, CompressedContentsWriter, get_compression, open_compressed
+
+
+class TestCompression(unittest.TestCase):
+
+    def test_get_compression(self):
+        self.assertIsNone(get_compression())
+        self.assertIsNone(get_compression(None, {}))
+        self.assertEqual(get_compression("gzip"), ("gzip", 6))
+        self.assertEqual(get_compression({'codec': 'lzma', 'level': 1}), ("lzma", 1))
+
+        # The last spec that has been set wins
+        self.assertEqual(get_compression("gzip", None), ("gzip", 6))
+        self.assertEqual(get_compression("gzip", {'codec': 'bz2', 'level': 3}), ("bz2", 3))
+
+        for spec in ["any codec", {'level': 3}]:
+            with self.assertRaises(GOBException):
+                get_compression(spec)
+
+    def test_compressed_contents_writer(self):
+        entities = [{'id': i, 'naam': "any name"} for i in range(100)]
+
+        for codec in ['gzip', 'bz2', 'lzma']:
+            for level in [None, 1]:
+                with CompressedContentsWriter(codec, level) as writer:
+                    for entity in entities:
+                        writer.write(entity)
+
+                with open_compressed(writer.filename, codec) as file:
+                    self.assertEqual(json.load(file), entities)
+                os.remove(writer.filename)
+
+    @patch("gobimport.compression.zstandard", None)
+    def test_zstd_not_available(self):
+        self.assertIn('zstd', CODECS)
+        with self.assertRaises(GOBException):
+            open_compressed("any file", 'zstd', "wt")
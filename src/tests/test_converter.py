@@ -5,7 +5,8 @@ from decimal import Decimal
 from gobcore.model import GOBModel
 from gobcore.model.metadata import FIELD
 from gobimport.converter import _apply_filters, _extract_references, _is_object_reference, _split_object_reference, \
-                                Converter, _json_safe_value, _get_value, _clean_references, _extract_field, _goblike_row, MappinglessConverterAdapter
+                                Converter, _json_safe_value, _get_value, _clean_references, _extract_field, _goblike_row, MappinglessConverterAdapter, \
+                                _compile_value, _compile_filters, collect_extract_errors
 from gobcore.exceptions import GOBException, GOBTypeException
 from tests.fixtures import random_string
 
@@ -298,6 +299,7 @@ class TestConverter(unittest.TestCase):
             self.assertEqual(result, _json_safe_value(arg))
 
     @mock.patch("gobimport.converter.GOBModel", mock.MagicMock(spec=GOBModel))
+    @mock.patch("gobimport.converter.get_collection", mock.MagicMock())
     def test_convert(self):
         row = {
             "id": random_string(),
@@ -324,6 +326,86 @@ class TestConverter(unittest.TestCase):
         result = converter.convert(row)
         self.assertEqual(result, {"_source_id": mock.ANY})
 
+    def test_compile_value(self):
+        row = {'field': 'value', 'json_column': [{'attribute': 'ref'}]}
+        testcases = (
+            ('field', 'value'),
+            ('=literal', 'literal'),
+            ('json_column.attribute', [{'attribute': 'ref'}]),
+            ('missing', None),
+        )
+
+        for field, result in testcases:
+            self.assertEqual(result, _compile_value(field)(row), f"Case {field} should return {result}")
+            self.assertEqual(_get_value(row, field), _compile_value(field)(row))
+
+    def test_compile_filters(self):
+        apply_filters = _compile_filters([["re.sub", "a", "b"], ["upper"]])
+        self.assertEqual(apply_filters("a"), "B")
+        self.assertEqual(apply_filters("ca"), "CB")
+
+        # Unknown filters are reported when applied, not when compiled
+        apply_filters = _compile_filters([["some name"]])
+        with self.assertRaises(GOBException):
+            apply_filters("a")
+
+    @mock.patch("gobimport.converter.get_value", lambda entity: entity)
+    @mock.patch("gobimport.converter.get_gob_type_from_info")
+    @mock.patch("gobimport.converter.GOBModel")
+    @mock.patch("gobimport.converter.get_collection")
+    def test_convert_plan(self, mock_get_collection, mock_model, mock_get_gob_type_from_info):
+        mock_get_gob_type_from_info.return_value.from_value_secure = lambda value, typeinfo, **kwargs: value
+        mock_get_collection.return_value = {
+            'all_fields': {
+                'literal': {'type': 'GOB.String'},
+                'column': {'type': 'GOB.String'},
+                'filtered': {'type': 'GOB.String'},
+                'ref': {'type': 'GOB.Reference'},
+                'manyref': {'type': 'GOB.ManyReference'},
+            }
+        }
+        mock_model.return_value.get_source_id.return_value = 'source id'
+        converter = Converter("catalog", "entity", {
+            "gob_mapping": {
+                'literal': {'source_mapping': '=any literal'},
+                'column': {'source_mapping': 'col'},
+                'filtered': {'source_mapping': 'col', 'filters': [['upper']]},
+                'ref': {'source_mapping': {'bronwaarde': 'col', 'extra': 'other'}},
+                'manyref': {'source_mapping': {'bronwaarde': 'refs.code'}},
+            },
+            "source": {
+                "entity_id": "col"
+            }
+        })
+        rows = [
+            {'col': 'a', 'other': 'x', 'refs': [{'code': '1'}, {'code': '2'}]},
+            {'col': 'b', 'other': None, 'refs': None},
+        ]
+        expected = [{
+            'literal': 'any literal',
+            'column': 'a',
+            'filtered': 'A',
+            'ref': {'bronwaarde': 'a', 'broninfo': {'extra': 'x'}},
+            'manyref': [{'bronwaarde': '1', 'broninfo': {'code': '1'}}, {'bronwaarde': '2', 'broninfo': {'code': '2'}}],
+            '_source_id': 'source id',
+        }, {
+            'literal': 'any literal',
+            'column': 'b',
+            'filtered': 'B',
+            'ref': {'bronwaarde': 'b', 'broninfo': {'extra': None}},
+            'manyref': [],
+            '_source_id': 'source id',
+        }]
+        self.assertEqual([converter.convert(row) for row in rows], expected)
+
+        # The mapping is compiled once, not for every row
+        self.assertEqual(mock_get_gob_type_from_info.call_count, 5)
+
+        # Converting a batch gives the same result as converting row by row
+        self.assertEqual(converter.convert_batch(rows), expected)
+        self.assertEqual(converter.convert_batch([]), [])
+        self.assertEqual(mock_get_gob_type_from_info.call_count, 5)
+
     def test_goblike_row(self):
         entity_id_field = 'entity_id field'
         seqnr_field = 'seqnr field'
@@ -388,8 +470,8 @@ class TestConverter(unittest.TestCase):
 
     @mock.patch('gobimport.converter.logger')
     @mock.patch('gobimport.converter.get_gob_type_from_info')
-    @mock.patch('gobimport.converter._get_value')
-    def test_extract_field(self, mock_get_value, mock_get_gob_type_from_info, mock_logger):
+    @mock.patch('gobimport.converter._compile_value')
+    def test_extract_field(self, mock_compile_value, mock_get_gob_type_from_info, mock_logger):
         row = {
             '_id': '12345',
         }
@@ -403,9 +485,11 @@ class TestConverter(unittest.TestCase):
         # Implementation test of extract field
         mock_gob_type = mock.MagicMock()
         mock_get_gob_type_from_info.return_value = mock_gob_type
+        mock_get_value = mock_compile_value.return_value
         result = _extract_field(row, field, metadata, typeinfo)
         self.assertEqual(result, mock_gob_type.from_value_secure.return_value)
-        mock_get_value.assert_called_with(row, metadata['source_mapping'])
+        mock_compile_value.assert_called_with(metadata['source_mapping'])
+        mock_get_value.assert_called_with(row)
         mock_gob_type.from_value_secure.assert_called_with(mock_get_value.return_value, typeinfo)
 
         # Behaviour test, if GOB Type conversion fails a data error should be reported
@@ -417,13 +501,20 @@ class TestConverter(unittest.TestCase):
         # Assert error is generated
         mock_logger.error.assert_called_once()
 
+        # Errors can be collected instead of logged
+        mock_gob_type.from_value_secure.side_effect = [GOBTypeException(), None]
+        with collect_extract_errors() as errors:
+            _extract_field(row, field, metadata, typeinfo)
+        self.assertEqual(errors, ["Error importing object with id 12345. Can't extract value for field f"])
+        mock_logger.error.assert_called_once()
+
 
 class TestMappinglessConverterAdapter(unittest.TestCase):
 
     @mock.patch("gobimport.converter.Converter")
-    @mock.patch("gobimport.converter.GOBModel")
-    def test_init_convert(self, mock_model, mock_converter):
-        mock_model.return_value.get_collection.return_value = {
+    @mock.patch("gobimport.converter.get_collection")
+    def test_init_convert(self, mock_get_collection, mock_converter):
+        mock_get_collection.return_value = {
             'fields': {
                 'fieldA': '',
                 'fieldB': '',
@@ -0,0 +1,131 @@
+import json
+import os
+import tempfile
+import unittest
+
+from unittest.mock import MagicMock, patch
+
+from gobimport import definitions
+from gobimport.definitions import DefinitionsCache
+
+
+class TestDefinitionsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = DefinitionsCache(self.dir.name, check_interval=0)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _write_definition(self, name, definition):
+        path = os.path.join(self.dir.name, name)
+        with open(path, "w") as f:
+            json.dump(definition, f)
+        return path
+
+    def test_get(self):
+        resolve = MagicMock()
+        self.assertEqual(self.cache.get('any key', resolve), resolve.return_value)
+        self.assertEqual(self.cache.get('any key', resolve), resolve.return_value)
+        resolve.assert_called_once()
+
+        self.cache.get('other key', resolve)
+        self.assertEqual(resolve.call_count, 2)
+
+    def test_get_changed_files(self):
+        resolve = MagicMock()
+        self.cache.get('any key', resolve)
+
+        # A new definition file invalidates the cache
+        path = self._write_definition("any.json", {})
+        self.cache.get('any key', resolve)
+        self.assertEqual(resolve.call_count, 2)
+        self.cache.get('any key', resolve)
+        self.assertEqual(resolve.call_count, 2)
+
+        # A changed definition file invalidates the cache
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        self.cache.get('any key', resolve)
+        self.assertEqual(resolve.call_count, 3)
+
+    def test_get_check_interval(self):
+        cache = DefinitionsCache(self.dir.name, check_interval=3600)
+        resolve = MagicMock()
+        cache.get('any key', resolve)
+
+        # Changes are not checked within the check interval
+        self._write_definition("any.json", {})
+        cache.get('any key', resolve)
+        resolve.assert_called_once()
+
+        cache.clear()
+        cache.get('any key', resolve)
+        self.assertEqual(resolve.call_count, 2)
+
+
+@patch("gobimport.definitions.GOBModel")
+@patch("gobimport.definitions._get_import_definition_by_filename")
+@patch("gobimport.definitions._get_import_definition")
+class TestDefinitions(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = DefinitionsCache(self.dir.name)
+        patcher = patch("gobimport.definitions._cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_get_import_definition(self, mock_get_import_definition, mock_get_by_filename, mock_model):
+        mock_get_import_definition.return_value = {'source': {'name': 'any name'}}
+
+        definition = definitions.get_import_definition('cat', 'coll', 'app')
+        self.assertEqual(definition, {'source': {'name': 'any name'}})
+
+        # Changes to a definition do not change the cached definition
+        definition['source']['name'] = 'other name'
+        self.assertEqual(definitions.get_import_definition('cat', 'coll', 'app'), {'source': {'name': 'any name'}})
+        mock_get_import_definition.assert_called_once_with('cat', 'coll', 'app')
+
+        definitions.get_import_definition('cat', 'coll')
+        mock_get_import_definition.assert_called_with('cat', 'coll', None)
+
+        mock_get_by_filename.return_value = {'any': 'definition'}
+        self.assertEqual(definitions.get_import_definition_by_filename('any file'), {'any': 'definition'})
+        self.assertEqual(definitions.get_import_definition_by_filename('any file'), {'any': 'definition'})
+        mock_get_by_filename.assert_called_once_with('any file')
+
+    def test_get_collection(self, mock_get_import_definition, mock_get_by_filename, mock_model):
+        self.assertEqual(definitions.get_collection('cat', 'coll'), mock_model.return_value.get_collection.return_value)
+        self.assertEqual(definitions.get_collection('cat', 'coll'), mock_model.return_value.get_collection.return_value)
+        mock_model.return_value.get_collection.assert_called_once_with('cat', 'coll')
+
+        self.assertEqual(definitions.has_states('cat', 'coll'), mock_model.return_value.has_states.return_value)
+        self.assertEqual(definitions.has_states('cat', 'coll'), mock_model.return_value.has_states.return_value)
+        mock_model.return_value.has_states.assert_called_once_with('cat', 'coll')
+
+    def test_warm(self, mock_get_import_definition, mock_get_by_filename, mock_model):
+        os.makedirs(os.path.join(self.dir.name, "cat"))
+        with open(os.path.join(self.dir.name, "cat", "coll.json"), "w") as f:
+            json.dump({'catalogue': 'cat', 'entity': 'coll', 'source': {'application': 'app'}}, f)
+        with open(os.path.join(self.dir.name, "cat", "other.json"), "w") as f:
+            f.write("no definition")
+        with open(os.path.join(self.dir.name, "cat", "readme.md"), "w") as f:
+            f.write("no definition")
+
+        self.assertEqual(definitions.warm(), 1)
+        mock_get_import_definition.assert_called_once_with('cat', 'coll', 'app')
+        mock_model.return_value.get_collection.assert_called_once_with('cat', 'coll')
+
+        # Warmed definitions are not resolved again
+        definitions.get_import_definition('cat', 'coll', 'app')
+        mock_get_import_definition.assert_called_once()
+
+        # Definitions that cannot be resolved are skipped
+        definitions.clear()
+        mock_get_import_definition.side_effect = Exception
+        self.assertEqual(definitions.warm(), 0)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+from gobimport.delta import DeltaWriter, content_hash
+
+
+class TestDelta(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "delta", "any collection.db")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _import(self, entities, commit=True):
+        written = []
+        delta = DeltaWriter(self.path, written.append)
+        for entity in entities:
+            delta.write(entity)
+        n_written = len(written)
+        delta.write_deleted()
+        if commit:
+            delta.commit()
+        delta.close()
+        return written[:n_written], written[n_written:], delta.counts
+
+    def test_content_hash(self):
+        self.assertEqual(content_hash({'a': 1, 'b': 2}), content_hash({'b': 2, 'a': 1}))
+        self.assertNotEqual(content_hash({'a': 1, 'b': 2}), content_hash({'a': 1, 'b': 3}))
+        self.assertEqual(len(content_hash({})), 16)
+
+    def test_delta(self):
+        entities = [{'_source_id': str(i), 'value': i} for i in range(5)]
+        written, deleted, counts = self._import(entities)
+        self.assertEqual(written, entities)
+        self.assertEqual(deleted, [])
+        self.assertEqual(counts, {'new': 5, 'changed': 0, 'unchanged': 0, 'deleted': 0})
+
+        # Entity 1 changes, 3 is deleted, 5 is new, entities without source id are always written
+        entities = [{'_source_id': '0', 'value': 0}, {'_source_id': '1', 'value': 'changed'},
+                    {'_source_id': '2', 'value': 2}, {'_source_id': '4', 'value': 4},
+                    {'_source_id': '5', 'value': 5}, {'_source_id': None}]
+        written, deleted, counts = self._import(entities, commit=False)
+        self.assertEqual(written, [entities[1], entities[4], entities[5]])
+        self.assertEqual(deleted, [{'_source_id': '3', '_event': 'DELETE'}])
+        self.assertEqual(counts, {'new': 1, 'changed': 1, 'unchanged': 3, 'deleted': 1})
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["any collection.db"])
+
+        # An import that has not been committed does not change the base for the next import
+        written, deleted, counts = self._import(entities)
+        self.assertEqual(counts, {'new': 1, 'changed': 1, 'unchanged': 3, 'deleted': 1})
+
+        written, deleted, counts = self._import(entities)
+        self.assertEqual(written, [entities[5]])
+        self.assertEqual(counts, {'new': 0, 'changed': 0, 'unchanged': 5, 'deleted': 0})
+
+    def test_concurrent_imports(self):
+        # Each import has its own new store
+        first = DeltaWriter(self.path, lambda entity: None)
+        second = DeltaWriter(self.path, lambda entity: None)
+        self.assertNotEqual(first.new_path, second.new_path)
+
+        first.write({'_source_id': '1'})
+        second.write({'_source_id': '2'})
+        second.close()
+        first.commit()
+        first.close()
+
+        written, deleted, counts = self._import([])
+        self.assertEqual(deleted, [{'_source_id': '1', '_event': 'DELETE'}])
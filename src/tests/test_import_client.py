@@ -1,8 +1,17 @@
+import threading
+
+from contextlib import nullcontext
+from tempfile import TemporaryDirectory
 from unittest import TestCase
-from unittest.mock import MagicMock, patch, call
+from unittest.mock import MagicMock, patch, call, ANY
 
+from gobcore.exceptions import GOBException
 from gobcore.model import GOBModel
+from gobimport.converter import _extract_errors
 from gobimport.import_client import ImportClient
+from gobimport.profiler import Profiler
+from gobimport.timer import StageTimer
+from gobimport.writer import BufferedWriter
 from tests import fixtures
 
 from gobcore.enum import ImportMode
@@ -40,6 +49,64 @@ class TestImportClient(TestCase):
         self.import_client = ImportClient(self.mock_dataset, self.mock_msg, logger)
 
         logger.info.assert_called()
+        # Every import has its own issues
+        self.assertIsNot(self.import_client.issues, ImportClient(self.mock_dataset, self.mock_msg, logger).issues)
+        # The entity validator and the validator share the QA sample of the import
+        self.assertIs(self.import_client.entity_validator.sample, self.import_client.validator.sample)
+
+        # The sample is kept when another dataset is initialized, e.g. the dataset of a merge
+        self.import_client.init_dataset({**self.mock_dataset, 'qa_sample_rate': 0.5})
+        self.assertIs(self.import_client.validator.sample, self.import_client.entity_validator.sample)
+
+    def test_init_issue_sample_size(self):
+        import_client = ImportClient(self.mock_dataset, self.mock_msg, MagicMock())
+        self.assertEqual(import_client.init_issue_sample_size(), 1000)
+
+        for size in [10, '10']:
+            import_client.dataset = {'issue_sample_size': size}
+            self.assertEqual(import_client.init_issue_sample_size(), 10)
+
+        for size in [-1, 'any', None]:
+            import_client.dataset = {'issue_sample_size': size}
+            with self.assertRaisesRegex(GOBException, "issue sample size should be a non negative integer"):
+                import_client.init_issue_sample_size()
+
+        # An invalid issue sample size fails the import
+        logger = MagicMock()
+        import_client = ImportClient({**self.mock_dataset, 'issue_sample_size': -1}, self.mock_msg, logger)
+        msg = import_client.import_dataset()
+        logger.error.assert_any_call("Import has failed", ANY)
+        self.assertIsNone(msg['contents_ref'])
+
+    def test_init_sample(self):
+        import_client = ImportClient({**self.mock_dataset, 'qa_sample_rate': 0.1}, self.mock_msg, MagicMock())
+        # The sample is resolved when the import starts
+        self.assertFalse(import_client.sample.active)
+
+        import_client.init_sample()
+        self.assertEqual(import_client.sample.rate, 0.1)
+        self.assertIs(import_client.validator.sample, import_client.sample)
+        self.assertIs(import_client.entity_validator.sample, import_client.sample)
+
+        # An invalid sample rate fails the import
+        for rate in [2, 'any']:
+            logger = MagicMock()
+            import_client = ImportClient({**self.mock_dataset, 'qa_sample_rate': rate}, self.mock_msg, logger)
+            msg = import_client.import_dataset()
+            logger.error.assert_any_call("Import has failed", ANY)
+            self.assertIsNone(msg['contents_ref'])
+
+    def test_init_timer(self):
+        # The stages are only timed on request, the header overrides the dataset
+        import_client = ImportClient(self.mock_dataset, self.mock_msg, MagicMock())
+        self.assertFalse(import_client.timer.enabled)
+
+        self.mock_dataset['timings'] = True
+        import_client = ImportClient(self.mock_dataset, self.mock_msg, MagicMock())
+        self.assertTrue(import_client.timer.enabled)
+
+        import_client = ImportClient(self.mock_dataset, {'header': {'timings': False}}, MagicMock())
+        self.assertFalse(import_client.timer.enabled)
 
     def test_publish(self):
         logger = MagicMock()
@@ -49,6 +116,18 @@ class TestImportClient(TestCase):
         msg = self.import_client.get_result_msg()
         self.assertEqual(msg['contents_ref'], 'filename')
         self.assertEqual(msg['summary']['num_records'], 10)
+        self.assertEqual(msg['summary']['timings']['stages'], {})
+        self.assertEqual(msg['summary']['issues'], [])
+        self.assertNotIn('qa_sample', msg['summary'])
+
+        self.mock_dataset['qa_sample_rate'] = 0.1
+        self.import_client = ImportClient(self.mock_dataset, self.mock_msg, logger)
+        self.import_client.init_sample()
+        self.assertEqual(self.import_client.validator.sample, self.import_client.sample)
+        self.assertEqual(self.import_client.entity_validator.sample, self.import_client.sample)
+        self.import_client.filename = "filename"
+        msg = self.import_client.get_result_msg()
+        self.assertEqual(msg['summary']['qa_sample']['rate'], 0.1)
         self.assertEqual(msg['header']['version'], 0.1)
 
     @patch('gobimport.import_client.Reader')
@@ -62,6 +141,10 @@ class TestImportClient(TestCase):
         write = MagicMock()
 
         _self = MagicMock()
+        _self.timer = StageTimer()
+        _self.dataset = {}
+        _self.checkpointer = None
+        _self.parallel = None
         _self.logger = MagicMock()
         _self.injector.inject = MagicMock()
         _self.merger = MagicMock()
@@ -72,6 +155,7 @@ class TestImportClient(TestCase):
         ImportClient.import_rows(_self, write, progress)
         _self.logger.info.assert_called()
         self.assertEquals(_self.injector.inject.call_args_list, [call(c) for c in rows])
+        # The merger writes through the untimed write, its writes are timed as merge
         self.assertEquals(_self.merger.merge.call_args_list, [call(c, write) for c in rows])
         self.assertEquals(_self.converter.convert.call_args_list, [call(c) for c in rows])
         self.assertEquals(_self.validator.validate.call_args_list, [call(entity) for c in rows])
@@ -80,6 +164,230 @@ class TestImportClient(TestCase):
         _self.validator.result.called_once_with()
         self.assertEquals(len(_self.logger.info.call_args_list), 3)
 
+        # All stages are timed
+        self.assertEqual(list(_self.timer.stages.keys()),
+                         ['read', 'write', 'inject', 'enrich', 'merge', 'convert', 'validate', 'entity_validate'])
+
+    @patch('gobimport.import_client.Reader')
+    def test_import_rows_batch_size(self, mock_Reader):
+        rows = [(1, 2), (3, 4), (5, 6)]
+        mock_Reader.return_value.read.return_value = rows
+
+        _self = MagicMock()
+        _self.timer = StageTimer()
+        _self.dataset = {'batch_size': 2}
+        _self.checkpointer = None
+        _self.parallel = None
+        ImportClient.import_rows(_self, 'write', 'progress')
+        _self.import_batches.assert_called_once_with(ANY, ANY, 'progress', 2)
+        _self.converter.convert.assert_not_called()
+
+        # The rows are read through the timer
+        timed_rows = _self.import_batches.call_args[0][0]
+        self.assertEqual(list(timed_rows), rows)
+        self.assertIn('read', _self.timer.stages)
+
+    def test_import_rows_workers(self):
+        with patch('gobimport.import_client.Reader') as mock_Reader:
+            rows = [(1, 2), (3, 4), (5, 6)]
+            mock_Reader.return_value.read.return_value = rows
+
+            _self = MagicMock()
+            _self.timer = StageTimer()
+            _self.dataset = {'workers': 4}
+            _self.checkpointer = None
+            ImportClient.import_rows(_self, 'write', 'progress')
+            _self.import_parallel.assert_called_once_with(ANY, ANY, 'progress', 1000)
+
+            _self.dataset = {'workers': 4, 'batch_size': 10}
+            ImportClient.import_rows(_self, 'write', 'progress')
+            _self.import_parallel.assert_called_with(ANY, ANY, 'progress', 10)
+            _self.import_batches.assert_not_called()
+
+            # The rows of a merge dataset are converted in process, the workers are not yet available
+            _self.import_parallel.reset_mock()
+            _self.parallel = None
+            ImportClient.import_rows(_self, 'write', 'progress')
+            _self.import_parallel.assert_not_called()
+            _self.import_batches.assert_called_once_with(ANY, ANY, 'progress', 10)
+
+    def test_prepare_batches(self):
+        rows = [{'id': 1}, {'id': 2}, {'id': 3}]
+        progress = MagicMock()
+
+        _self = MagicMock()
+        _self.timer = StageTimer()
+        _self.n_rows = 0
+        # The merger writes an entity before the entity of row 2
+        _self.merger.merge.side_effect = lambda row, write: write('merged') if row['id'] == 2 else None
+
+        result = list(ImportClient.prepare_batches(_self, iter(rows), progress, 2))
+
+        self.assertEqual(result, [(rows[:2], [[], ['merged']]), (rows[2:], [[]])])
+        self.assertEqual(_self.n_rows, 3)
+        self.assertEqual(_self.injector.inject.call_args_list, [call(row) for row in rows])
+        self.assertEqual(_self.enricher.enrich_batch.call_args_list, [call(rows[:2]), call(rows[2:])])
+        self.assertEqual(progress.tick.call_count, 3)
+
+    def test_write_batch(self):
+        write = MagicMock()
+
+        _self = MagicMock()
+        _self.timer = StageTimer()
+        ImportClient.write_batch(_self, ['row 1', 'row 2'], [('entity 1', None), ('entity 2', ['failure'])],
+                                 [[], ['merged']], write)
+
+        self.assertEqual(_self.validator.validate.call_args_list, [call('entity 1', None), call('entity 2', ['failure'])])
+        self.assertEqual(_self.entity_validator.validate.call_args_list, [call('entity 1'), call('entity 2')])
+        self.assertEqual(write.call_args_list, [call('entity 1'), call('merged'), call('entity 2')])
+        self.assertEqual(_self.row, 'row 2')
+
+    def test_find_failed_row(self):
+        _self = MagicMock()
+        # The extraction errors of the rows are collected, they have already been logged for the batch
+        _self.converter.convert.side_effect = lambda row: f"entity {row}" if _extract_errors.get() is not None else None
+        _self.validator.check_quality.side_effect = [None, ValueError('boom'), None]
+
+        # Rows 11 - 13 of the import
+        ImportClient.find_failed_row(_self, ['row 1', 'row 2', 'row 3'], 13)
+        self.assertEqual(_self.row, 'row 2')
+        self.assertEqual(_self.n_rows, 12)
+        _self.validator.check_quality.assert_called_with('entity row 2')
+        self.assertIsNone(_extract_errors.get())
+
+    def test_import_batches(self):
+        _self = MagicMock()
+        _self.timer = StageTimer()
+        _self.prepare_batches.return_value = [(['row 1', 'row 2'], [[], []]), (['row 3'], [['merged']])]
+        _self.converter.convert_batch.side_effect = lambda batch: [f"entity {row}" for row in batch]
+
+        ImportClient.import_batches(_self, 'rows', 'write', 'progress', 2)
+
+        _self.prepare_batches.assert_called_once_with('rows', 'progress', 2)
+        self.assertEqual(_self.write_batch.call_args_list, [
+            call(['row 1', 'row 2'], [('entity row 1', None), ('entity row 2', None)], [[], []], 'write'),
+            call(['row 3'], [('entity row 3', None)], [['merged']], 'write'),
+        ])
+
+    def test_import_batches_exception(self):
+        _self = MagicMock()
+        _self.timer = StageTimer()
+        _self.prepare_batches.return_value = [(['row 1', 'row 2'], [[], []])]
+        _self.converter.convert_batch.side_effect = ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            ImportClient.import_batches(_self, 'rows', 'write', 'progress', 2)
+        _self.find_failed_row.assert_called_once_with(['row 1', 'row 2'], _self.n_rows)
+        _self.write_batch.assert_not_called()
+
+    def test_import_parallel(self):
+        _self = MagicMock()
+        _self.timer = StageTimer()
+        converter = _self.parallel
+        _self.n_rows = 0
+
+        def prepare_batches(rows, progress, batch_size):
+            for batch, merged in [('batch 1', 'merged 1'), ('batch 2', 'merged 2')]:
+                _self.n_rows += 2
+                yield batch, merged
+
+        _self.prepare_batches.side_effect = prepare_batches
+        contexts = []
+
+        def map(batches):
+            # The workers read ahead, the number of rows is taken when the batch is read
+            batches = list(batches)
+            contexts.extend(context for _, context in batches)
+            return [(context, f"results of {rows}") for rows, context in batches]
+
+        converter.map.side_effect = map
+
+        ImportClient.import_parallel(_self, 'rows', 'write', 'progress', 2)
+
+        _self.prepare_batches.assert_called_once_with('rows', 'progress', 2)
+        self.assertEqual(contexts, [('batch 1', 'merged 1', 2), ('batch 2', 'merged 2', 4)])
+        self.assertEqual(_self.write_batch.call_args_list, [
+            call('batch 1', 'results of batch 1', 'merged 1', 'write'),
+            call('batch 2', 'results of batch 2', 'merged 2', 'write'),
+        ])
+
+    def test_import_parallel_exception(self):
+        _self = MagicMock()
+        _self.timer = StageTimer()
+        _self.parallel.map.side_effect = ValueError('boom')
+        _self.parallel.failed = None
+
+        with self.assertRaises(ValueError):
+            ImportClient.import_parallel(_self, 'rows', 'write', 'progress', 2)
+        _self.find_failed_row.assert_not_called()
+
+        # The batch has failed in a worker
+        _self.parallel.failed = ('batch', 'merged', 20)
+        with self.assertRaises(ValueError):
+            ImportClient.import_parallel(_self, 'rows', 'write', 'progress', 2)
+        _self.find_failed_row.assert_called_once_with('batch', 20)
+
+    @patch('gobimport.import_client.BufferedWriter')
+    def test_buffered_writer(self, mock_BufferedWriter):
+        _self = MagicMock()
+        _self.buffered_write.return_value = False
+        with ImportClient.buffered_writer(_self, 'writer') as writer:
+            self.assertEqual(writer, 'writer')
+        mock_BufferedWriter.assert_not_called()
+
+        _self.buffered_write.return_value = True
+        self.assertEqual(ImportClient.buffered_writer(_self, 'writer'), mock_BufferedWriter.return_value)
+        mock_BufferedWriter.assert_called_once_with('writer')
+
+    def test_buffered_write(self):
+        _self = MagicMock()
+        _self.header = {}
+        _self.dataset = {}
+        self.assertFalse(ImportClient.buffered_write(_self))
+
+        _self.dataset = {'buffered_write': True}
+        self.assertTrue(ImportClient.buffered_write(_self))
+
+        # The header overrides the dataset
+        _self.header = {'buffered_write': False}
+        self.assertFalse(ImportClient.buffered_write(_self))
+
+    @patch('gobimport.import_client.ParallelConverter')
+    def test_parallel_converter(self, mock_ParallelConverter):
+        _self = MagicMock()
+        _self.dataset = {}
+        self.assertIsInstance(ImportClient.parallel_converter(_self), nullcontext)
+        mock_ParallelConverter.assert_not_called()
+
+        _self.dataset = {'workers': 4}
+        result = ImportClient.parallel_converter(_self)
+        self.assertEqual(result, mock_ParallelConverter.return_value)
+        mock_ParallelConverter.assert_called_once_with(_self.converter, _self.validator, 4, timer=_self.timer)
+
+    @patch('gobimport.import_client.ProgressTicker', MagicMock())
+    def test_import_dataset_workers_before_threads(self):
+        # The worker processes are forked before the profiler and the buffered writer start their threads
+        threads_at_fork = []
+        threads = set(threading.enumerate())
+
+        _self = MagicMock()
+        _self.init_checkpoints.return_value = None, None
+
+        def start_workers():
+            threads_at_fork.append(set(threading.enumerate()))
+            return 'parallel'
+
+        _self.parallel_converter.return_value.__enter__.side_effect = start_workers
+        _self.buffered_writer.side_effect = BufferedWriter
+        with TemporaryDirectory() as tmpdir:
+            _self.init_profiler.return_value = Profiler('cpu', tmpdir, 'profile')
+            ImportClient.import_dataset(_self)
+
+        self.assertEqual(threads_at_fork, [threads])
+        # The profiler has sampled the stacks of the running threads
+        self.assertTrue(_self.profiler.sampler.thread.ident)
+        self.assertEqual(_self.parallel, 'parallel')
+
     @patch('gobimport.import_client.Reader')
     def test_import_row_too_few_records(self, mock_Reader):
         reader = MagicMock()
@@ -91,46 +399,411 @@ class TestImportClient(TestCase):
         write = MagicMock()
 
         _self = MagicMock()
+        _self.timer = StageTimer()
         _self.mode = ImportMode.FULL
         _self.dataset = {}
+        _self.checkpointer = None
+        _self.parallel = None
         ImportClient.import_rows(_self, write, progress)
 
         _self.validator.result.assert_called_once_with()
         self.assertEquals(len(_self.logger.info.call_args_list), 3)
         self.assertEquals(len(_self.logger.error.call_args_list), 1)
 
-    @patch('gobimport.import_client.ContentsWriter')
     @patch('gobimport.import_client.ProgressTicker')
-    def test_import_dataset(self, mock_ProgressTicker, mock_ContentsWriter):
+    def test_import_dataset(self, mock_ProgressTicker):
         _self = MagicMock()
         _self.get_result_msg.return_value = 'res'
         writer = MagicMock()
-        mock_ContentsWriter.return_value.__enter__.return_value = writer
+        _self.contents_writer.return_value.__enter__.return_value = writer
         filename = 'fname'
         writer.filename = filename
-        writer.write = 'write'
+        output = _self.buffered_writer.return_value.__enter__.return_value
+        output.write = 'write'
         progress = MagicMock()
         mock_ProgressTicker.return_value.__enter__.return_value = progress
+        _self.start_delta.side_effect = lambda write: write
+        _self.init_checkpoints.return_value = None, None
 
         res = ImportClient.import_dataset(_self)
 
         self.assertEquals(res, 'res')
+        _self.timer.start.assert_called_once_with()
+        self.assertEqual(_self.issues.sample_size, _self.init_issue_sample_size.return_value)
+        _self.init_sample.assert_called_once_with()
         mock_ProgressTicker.called_once()
         _self.merger.prepare.assert_called_once_with(progress)
         self.assertEquals(_self.filename, filename)
+        _self.start_delta.assert_called_once_with('write')
         _self.import_rows.assert_called_once_with('write', progress)
         _self.merger.finish.assert_called_once_with('write')
         _self.entity_validator.result.assert_called_once()
+        _self.delta.write_deleted.assert_called_once_with()
+        _self.start_checkpoints.assert_not_called()
+        _self.buffered_writer.assert_called_once_with(writer)
+        _self.finish_import.assert_called_once_with()
+
+        # The import is profiled when the header asks for it
+        profiler = _self.init_profiler.return_value
+        self.assertEqual(_self.profiler, profiler)
+        profiler.__enter__.assert_called_once_with()
+        profiler.__exit__.assert_called_once_with(None, None, None)
+
+    @patch('gobimport.import_client.FileContentsWriter', MagicMock())
+    @patch('gobimport.import_client.ProgressTicker', MagicMock())
+    def test_import_dataset_delta(self):
+        _self = MagicMock()
+        _self.init_checkpoints.return_value = None, None
+        ImportClient.import_dataset(_self)
+        _self.import_rows.assert_called_once_with(_self.start_delta.return_value, ANY)
+        _self.merger.finish.assert_called_once_with(_self.start_delta.return_value)
+
+        # On failure the delta is discarded
+        _self = MagicMock()
+        _self.init_checkpoints.return_value = None, None
+        delta = _self.delta
+        _self.import_rows.side_effect = Exception('Boom')
+        ImportClient.import_dataset(_self)
+        _self.finish_import.assert_not_called()
+        delta.close.assert_called_once()
+        self.assertIsNone(_self.delta)
+
+    @patch('gobimport.import_client.Checkpointer')
+    def test_init_checkpoints(self, mock_Checkpointer):
+        import_client = ImportClient(self.mock_dataset, {'header': {'process_id': 'any process'}}, MagicMock())
+        self.assertEqual(import_client.init_checkpoints(), (None, None))
+
+        import_client.dataset['checkpoint_every'] = 10
+        for dir, options in [(None, {}), ('/any dir', {'workers': 2}), ('/any dir', {'delta': True})]:
+            with patch('gobimport.import_client.CHECKPOINT_DIR', dir):
+                import_client.dataset.update(options)
+                self.assertEqual(import_client.init_checkpoints(), (None, None))
+                import_client.dataset.pop('workers', None)
+                import_client.dataset.pop('delta', None)
+        self.assertEqual(import_client.logger.warning.call_count, 3)
+
+        with patch('gobimport.import_client.CHECKPOINT_DIR', '/any dir'):
+            # The state of merged imports and of the validation of states grows with the collection
+            import_client.source['merge'] = {'dataset': 'any dataset'}
+            self.assertEqual(import_client.init_checkpoints(), (None, None))
+            del import_client.source['merge']
+            with patch('gobimport.import_client.has_states', lambda catalogue, entity: True):
+                self.assertEqual(import_client.init_checkpoints(), (None, None))
+            self.assertEqual(import_client.logger.warning.call_count, 5)
+
+            with patch('gobimport.import_client.has_states', lambda catalogue, entity: False):
+                checkpointer, state = import_client.init_checkpoints()
+
+        self.assertEqual(checkpointer, mock_Checkpointer.return_value)
+        self.assertEqual(state, checkpointer.load.return_value)
+        # The checkpoint is specific for the import process
+        mock_Checkpointer.assert_called_once_with(
+            f"/any dir/{import_client.catalogue}_{import_client.entity}_{import_client.source_app}"
+            "_any process.checkpoint", 10, 'any process')
+
+        # Without a process id a retry cannot be recognized
+        import_client.header = {}
+        with patch('gobimport.import_client.CHECKPOINT_DIR', '/any dir'):
+            self.assertEqual(import_client.init_checkpoints(), (None, None))
+
+    @patch('gobimport.import_client.PrimaryKeys')
+    def test_start_checkpoints(self, mock_PrimaryKeys):
+        _self = MagicMock()
+        checkpointer = MagicMock(last=20)
+        ImportClient.start_checkpoints(_self, checkpointer, 'writer', None)
+        self.assertEqual(_self.checkpointer, checkpointer)
+        self.assertEqual(_self.writer, 'writer')
+        self.assertEqual(_self.validator.primary_keys, mock_PrimaryKeys.return_value)
+        mock_PrimaryKeys.assert_called_once_with(path=checkpointer.keys_path)
+
+        state = {
+            'writer': 'position',
+            'primary_keys': 'primary keys',
+            'collection_qa': 'collection qa',
+            'fatal': True,
+            'entity_validator': 'entity validator',
+            'enricher': 'enricher',
+            'merged': 'merged',
+            'issues': MagicMock(),
+            'qa_sample': 'qa sample',
+        }
+        writer = MagicMock()
+        ImportClient.start_checkpoints(_self, checkpointer, writer, state)
+        self.assertEqual(_self.validator.primary_keys, 'primary keys')
+        self.assertEqual(_self.validator.collection_qa, 'collection qa')
+        self.assertTrue(_self.validator.fatal)
+        self.assertEqual(_self.entity_validator, 'entity validator')
+        self.assertEqual(_self.enricher, 'enricher')
+        self.assertEqual(_self.merger.merged, 'merged')
+        _self.issues.restore.assert_called_once_with(state['issues'])
+        self.assertEqual(_self.sample, 'qa sample')
+        self.assertEqual(_self.validator.sample, 'qa sample')
+
+        # Checkpoints are saved with the same state, the pending issues are logged first
+        _self.n_rows = 30
+        _self.source_id = 'id'
+        _self.row = {'id': 'any id'}
+        ImportClient.checkpoint(_self)
+        checkpointer.save.assert_called_once_with(30, {
+            **state,
+            'writer': writer.position.return_value,
+            'issues': _self.issues,
+        }, 'any id')
+        _self.issues.flush.assert_called_once_with()
+
+        checkpointer.due.return_value = False
+        ImportClient.checkpoint(_self)
+        self.assertEqual(checkpointer.save.call_count, 1)
+
+    @patch('gobimport.import_client.Reader')
+    def test_import_rows_resume(self, mock_Reader):
+        mock_Reader.return_value.read.return_value = iter([{'id': i} for i in range(5)])
+
+        _self = MagicMock()
+        _self.timer = StageTimer()
+        _self.dataset = {}
+        _self.checkpointer.last = 3
+        _self.parallel = None
+        _self.converter.convert.side_effect = lambda row: row
+        _self.skip_processed_rows.side_effect = lambda rows: ImportClient.skip_processed_rows(_self, rows)
+        _self.source_id = 'id'
+        _self.checkpointer.last_source_id = 2
+        write = MagicMock()
+        ImportClient.import_rows(_self, write, MagicMock())
+
+        # The rows up to the checkpoint are skipped
+        self.assertEqual(write.call_args_list, [call({'id': 3}), call({'id': 4})])
+        self.assertEqual(_self.n_rows, 5)
+        self.assertEqual(_self.checkpoint.call_count, 2)
+
+    def test_skip_processed_rows(self):
+        _self = MagicMock()
+        _self.source_id = 'id'
+        _self.checkpointer.last = 0
+        rows = ImportClient.skip_processed_rows(_self, [{'id': 1}])
+        self.assertEqual(list(rows), [{'id': 1}])
+
+        _self.checkpointer.last = 2
+        _self.checkpointer.last_source_id = 2
+        rows = ImportClient.skip_processed_rows(_self, [{'id': 1}, {'id': 2}, {'id': 3}])
+        self.assertEqual(list(rows), [{'id': 3}])
+
+        # The source returns the rows in another order, or less rows
+        for rows in [[{'id': 2}, {'id': 1}, {'id': 3}], [{'id': 1}]]:
+            _self.checkpointer.remove.reset_mock()
+            with self.assertRaisesRegex(GOBException, "cannot resume after row 2"):
+                ImportClient.skip_processed_rows(_self, rows)
+            _self.checkpointer.remove.assert_called_once_with()
+
+    def test_finish_import(self):
+        _self = MagicMock()
+        ImportClient.finish_import(_self)
+        _self.finish_delta.assert_called_once_with()
+        _self.checkpointer.remove.assert_called_once_with()
 
+        _self = MagicMock(delta=None, checkpointer=None)
+        ImportClient.finish_import(_self)
+        _self.finish_delta.assert_not_called()
+
+    @patch('gobimport.import_client.DeltaWriter')
+    def test_start_delta(self, mock_DeltaWriter):
+        import_client = ImportClient(self.mock_dataset, self.mock_msg, MagicMock())
+        self.assertEqual(import_client.start_delta('write'), 'write')
+        self.assertIsNone(import_client.delta)
+
+        import_client.dataset['delta'] = True
+        with patch('gobimport.import_client.DELTA_DIR', None):
+            self.assertEqual(import_client.start_delta('write'), 'write')
+            import_client.logger.warning.assert_called_once()
+
+        import_client.mode = ImportMode.RECENT
+        with patch('gobimport.import_client.DELTA_DIR', '/any dir'):
+            self.assertEqual(import_client.start_delta('write'), 'write')
+
+            import_client.mode = ImportMode.FULL
+            write = import_client.start_delta('write')
+
+        self.assertEqual(write, mock_DeltaWriter.return_value.write)
+        self.assertEqual(import_client.delta, mock_DeltaWriter.return_value)
+        mock_DeltaWriter.assert_called_once_with(
+            f"/any dir/{import_client.catalogue}_{import_client.entity}_{import_client.source_app}.db", 'write')
+
+    def test_finish_delta(self):
+        _self = MagicMock()
+        _self.logger.get_summary.return_value = {'errors': []}
+
+        ImportClient.finish_delta(_self)
+        _self.delta.commit.assert_called_once()
+        _self.delta.close.assert_not_called()
+
+        # The delta of an import with errors is discarded
+        _self.delta.reset_mock()
+        _self.logger.get_summary.return_value = {'errors': ['any error']}
+        ImportClient.finish_delta(_self)
+        _self.delta.commit.assert_not_called()
+        _self.delta.close.assert_called_once()
+
+        # The delta is reported in the result message
+        import_client = ImportClient(self.mock_dataset, self.mock_msg, MagicMock())
+        import_client.filename = "filename"
+        import_client.delta = MagicMock(counts={'new': 1})
+        msg = import_client.get_result_msg()
+        self.assertEqual(msg['contents_ref'], "filename")
+        self.assertEqual(msg['summary']['delta'], {'new': 1})
+        self.assertEqual(msg['header']['mode'], "delta")
+
+    @patch('gobimport.import_client.FileContentsWriter', MagicMock())
+    @patch('gobimport.import_client.Reader')
+    def test_finish_delta_too_few_records(self, mock_Reader):
+        mock_Reader.return_value.read.return_value = []
+        errors = []
+        logger = MagicMock()
+        logger.error.side_effect = errors.append
+        logger.get_summary.side_effect = lambda: {'errors': errors}
+
+        import_client = ImportClient(self.mock_dataset, self.mock_msg, logger)
+        import_client.delta = MagicMock()
+        import_client.import_rows(MagicMock(), MagicMock())
+        import_client.finish_import()
+
+        self.assertEqual(errors, ["Too few records imported: 0 < 1"])
+        import_client.delta.commit.assert_not_called()
+        import_client.delta.close.assert_called_once()
+
+    @patch('gobimport.import_client.CompressedContentsWriter')
+    @patch('gobimport.import_client.FileContentsWriter')
     @patch('gobimport.import_client.ContentsWriter')
+    def test_compression(self, mock_ContentsWriter, mock_FileContentsWriter, mock_CompressedContentsWriter):
+        import_client = ImportClient(self.mock_dataset, self.mock_msg, MagicMock())
+        self.assertIsNone(import_client.init_compression())
+        # The gobcore writer writes contents that are not compressed or buffered
+        self.assertEqual(import_client.contents_writer(), mock_ContentsWriter.return_value)
+        import_client.header['buffered_write'] = True
+        self.assertEqual(import_client.contents_writer(), mock_FileContentsWriter.return_value)
+        with patch('gobimport.import_client.ResumableContentsWriter') as mock_ResumableContentsWriter:
+            writer = import_client.contents_writer(MagicMock(), {'writer': 'any position'})
+            self.assertEqual(writer, mock_ResumableContentsWriter.return_value)
+            mock_ResumableContentsWriter.assert_called_once_with('any position')
+        import_client.filename = "filename"
+        self.assertNotIn('compression', import_client.get_result_msg()['header'])
+
+        # The compression in the header overrides the compression of the dataset
+        self.mock_dataset['compression'] = 'gzip'
+        msg = {'header': {**self.mock_msg['header'], 'compression': {'codec': 'lzma', 'level': 1}}}
+        import_client = ImportClient(self.mock_dataset, msg, MagicMock())
+        import_client.compression = import_client.init_compression()
+        self.assertEqual(import_client.compression, ('lzma', 1))
+        self.assertEqual(import_client.contents_writer(), mock_CompressedContentsWriter.return_value)
+        mock_CompressedContentsWriter.assert_called_once_with('lzma', 1)
+
+        # The codec is reported in the result message
+        import_client.filename = "filename"
+        self.assertEqual(import_client.get_result_msg()['header']['compression'], 'lzma')
+
+        # Compressed imports cannot be resumed from a checkpoint
+        import_client.dataset['checkpoint_every'] = 10
+        with patch('gobimport.import_client.CHECKPOINT_DIR', '/any dir'):
+            self.assertEqual(import_client.init_checkpoints(), (None, None))
+
+    def test_import_dataset_invalid_compression(self):
+        # An unknown codec fails the import
+        self.mock_dataset['compression'] = 'any codec'
+        logger = MagicMock()
+        import_client = ImportClient(self.mock_dataset, self.mock_msg, logger)
+
+        msg = import_client.import_dataset()
+
+        logger.error.assert_any_call("Import has failed", ANY)
+        self.assertIn("Unknown compression codec any codec", logger.error.call_args[0][1]['data']['error'])
+        self.assertIsNone(msg['contents_ref'])
+
+    @patch('gobimport.import_client.Profiler')
+    def test_init_profiler(self, mock_Profiler):
+        import_client = ImportClient(self.mock_dataset, self.mock_msg, MagicMock())
+        self.assertIsNone(import_client.init_profiler())
+
+        import_client.header['profile'] = 'cpu'
+        with patch('gobimport.import_client.PROFILE_DIR', None):
+            self.assertIsNone(import_client.init_profiler())
+        import_client.logger.warning.assert_called_once()
+
+        with patch('gobimport.import_client.PROFILE_DIR', '/any dir'):
+            self.assertEqual(import_client.init_profiler(), mock_Profiler.return_value)
+            import_client.header['profile'] = 'any profile'
+            self.assertIsNone(import_client.init_profiler())
+        mock_Profiler.assert_called_once_with('cpu', '/any dir', ANY)
+        self.assertTrue(mock_Profiler.call_args[0][2].startswith(
+            f"{import_client.catalogue}_{import_client.entity}_{import_client.source_app}_"))
+
+        # The profile is referenced in the summary
+        import_client.filename = "filename"
+        self.assertNotIn('profile', import_client.get_result_msg()['summary'])
+        import_client.profiler = mock_Profiler.return_value
+        self.assertEqual(import_client.get_result_msg()['summary']['profile'],
+                         mock_Profiler.return_value.summary.return_value)
+        mock_Profiler.return_value.summary.return_value = None
+        self.assertNotIn('profile', import_client.get_result_msg()['summary'])
+
+    @patch('gobimport.import_client.CompressedContentsWriter')
+    @patch('gobimport.import_client.ShardedContentsWriter')
+    def test_shards(self, mock_ShardedContentsWriter, mock_CompressedContentsWriter):
+        import_client = ImportClient(self.mock_dataset, self.mock_msg, MagicMock())
+        self.assertEqual(import_client.init_shards(), 1)
+        import_client.filename = "filename"
+        self.assertNotIn('shards', import_client.get_result_msg()['header'])
+
+        # The number of shards in the header overrides the number of shards of the dataset
+        self.mock_dataset['shards'] = 4
+        self.mock_dataset['compression'] = 'gzip'
+        msg = {'header': {**self.mock_msg['header'], 'shards': 8}}
+        import_client = ImportClient(self.mock_dataset, msg, MagicMock())
+        import_client.compression = import_client.init_compression()
+        import_client.shards = import_client.init_shards()
+        self.assertEqual(import_client.shards, 8)
+
+        self.assertEqual(import_client.contents_writer(), mock_ShardedContentsWriter.return_value)
+        mock_ShardedContentsWriter.assert_called_once_with(8, ANY, 'gzip')
+        # The shards are written by the writer of a single contents file
+        new_writer = mock_ShardedContentsWriter.call_args[0][1]
+        self.assertEqual(new_writer(), mock_CompressedContentsWriter.return_value)
+
+        # The shards are reported in the result message
+        import_client.filename = "filename"
+        self.assertEqual(import_client.get_result_msg()['header']['shards'], 8)
+
+        # Sharded imports cannot be resumed from a checkpoint
+        import_client.compression = None
+        import_client.dataset['checkpoint_every'] = 10
+        with patch('gobimport.import_client.CHECKPOINT_DIR', '/any dir'):
+            self.assertEqual(import_client.init_checkpoints(), (None, None))
+
+    def test_init_shards(self):
+        import_client = ImportClient(self.mock_dataset, self.mock_msg, MagicMock())
+        for shards in [-1, 'any', '2.5', [4]]:
+            import_client.header = {'shards': shards}
+            with self.assertRaisesRegex(GOBException, "number of shards should be a positive integer"):
+                import_client.init_shards()
+
+        import_client.header = {'shards': '3'}
+        self.assertEqual(import_client.init_shards(), 3)
+
+        # An invalid number of shards fails the import
+        logger = MagicMock()
+        import_client = ImportClient(self.mock_dataset, {'header': {'shards': -2}}, logger)
+        msg = import_client.import_dataset()
+        logger.error.assert_any_call("Import has failed", ANY)
+        self.assertIsNone(msg['contents_ref'])
+        self.assertEqual(import_client.shards, 1)
+
     @patch('gobimport.import_client.ProgressTicker')
     @patch('gobimport.import_client.traceback')
-    def test_import_dataset_exception(self, mock_traceback, mock_ProgressTicker, mock_ContentsWriter):
+    def test_import_dataset_exception(self, mock_traceback, mock_ProgressTicker):
         _self = MagicMock()
         _self.get_result_msg.return_value = 'res'
         writer = MagicMock()
         writer.side_effect = Exception('Boom')
-        mock_ContentsWriter.return_value.__enter__ = writer
+        _self.contents_writer.return_value.__enter__ = writer
+        _self.init_checkpoints.return_value = None, None
 
         res = ImportClient.import_dataset(_self)
 
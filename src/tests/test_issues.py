@@ -0,0 +1,147 @@
+import unittest
+
+from unittest.mock import MagicMock, patch
+
+from gobcore.quality.issue import QA_CHECK, QA_LEVEL, Issue
+
+from gobimport.issues import IssueAggregator, add_issue, log_issue, sampled_issues
+
+
+@patch("gobimport.issues.logger")
+@patch("gobimport.issues._log_issue")
+class TestIssueAggregator(unittest.TestCase):
+
+    def test_add(self, mock_log_issue, mock_logger):
+        issues = IssueAggregator(sample_size=3, flush_size=2)
+        for i in range(5):
+            issues.add(QA_LEVEL.WARNING, Issue(QA_CHECK.Value_not_empty, {'id': i, 'naam': None}, 'id', 'naam'))
+        issues.add(QA_LEVEL.ERROR, Issue(QA_CHECK.Format_N8, {'id': 9, 'code': 'x'}, 'id', 'code'))
+
+        # Only the first issues of each check are logged individually, in batches
+        mock_log_issue.assert_not_called()
+        self.assertEqual(mock_logger.add_issue.call_count, 4)
+        self.assertEqual(len(issues.pending), 0)
+        self.assertEqual([c[0][0].entity_id for c in mock_logger.add_issue.call_args_list], [0, 1, 2, 9])
+
+        # With one log message per check, attribute and level for each batch
+        self.assertEqual(mock_logger.data_warning.call_count, 2)
+        self.assertEqual(mock_logger.data_warning.call_args_list[0][0][1]['data']['issues'],
+                         [{'id': 0, 'value': None}, {'id': 1, 'value': None}])
+        mock_logger.data_error.assert_called_once()
+
+        issues.add(QA_LEVEL.ERROR, Issue(QA_CHECK.Format_N8, {'id': 10, 'code': 'y'}, 'id', 'code'))
+        self.assertEqual(len(issues.pending), 1)
+
+        summary = issues.finish()
+        self.assertEqual(mock_logger.add_issue.call_count, 5)
+        self.assertEqual(mock_logger.data_error.call_count, 2)
+        self.assertEqual(summary, [{
+            'check': QA_CHECK.Value_not_empty['msg'],
+            'attribute': 'naam',
+            'level': QA_LEVEL.WARNING,
+            'count': 5,
+            'logged': 3,
+            'sample': [{'id': i, 'value': None} for i in range(5)],
+            'sampled': False,
+        }, {
+            'check': QA_CHECK.Format_N8['msg'],
+            'attribute': 'code',
+            'level': QA_LEVEL.ERROR,
+            'count': 2,
+            'logged': 2,
+            'sample': [{'id': 9, 'value': 'x'}, {'id': 10, 'value': 'y'}],
+            'sampled': False,
+        }])
+
+        # Only the counts of the checks that have not all been logged are logged
+        mock_logger.warning.assert_called_once()
+        self.assertEqual(mock_logger.warning.call_args[0][1], {'data': summary[0]})
+        mock_logger.error.assert_not_called()
+
+    def test_sample(self, mock_log_issue, mock_logger):
+        issues = IssueAggregator(sample_size=0)
+        for i in range(20):
+            issues.add(QA_LEVEL.FATAL, Issue(QA_CHECK.Value_not_empty, {'id': i, 'naam': [i]}, 'id', 'naam'))
+
+        mock_logger.add_issue.assert_not_called()
+        summary = issues.finish()
+        self.assertEqual(summary[0]['count'], 20)
+        self.assertEqual(summary[0]['logged'], 0)
+        # The number of samples is limited, values are reported as strings when needed
+        self.assertEqual(summary[0]['sample'], [{'id': i, 'value': f"[{i}]"} for i in range(10)])
+        mock_logger.error.assert_called_once()
+
+    def test_restore(self, mock_log_issue, mock_logger):
+        checkpoint = IssueAggregator()
+        checkpoint.add(QA_LEVEL.WARNING, Issue(QA_CHECK.Value_not_empty, {'id': 1}, 'id', 'naam'))
+
+        issues = IssueAggregator()
+        issues.restore(checkpoint)
+        issues.add(QA_LEVEL.WARNING, Issue(QA_CHECK.Value_not_empty, {'id': 2}, 'id', 'naam'))
+        self.assertEqual(issues.summary()[0]['count'], 2)
+
+    @patch("gobimport.issues.Issue")
+    def test_add_check(self, mock_issue, mock_log_issue, mock_logger):
+        issues = IssueAggregator(sample_size=12)
+        for i in range(20):
+            issues.add_check(QA_LEVEL.WARNING, QA_CHECK.Value_not_empty, {'id': i}, 'id', 'naam')
+
+        # Only the issues that are logged individually are built
+        self.assertEqual(mock_issue.call_count, 12)
+        mock_issue.assert_called_with(QA_CHECK.Value_not_empty, {'id': 11}, 'id', 'naam')
+        self.assertEqual(issues.summary()[0]['count'], 20)
+        self.assertEqual(len(issues.summary()[0]['sample']), 10)
+
+        # The samples are still taken when no issues are logged individually
+        issues = IssueAggregator(sample_size=0)
+        for i in range(20):
+            issues.add_check(QA_LEVEL.WARNING, QA_CHECK.Value_not_empty, {'id': i}, 'id', 'naam')
+        self.assertEqual(mock_issue.call_count, 22)
+        self.assertEqual(len(issues.pending), 0)
+
+    def test_add_issue(self, mock_log_issue, mock_logger):
+        logger = MagicMock()
+
+        # Outside an import the issue is logged directly
+        add_issue(logger, QA_LEVEL.WARNING, QA_CHECK.Value_not_empty, {'id': 1}, 'id', 'naam')
+        mock_log_issue.assert_called_once()
+        self.assertEqual(mock_log_issue.call_args[0][2].entity_id, 1)
+
+        issues = IssueAggregator()
+        with issues.collect(), sampled_issues():
+            add_issue(logger, QA_LEVEL.WARNING, QA_CHECK.Value_not_empty, {'id': 2}, 'id', 'naam')
+        mock_log_issue.assert_called_once()
+        self.assertEqual([(i['sampled'], i['sample']) for i in issues.summary()], [(True, [{'id': 2, 'value': None}])])
+
+    def test_log_issue(self, mock_log_issue, mock_logger):
+        logger = MagicMock()
+        issue = Issue(QA_CHECK.Value_not_empty, {'id': 1}, 'id', 'naam')
+
+        # Outside an import the issue is logged directly
+        log_issue(logger, QA_LEVEL.WARNING, issue)
+        mock_log_issue.assert_called_once_with(logger, QA_LEVEL.WARNING, issue)
+
+        issues = IssueAggregator()
+        other = IssueAggregator()
+        with issues.collect():
+            log_issue(logger, QA_LEVEL.WARNING, issue)
+            # The issues of another import are not affected
+            with other.collect():
+                log_issue(logger, QA_LEVEL.ERROR, issue)
+            log_issue(logger, QA_LEVEL.WARNING, issue)
+
+        log_issue(logger, QA_LEVEL.WARNING, issue)
+        self.assertEqual(mock_log_issue.call_count, 2)
+        self.assertEqual([i['count'] for i in issues.summary()], [2])
+        self.assertEqual([i['count'] for i in other.summary()], [1])
+
+    def test_sampled(self, mock_log_issue, mock_logger):
+        issues = IssueAggregator()
+        with issues.collect():
+            log_issue(mock_logger, QA_LEVEL.WARNING, Issue(QA_CHECK.Value_not_empty, {}, 'id', 'naam'), sampled=True)
+            with sampled_issues():
+                log_issue(mock_logger, QA_LEVEL.WARNING, Issue(QA_CHECK.Value_not_empty, {}, 'id', 'naam'))
+            log_issue(mock_logger, QA_LEVEL.WARNING, Issue(QA_CHECK.Value_not_empty, {}, 'id', 'naam'))
+
+        # The issues of sampled checks are counted apart from the issues of the same check on all entities
+        self.assertEqual([(issue['sampled'], issue['count']) for issue in issues.finish()], [(True, 2), (False, 1)])
@@ -123,9 +123,11 @@ class TestMain(TestCase):
             with self.assertRaises(GOBException):
                 extract_dataset_from_msg({'header': case})
 
+    @patch("gobimport.__main__.warm")
     @patch("gobimport.__main__.messagedriven_service")
-    def test_main_entry(self, mock_messagedriven_service):
+    def test_main_entry(self, mock_messagedriven_service, mock_warm):
         from gobimport import __main__ as module
         with patch.object(module, "__name__", "__main__"):
             module.init()
+            mock_warm.assert_called_once()
             mock_messagedriven_service.assert_called_with(SERVICEDEFINITION, "Import")
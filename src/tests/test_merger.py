@@ -1,9 +1,10 @@
+import os
 import unittest
 
 from unittest import mock
 
 from gobimport.import_client import ImportClient
-from gobimport.merger import Merger
+from gobimport.merger import Merger, SpilledMergeItems
 
 
 class TestMerger(unittest.TestCase):
@@ -153,5 +154,58 @@ class TestMerger(unittest.TestCase):
         self.assertIsNone(merger.merge_items.get(2))
         self.assertEqual(len(finished), 1)
 
+    def test_collect_entity_spill(self):
+        merger = Merger(None)
+        merge_def = {
+            "on": "any on",
+            "spill_size": 2
+        }
+        merger._collect_entity({"any on": "a"}, merge_def)
+        merger._collect_entity({"any on": "b"}, merge_def)
+        self.assertEqual(merger.merge_items, {'a': {'entities': [{'any on': 'a'}]},
+                                              'b': {'entities': [{'any on': 'b'}]}})
+
+        merger._collect_entity({"any on": "a", "n": 2}, merge_def)
+        self.assertIsInstance(merger.merge_items, SpilledMergeItems)
+        merger._collect_entity({"any on": "c"}, merge_def)
+        self.assertEqual(merger.merge_items.get("a"), {'entities': [{'any on': 'a'}, {'any on': 'a', 'n': 2}]})
+        self.assertEqual(merger.merge_items.get("c"), {'entities': [{'any on': 'c'}]})
+        self.assertIsNone(merger.merge_items.get("d"))
+
+        merger.merge_def = {"on": "any on"}
+        merger.merged = {"b"}
+        finished = []
+        merger.finish(lambda e: finished.append(e))
+        self.assertEqual(finished, [{'any on': 'a'}, {'any on': 'a', 'n': 2}, {'any on': 'c'}])
+        self.assertEqual(merger.merge_items, {})
+
+    @mock.patch('gobimport.merger.SPILL_BATCH_SIZE', 2)
+    def test_spilled_merge_items(self):
+        items = SpilledMergeItems({1: {"entities": [{"id": 1}]}})
+        for key, entity in [(2, {"id": 2}), (None, {"id": 3}), (1, {"id": 4}), (None, {"id": 5})]:
+            items.add(key, entity)
+
+        self.assertEqual(items.get(1), {"entities": [{"id": 1}, {"id": 4}]})
+        self.assertEqual(items.get(None), {"entities": [{"id": 3}, {"id": 5}]})
+        self.assertEqual(items.get(3, "default"), "default")
+        self.assertEqual(list(items.items()), [
+            (1, {"entities": [{"id": 1}, {"id": 4}]}),
+            (2, {"entities": [{"id": 2}]}),
+            (None, {"entities": [{"id": 3}, {"id": 5}]}),
+        ])
+
+        dir = items.dir.name
+        items.close()
+        self.assertFalse(os.path.exists(dir))
+
     def test_finish(self):
-        pass
\ No newline at end of file
+        merger = Merger(None)
+        merger.finish(lambda e: None)
+
+        merger.merge_def = {"on": "any on"}
+        merger.merge_items = {"a": {"entities": [{"any on": "a"}]}, "b": {"entities": [{"any on": "b"}]}}
+        merger.merged = {"a"}
+        finished = []
+        merger.finish(lambda e: finished.append(e))
+        self.assertEqual(finished, [{"any on": "b"}])
+        self.assertEqual(merger.merge_items, {})
@@ -0,0 +1,56 @@
+from unittest import TestCase, mock
+
+from gobimport.converter import _report_extract_error
+from gobimport.parallel import ParallelConverter
+
+
+class MockConverter:
+
+    def convert_batch(self, rows):
+        if 'boom' in rows:
+            raise ValueError('boom')
+        for row in rows:
+            if row == 7:
+                _report_extract_error({'id': '7'}, 'field', 'value', 'id')
+        return [{'row': row} for row in rows]
+
+
+class MockValidator:
+
+    def check_quality(self, entity):
+        return ['odd'] if entity['row'] % 2 else []
+
+
+class TestParallelConverter(TestCase):
+
+    def test_map(self):
+        batches = [([i, i + 1, i + 2], f"context {i}") for i in range(0, 30, 3)]
+
+        with ParallelConverter(MockConverter(), MockValidator(), 2, max_pending=3) as converter:
+            result = list(converter.map(iter(batches)))
+
+        # Results are returned in the order of the batches
+        self.assertEqual([context for context, _ in result], [context for _, context in batches])
+        self.assertEqual(result[1], ('context 3', [({'row': 3}, ['odd']), ({'row': 4}, []), ({'row': 5}, ['odd'])]))
+
+    @mock.patch('gobimport.parallel.logger')
+    def test_map_extract_errors(self, mock_logger):
+        # The extraction errors of the workers are logged by the importing process
+        with mock.patch('gobimport.converter.logger') as mock_converter_logger:
+            with ParallelConverter(MockConverter(), MockValidator(), 2) as converter:
+                list(converter.map([([6, 7], 'context')]))
+
+        mock_logger.error.assert_called_once_with("Error importing object with id 7. Can't extract value for field field")
+        mock_converter_logger.error.assert_not_called()
+
+    def test_map_default_max_pending(self):
+        converter = ParallelConverter(MockConverter(), MockValidator(), 3)
+        self.assertEqual(converter.max_pending, 6)
+
+    def test_map_exception(self):
+        with self.assertRaises(ValueError):
+            with ParallelConverter(MockConverter(), MockValidator(), 2) as converter:
+                list(converter.map([([1], 'ok'), (['boom'], 'fails')]))
+
+        # The context of the failed batch is kept
+        self.assertEqual(converter.failed, 'fails')
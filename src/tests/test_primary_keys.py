@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+from gobimport.validator.primary_keys import PrimaryKeys
+
+
+class TestPrimaryKeys(unittest.TestCase):
+
+    def test_no_duplicates(self):
+        primary_keys = PrimaryKeys(batch_size=4)
+        for key in range(100):
+            primary_keys.add(f"{key}.1")
+
+        self.assertEqual(primary_keys.size, 100)
+        # Each run is more than twice as long as the next run
+        lengths = [len(run) for run in primary_keys.runs]
+        self.assertTrue(all(longer > 2 * shorter for longer, shorter in zip(lengths, lengths[1:])))
+        self.assertTrue(all((run[1:] > run[:-1]).all() for run in primary_keys.runs))
+        self.assertEqual(primary_keys.duplicates(), set())
+
+    def test_duplicates(self):
+        primary_keys = PrimaryKeys(batch_size=3)
+        for key in ["a", "b", "a", "c\nd", 1, "c\nd", "a", "€"]:
+            primary_keys.add(key)
+
+        self.assertEqual(primary_keys.duplicates(), {"a", "c\nd"})
+        self.assertEqual(primary_keys.size, 5)
+
+        # Keys can still be added after the duplicates have been determined
+        primary_keys.add("€")
+        self.assertEqual(primary_keys.duplicates(), {"a", "c\nd", "€"})
+
+    @mock.patch("gobimport.validator.primary_keys.hash", lambda key: 1, create=True)
+    def test_hash_collisions(self):
+        # Keys with equal hashes are candidates, but only keys that are equal are duplicates
+        primary_keys = PrimaryKeys(batch_size=2)
+        for key in ["a", "b", "c", "b"]:
+            primary_keys.add(key)
+        self.assertEqual(primary_keys.candidates, {"a", "b", "c"})
+        self.assertEqual(primary_keys.duplicates(), {"b"})
+
+        # Also when the keys are kept in a file for checkpoints
+        with tempfile.TemporaryDirectory() as directory:
+            primary_keys = PrimaryKeys(path=os.path.join(directory, "keys"))
+            for key in ["a", "b", "c", "b"]:
+                primary_keys.add(key)
+            self.assertEqual(primary_keys.duplicates(), {"b"})
+            primary_keys.keys.close()
@@ -0,0 +1,115 @@
+import cProfile
+import os
+import pstats
+import tempfile
+import threading
+import tracemalloc
+import unittest
+
+from collections import Counter
+from unittest import mock
+
+from gobcore.exceptions import GOBException
+
+from gobimport.profiler import Profiler, StackSampler, write_collapsed
+
+
+def workload(n=50000):
+    return [str(i) * 10 for i in range(n)]
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_unknown_kind(self):
+        with self.assertRaises(GOBException):
+            Profiler("any kind", self.dir.name, "any name")
+
+    def test_cpu(self):
+        with Profiler("cpu", self.dir.name, "any name") as profiler:
+            workload()
+
+        summary = profiler.summary()
+        self.assertEqual(summary, {
+            'kind': 'cpu',
+            'profile': os.path.join(self.dir.name, "any name.prof"),
+            'collapsed': os.path.join(self.dir.name, "any name.collapsed"),
+        })
+
+        stats = pstats.Stats(summary['profile'])
+        self.assertTrue(any(name == 'workload' for _, _, name in stats.stats))
+        self.assertTrue(os.path.exists(summary['collapsed']))
+
+    def test_alloc(self):
+        with Profiler("alloc", self.dir.name, "any name") as profiler:
+            data = workload(5000)
+
+        self.assertFalse(tracemalloc.is_tracing())
+        summary = profiler.summary()
+        self.assertEqual(summary['kind'], 'alloc')
+        self.assertGreater(summary['peak_bytes'], 0)
+
+        snapshot = tracemalloc.Snapshot.load(summary['profile'])
+        self.assertGreater(len(snapshot.traces), 0)
+        with open(summary['collapsed']) as file:
+            lines = file.read().splitlines()
+        # The memory of the workload is held at the end of the profile
+        self.assertIn("test_profiler.py:", lines[0])
+        self.assertGreater(int(lines[0].rsplit(" ", 1)[1]), 0)
+        del data
+
+    def test_failed(self):
+        with self.assertRaises(ValueError), Profiler("cpu", self.dir.name, "any name") as profiler:
+            raise ValueError("any error")
+
+        self.assertTrue(os.path.exists(profiler.summary()['profile']))
+
+    def test_not_written(self):
+        # A profile that cannot be written does not fail the import
+        path = os.path.join(self.dir.name, "any file")
+        open(path, "w").close()
+        for kind in ["cpu", "alloc"]:
+            with mock.patch("gobimport.profiler.logger") as mock_logger, \
+                    Profiler(kind, os.path.join(path, "any dir"), "any name") as profiler:
+                workload(100)
+
+            mock_logger.warning.assert_called_once()
+            self.assertIsNone(profiler.summary())
+            self.assertFalse(tracemalloc.is_tracing())
+
+
+class TestStackSampler(unittest.TestCase):
+
+    def test_sample(self):
+        event = threading.Event()
+        thread = threading.Thread(target=event.wait, name="any thread")
+        thread.start()
+
+        sampler = StackSampler()
+        sampler.sample()
+        event.set()
+        thread.join()
+
+        stacks = [stack for stack in sampler.stacks if stack[0] == "any thread"]
+        self.assertEqual(len(stacks), 1)
+        self.assertEqual(stacks[0][-1], "threading:wait")
+        self.assertEqual(sampler.stacks[stacks[0]], 1)
+
+    def test_start_stop(self):
+        sampler = StackSampler(interval=0.001)
+        sampler.start()
+        while not sampler.stacks:
+            workload()
+        sampler.stop()
+        self.assertFalse(sampler.thread.is_alive())
+        self.assertTrue(any("tests.test_profiler:test_start_stop" in stack for stack in sampler.stacks))
+
+    def test_write_collapsed(self):
+        with tempfile.NamedTemporaryFile("r") as file:
+            write_collapsed(file.name, Counter({('a', 'b;c'): 1, ('a',): 3}))
+            self.assertEqual(file.read(), "a 3\na;b:c 1\n")
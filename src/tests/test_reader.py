@@ -2,7 +2,7 @@ import unittest
 
 from unittest import mock
 
-from gobimport.reader import Reader, ImportMode
+from gobimport.reader import Reader, ImportMode, Prefetcher
 
 
 @mock.patch('gobimport.reader.logger', mock.MagicMock())
@@ -92,6 +92,16 @@ class TestReader(unittest.TestCase):
         reader.read()
         reader.datastore.query.assert_called_with('a\nb\nc\nd\ne')
 
+    def test_read_prefetch(self):
+        reader = Reader({'query': ['a'], 'read_config': {'prefetch': 2}}, self.app, self.dataset())
+        reader.datastore = mock.MagicMock()
+        reader.datastore.query.return_value = iter(range(2500))
+
+        result = reader.read()
+
+        self.assertNotIsInstance(result, list)
+        self.assertEqual(list(result), list(range(2500)))
+
     def test_set_secure_attributes(self):
         reader = Reader(self.source, self.app, self.dataset())
         mapping = {
@@ -154,7 +164,7 @@ class TestReader(unittest.TestCase):
 
     def test_query(self):
         reader = Reader(self.source, self.app, self.dataset())
-        reader._protect_row = lambda x: 'protected(' + x + ')'
+        reader._protect_row = lambda x, columns: 'protected(' + x + ')'
         reader.secure_attributes = []
         query = iter(['a', 'b'])
 
@@ -166,3 +176,57 @@ class TestReader(unittest.TestCase):
             'protected(a)',
             'protected(b)',
         ], list(reader._query(query)))
+
+
+    @mock.patch("gobimport.reader.read_protect", lambda x: 'read_protected(' + x + ')')
+    def test_protect_row_columns(self):
+        reader = Reader(self.source, self.app, self.dataset())
+        reader.secure_attributes = ['attrB', {'not': 'a column'}, 'attrC', 'attrB']
+        self.assertEqual(reader._secure_columns(), ('attrB', 'attrC'))
+
+        row = {'attrA': 'valA', 'attrB': 'valB'}
+        self.assertEqual({
+            'attrA': 'valA',
+            'attrB': 'read_protected(valB)',
+        }, reader._protect_row(row, reader._secure_columns()))
+
+    @mock.patch("gobimport.reader.PROTECT_BATCH_SIZE", 3)
+    @mock.patch("gobimport.reader.read_protect", lambda x: 'read_protected(' + x + ')')
+    def test_query_protect_workers(self):
+        reader = Reader({**self.source, 'read_config': {'protect_workers': 2}}, self.app, self.dataset())
+        reader.secure_attributes = ['secure']
+        rows = [{'id': i, 'secure': str(i)} for i in range(20)]
+
+        self.assertEqual(list(reader._query(iter(rows))), [
+            {'id': i, 'secure': f"read_protected({i})"} for i in range(20)
+        ])
+
+
+@mock.patch('gobimport.reader.logger', mock.MagicMock())
+class TestPrefetcher(unittest.TestCase):
+
+    def test_prefetch(self):
+        rows = ({'id': i} for i in range(25))
+        self.assertEqual(list(Prefetcher(rows, 2, batch_size=4)), [{'id': i} for i in range(25)])
+        self.assertEqual(list(Prefetcher(iter([]), 2)), [])
+
+    def test_prefetch_exception(self):
+        def rows():
+            yield 1
+            yield 2
+            raise ValueError("Read failed")
+
+        result = []
+        with self.assertRaisesRegex(ValueError, "Read failed"):
+            for row in Prefetcher(rows(), 1, batch_size=1):
+                result.append(row)
+        self.assertEqual(result, [1, 2])
+
+    def test_prefetch_stop(self):
+        prefetcher = Prefetcher(iter(range(100)), 1, batch_size=1)
+        rows = iter(prefetcher)
+        self.assertEqual(next(rows), 0)
+
+        # The prefetch thread stops when the consumer stops
+        rows.close()
+        self.assertTrue(prefetcher.stopped.is_set())
@@ -0,0 +1,60 @@
+import unittest
+
+from gobcore.exceptions import GOBException
+from gobcore.quality.issue import QA_LEVEL
+
+from gobimport.sampling import QASample, in_sample
+
+
+class TestSampling(unittest.TestCase):
+
+    def test_in_sample(self):
+        ids = [str(i) for i in range(10000)]
+        sample = [id for id in ids if in_sample(id, 0.1)]
+
+        # The sample is deterministic and has about the requested size
+        self.assertEqual(sample, [id for id in ids if in_sample(id, 0.1)])
+        self.assertTrue(900 < len(sample) < 1100)
+
+        # A larger sample includes the smaller sample
+        self.assertTrue(set(sample) < {id for id in ids if in_sample(id, 0.2)})
+
+        self.assertTrue(all(in_sample(id, 1) for id in ids))
+        self.assertTrue(in_sample(None, 0.1))
+
+    def test_qa_sample(self):
+        sample = QASample()
+        self.assertEqual(sample.rate, 1)
+        self.assertFalse(sample.active)
+
+        for rate in [0, 1.5, "any rate", [0.5]]:
+            with self.assertRaises(GOBException):
+                QASample(rate)
+
+        sample = QASample(0.5)
+        self.assertTrue(sample.active)
+        entities = [{'_source_id': str(i)} for i in range(100)]
+        counted = [sample.count(entity) for entity in entities]
+        self.assertEqual(counted, [sample.includes(entity) for entity in entities])
+        self.assertEqual(sample.entities, 100)
+        self.assertEqual(sample.sampled, sum(counted))
+
+        self.assertEqual(sample.extrapolate(sample.sampled), 100)
+        self.assertEqual(QASample(0.5).extrapolate(3), 3)
+
+    def test_summary(self):
+        sample = QASample(0.1)
+        sample.entities, sample.sampled = 1000, 100
+        issues = [
+            {'check': 'any check', 'attribute': 'any attr', 'level': QA_LEVEL.WARNING, 'count': 7, 'sampled': True},
+            {'check': 'any check', 'attribute': 'any attr', 'level': QA_LEVEL.ERROR, 'count': 3, 'sampled': False},
+        ]
+        self.assertEqual(sample.summary(issues), {
+            'rate': 0.1,
+            'entities': 1000,
+            'sampled': 100,
+            'issues': [
+                {'check': 'any check', 'attribute': 'any attr', 'level': QA_LEVEL.WARNING, 'count': 7,
+                 'extrapolated': 70},
+            ],
+        })
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import unittest
+
+from unittest.mock import MagicMock
+
+from gobimport.compression import CompressedContentsWriter, open_compressed
+from gobimport.shards import ShardedContentsWriter, file_checksum, get_shard
+from gobimport.writer import BufferedWriter, FileContentsWriter
+
+
+class TestShards(unittest.TestCase):
+
+    def setUp(self):
+        self.entities = [{'_source_id': f"{i}.1", 'id': i} for i in range(100)] + [{'id': 'no source id'}]
+        self.filenames = []
+
+    def tearDown(self):
+        for filename in self.filenames:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def _read_manifest(self, writer):
+        with open(writer.filename) as file:
+            manifest = json.load(file)
+        self.filenames += [writer.filename] + [shard['filename'] for shard in manifest['shards']]
+        return manifest
+
+    def test_get_shard(self):
+        self.assertEqual(get_shard(None, 4), 0)
+        self.assertEqual(get_shard("any id", 1), 0)
+
+        shards = [get_shard(f"{i}.1", 4) for i in range(1000)]
+        # The shard is stable
+        self.assertEqual(shards, [get_shard(f"{i}.1", 4) for i in range(1000)])
+        self.assertEqual(set(shards), {0, 1, 2, 3})
+
+    def test_file_checksum(self):
+        with FileContentsWriter() as writer:
+            writer.write({'any': 'entity'})
+        self.filenames.append(writer.filename)
+        with open(writer.filename, "rb") as file:
+            self.assertEqual(file_checksum(writer.filename), hashlib.sha256(file.read()).hexdigest())
+
+    def test_write(self):
+        with ShardedContentsWriter(3, FileContentsWriter) as writer:
+            for entity in self.entities:
+                writer.write(entity)
+
+        manifest = self._read_manifest(writer)
+        self.assertEqual(manifest['rows'], len(self.entities))
+        self.assertEqual(manifest['sharding']['shards'], 3)
+        self.assertIsNone(manifest['compression'])
+
+        written = []
+        for index, shard in enumerate(manifest['shards']):
+            self.assertEqual(shard['shard'], index)
+            self.assertEqual(shard['sha256'], file_checksum(shard['filename']))
+            with open(shard['filename']) as file:
+                entities = json.load(file)
+            self.assertEqual(shard['rows'], len(entities))
+            self.assertTrue(all(get_shard(entity.get('_source_id'), 3) == index for entity in entities))
+            written.extend(entities)
+
+        self.assertEqual(sorted(written, key=str), sorted(self.entities, key=str))
+
+    def test_write_batch(self):
+        # Batches are written per shard, in the order of the batch
+        with ShardedContentsWriter(3, FileContentsWriter) as expected:
+            for entity in self.entities:
+                expected.write(entity)
+        expected_manifest = self._read_manifest(expected)
+
+        with ShardedContentsWriter(3, FileContentsWriter) as writer, \
+                BufferedWriter(writer, batch_size=10) as buffered_writer:
+            for entity in self.entities:
+                buffered_writer.write(entity)
+
+        manifest = self._read_manifest(writer)
+        self.assertEqual([(shard['rows'], shard['sha256']) for shard in manifest['shards']],
+                         [(shard['rows'], shard['sha256']) for shard in expected_manifest['shards']])
+
+    def test_compressed(self):
+        with ShardedContentsWriter(2, lambda: CompressedContentsWriter('gzip'), 'gzip') as writer:
+            for entity in self.entities:
+                writer.write(entity)
+
+        manifest = self._read_manifest(writer)
+        self.assertEqual(manifest['compression'], 'gzip')
+        written = []
+        for shard in manifest['shards']:
+            with open_compressed(shard['filename'], 'gzip') as file:
+                written.extend(json.load(file))
+        self.assertEqual(len(written), len(self.entities))
+
+    def test_new_writer(self):
+        new_writer = MagicMock()
+        writer = ShardedContentsWriter(4, new_writer)
+        self.assertEqual(new_writer.call_count, 4)
+        self.assertEqual(writer.filename, f"{new_writer.return_value.filename}.manifest.json")
@@ -0,0 +1,62 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from gobimport.timer import StageTimer
+
+
+@patch('gobimport.timer.time')
+class TestStageTimer(TestCase):
+
+    def test_wrap(self, mock_time):
+        mock_time.perf_counter.side_effect = [1, 3]
+        mock_time.process_time.side_effect = [0, 0.5]
+        timer = StageTimer()
+
+        timed = timer.wrap('stage', lambda x: x * 2)
+        self.assertEqual(timed(2), 4)
+        self.assertEqual(timer.stages, {'stage': [2, 0.5]})
+
+    def test_wrap_exception(self, mock_time):
+        mock_time.perf_counter.side_effect = [0, 1, 2]
+        mock_time.process_time.side_effect = [0, 1]
+        timer = StageTimer()
+
+        def fails():
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            timer.wrap('stage', fails)()
+        self.assertEqual(timer.stages, {'stage': [1, 1]})
+
+    def test_iterate(self, mock_time):
+        mock_time.perf_counter.side_effect = [1, 2, 3, 5, 6, 9]
+        mock_time.process_time.side_effect = [0, 1, 1, 2, 2, 3]
+        timer = StageTimer()
+
+        self.assertEqual(list(timer.iterate('read', ['a', 'b'])), ['a', 'b'])
+        self.assertEqual(timer.stages, {'read': [1 + 2 + 3, 3]})
+
+    def test_summary(self, mock_time):
+        mock_time.perf_counter.side_effect = [0, 4]
+        timer = StageTimer()
+        timer.stages['convert'] = [1.23456, 1.0]
+        timer.start()
+
+        self.assertEqual(timer.summary(10), {
+            'stages': {'convert': {'wall': 1.235, 'cpu': 1.0}},
+            'duration': 4,
+            'rows_per_second': 2.5,
+        })
+
+        # The duration of an import that has not started is not measured
+        self.assertEqual(StageTimer().summary(10), {'stages': {}, 'duration': 0, 'rows_per_second': 0})
+
+    def test_disabled(self, mock_time):
+        timer = StageTimer(enabled=False)
+        func, rows = lambda x: x, ['a', 'b']
+
+        # The stages are not timed
+        self.assertIs(timer.wrap('stage', func), func)
+        self.assertIs(timer.iterate('read', rows), rows)
+        self.assertEqual(timer.stages, {})
+        mock_time.perf_counter.assert_not_called()
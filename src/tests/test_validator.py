@@ -4,8 +4,11 @@ from unittest import mock
 from gobcore.exceptions import GOBException
 from gobcore.logging.logger import Logger
 
+from gobcore.quality.issue import QA_CHECK
+from shapely.geometry import Point, Polygon
+
 from gobimport.import_client import ImportClient
-from gobimport.validator import Validator
+from gobimport.validator import Validator, coordinate_bounds
 
 from tests import fixtures
 
@@ -14,8 +17,8 @@ from tests import fixtures
 @mock.patch("gobcore.logging.logger.logger.info", mock.MagicMock())
 @mock.patch("gobcore.logging.logger.logger.warning", mock.MagicMock())
 @mock.patch("gobcore.logging.logger.logger.error", mock.MagicMock())
-@mock.patch("gobimport.validator.log_issue", mock.MagicMock())
-@mock.patch("gobimport.validator.GOBModel", mock.MagicMock())
+@mock.patch("gobimport.validator.add_issue", mock.MagicMock())
+@mock.patch("gobimport.validator.get_collection", mock.MagicMock())
 class TestValidator(unittest.TestCase):
 
     def setUp(self):
@@ -169,3 +172,116 @@ class TestValidator(unittest.TestCase):
 
         # Make sure the publiceerbaar has been listed as invalid
         self.assertEqual(validator.collection_qa['num_invalid_publiceerbaar'], 0)
+
+    def test_check_quality(self):
+        validator = Validator('source_app', 'meetbouten', 'meetbouten', self.mock_input_spec)
+        entity = self.invalid_meetbouten[0]
+        failures = validator.check_quality(entity)
+
+        # Checking the quality has no side effects
+        self.assertIn('status.code', [attr for check, level, attr in failures])
+        self.assertEqual(validator.collection_qa['num_invalid_status.code'], 0)
+
+        # Failures can be passed to validate, the checks are then not run again
+        validator.check_quality = mock.MagicMock()
+        validator.validate(entity, failures)
+        validator.check_quality.assert_not_called()
+        self.assertEqual(validator.collection_qa['num_invalid_status.code'], 1)
+
+    def test_compile_checks(self):
+        checks = {
+            "any attr": [
+                {"type": "boolean", "level": "any level"},
+                {"type": "boolean", "level": "any level", "source_app": "other app"},
+            ],
+            "any.nested.attr": [
+                {"type": "regex", "pattern": "^[0-9]+$", "level": "any level"},
+            ]
+        }
+        with mock.patch.dict("gobimport.validator.ENTITY_CHECKS", {"any catalogue": {"any entity": checks}}):
+            validator = Validator('source_app', 'any catalogue', 'any entity', self.mock_input_spec)
+
+        # The checks for other source apps are skipped
+        self.assertEqual(len(validator.checks), 2)
+
+        entity = {"any attr": True, "any": {"nested": {"attr": "123"}}}
+        self.assertEqual(validator.check_quality(entity), [])
+
+        entity = {"any attr": "true", "any": {"nested": {}}}
+        self.assertEqual(validator.check_quality(entity), [
+            (checks["any attr"][0], "any level", "any attr"),
+            (QA_CHECK.Attribute_exists, "any level", "any.nested.attr"),
+        ])
+
+    def test_sampled_checks(self):
+        checks = {
+            "any attr": [
+                {"type": "boolean", "level": "fatal"},
+                {"type": "boolean", "level": "warning"},
+            ],
+        }
+        sample = mock.MagicMock(active=True)
+        with mock.patch.dict("gobimport.validator.ENTITY_CHECKS", {"any catalogue": {"any entity": checks}}):
+            validator = Validator('source_app', 'any catalogue', 'any entity', self.mock_input_spec, sample)
+            self.assertEqual(len(validator.checks), 1)
+            self.assertEqual(len(validator.sampled_checks), 1)
+
+        # Warning checks only run on entities in the sample
+        entity = {"_source_id": "any id", "any attr": "true"}
+        self.assertEqual(validator.check_quality(entity, False), [(checks["any attr"][0], "fatal", "any attr")])
+        self.assertEqual(len(validator.check_quality(entity, True)), 2)
+
+        sample.includes.return_value = False
+        self.assertEqual(len(validator.check_quality(entity)), 1)
+
+        # The sample counts the validated entities, issues of the warning checks are marked as sampled
+        sample.count.return_value = True
+        with mock.patch("gobimport.validator.add_issue") as mock_add_issue:
+            validator.validate(entity)
+        sample.count.assert_called_once_with(entity)
+        self.assertEqual([kwargs['sampled'] for _, kwargs in mock_add_issue.call_args_list], [False, True])
+
+    def test_validate_functions(self):
+        validator = Validator('source_app', 'meetbouten', 'meetbouten', self.mock_input_spec)
+
+        is_boolean = validator.validate_functions['boolean']({})
+        self.assertTrue(is_boolean(False))
+        self.assertFalse(is_boolean(None))
+        self.assertTrue(validator.validate_functions['boolean']({'allow_null': True})(None))
+
+        regex = validator.validate_functions['regex']({'pattern': '^[0-9]{2}$'})
+        self.assertTrue(regex(12))
+        self.assertFalse(regex("123"))
+        self.assertFalse(regex(None))
+        self.assertTrue(validator.validate_functions['regex']({'pattern': 'any', 'allow_null': True})(None))
+
+        between = validator.validate_functions['between']({'values': [6, 15]})
+        self.assertTrue(between("6.0"))
+        self.assertFalse(between(15.1))
+        self.assertFalse(between(None))
+
+        geometry = validator.validate_functions['geometry']({'values': {
+            'x': {'min': 100.0, 'max': 200.0},
+            'y': {'min': 400.0, 'max': 500.0},
+        }})
+        self.assertTrue(geometry("POINT (150.0 450.0)"))
+        self.assertFalse(geometry("POINT (450.0 150.0)"))
+        self.assertTrue(geometry("POLYGON ((100.0 400.0, 200.0 400.0, 200.0 500.0, 100.0 400.0))"))
+        self.assertFalse(geometry("POLYGON ((100.0 400.0, 200.0 400.0, 200.0 500.1, 100.0 400.0))"))
+        self.assertTrue(geometry("MULTIPOINT ((150 450), (160 460))"))
+        self.assertFalse(geometry("POINT (-150.0 450.0)"))
+        self.assertTrue(geometry("POINT EMPTY"))
+        self.assertTrue(geometry(Point(150, 450)))
+        self.assertFalse(geometry(Point(150, 550)))
+
+    def test_coordinate_bounds(self):
+        self.assertEqual(coordinate_bounds("POINT (1.0 2.0)"), [(1.0, 1.0), (2.0, 2.0)])
+        self.assertEqual(coordinate_bounds("LINESTRING (1 4, 3 2, 2 3)"), [(1.0, 3.0), (2.0, 4.0)])
+        self.assertEqual(coordinate_bounds("POLYGON EMPTY"), [])
+
+        # Geometry collections are scanned for decimal coordinates
+        self.assertEqual(coordinate_bounds("GEOMETRYCOLLECTION (POINT (1.0 4.0), POINT (3.0 2.0))"),
+                         [(1.0, 3.0), (2.0, 4.0)])
+
+        self.assertEqual(coordinate_bounds(Polygon([(1, 4), (3, 2), (2, 3)])), [(1.0, 3.0), (2.0, 4.0)])
+        self.assertEqual(coordinate_bounds(Polygon()), [])
@@ -0,0 +1,156 @@
+import datetime
+import io
+import json
+import os
+import threading
+import unittest
+
+from unittest.mock import MagicMock
+
+from gobcore.message_broker.offline_contents import ContentsWriter
+
+from gobimport.writer import BufferedWriter, FileContentsWriter
+
+
+class MockWriter:
+
+    def __init__(self):
+        self.file = MagicMock(wraps=io.StringIO())
+        self.empty = True
+        self.threads = {'serialize': set(), 'write': set()}
+
+    def serialize(self, entity):
+        self.threads['serialize'].add(threading.current_thread())
+        return json.dumps(entity)
+
+    def write_serialized(self, items):
+        self.threads['write'].add(threading.current_thread())
+        if any('fail' in item for item in items):
+            raise OSError("Write failed")
+        self.file.write(("" if self.empty else ",\n") + ",\n".join(items))
+        self.empty = False
+
+    def write(self, entity):
+        self.write_serialized([self.serialize(entity)])
+
+    def flush(self):
+        pass
+
+    def position(self):
+        return self.file.tell()
+
+    def contents(self):
+        return self.file.getvalue()
+
+
+class TestFileContentsWriter(unittest.TestCase):
+
+    def test_write(self):
+        with FileContentsWriter() as writer:
+            writer.write({'id': 1, 'date': datetime.date(2020, 1, 31)})
+            writer.write_serialized([])
+            writer.write_serialized([writer.serialize({'id': 2}), writer.serialize({'id': 3})])
+            writer.flush()
+
+        with open(writer.filename) as file:
+            self.assertEqual(json.load(file), [{'id': 1, 'date': '2020-01-31'}, {'id': 2}, {'id': 3}])
+        os.remove(writer.filename)
+
+        with FileContentsWriter() as writer:
+            pass
+
+        with open(writer.filename) as file:
+            self.assertEqual(json.load(file), [])
+        os.remove(writer.filename)
+
+    def test_gobcore_format(self):
+        # The contents are written exactly as the gobcore contents writer writes them
+        for entities in [[], [{'id': 1}], [{'id': 1, 'date': datetime.date(2020, 1, 31), 'naam': 'é'}, {'id': 2}]]:
+            contents = []
+            for writer in [ContentsWriter(), FileContentsWriter()]:
+                with writer:
+                    for entity in entities:
+                        writer.write(entity)
+                with open(writer.filename) as file:
+                    contents.append(file.read())
+                os.remove(writer.filename)
+            self.assertEqual(contents[0], contents[1])
+
+
+class TestBufferedWriter(unittest.TestCase):
+
+    def test_write(self):
+        entities = [{'id': i} for i in range(25)]
+
+        expected = MockWriter()
+        for entity in entities:
+            expected.write(entity)
+
+        writer = MockWriter()
+        with BufferedWriter(writer, batch_size=10) as buffered_writer:
+            for entity in entities:
+                buffered_writer.write(entity)
+
+        self.assertEqual(writer.contents(), expected.contents())
+        # The entities are serialized on the calling thread and written per batch on the background thread
+        self.assertEqual(writer.threads, {'serialize': {threading.current_thread()}, 'write': {buffered_writer.thread}})
+        self.assertEqual(writer.file.write.call_count, 3)
+        self.assertFalse(buffered_writer.thread.is_alive())
+
+    def test_write_changed_entity(self):
+        # An entity can be changed after it has been written
+        writer = MockWriter()
+        entity = {'id': 1}
+        with BufferedWriter(writer) as buffered_writer:
+            buffered_writer.write(entity)
+            entity['id'] = 2
+
+        self.assertEqual(writer.contents(), '{"id": 1}')
+
+    def test_flush(self):
+        writer = MockWriter()
+        buffered_writer = BufferedWriter(writer, batch_size=10)
+        buffered_writer.write({'id': 1})
+        self.assertEqual(writer.contents(), "")
+
+        buffered_writer.flush()
+        self.assertEqual(writer.contents(), '{"id": 1}')
+
+        buffered_writer.write({'id': 2})
+        self.assertEqual(buffered_writer.position(), len('{"id": 1},\n{"id": 2}'))
+        buffered_writer.close()
+
+    def test_bounded(self):
+        buffered_writer = BufferedWriter(MockWriter(), batch_size=10, queue_size=2)
+        self.assertEqual(buffered_writer.batches.maxsize, 2)
+        buffered_writer.close()
+
+    def test_write_error(self):
+        writer = MockWriter()
+        buffered_writer = BufferedWriter(writer, batch_size=2)
+        buffered_writer.write({'id': 1, 'fail': True})
+        buffered_writer.write({'id': 2})
+
+        with self.assertRaisesRegex(OSError, "Write failed"):
+            buffered_writer.flush()
+
+        # The error is raised on every next write
+        with self.assertRaises(OSError):
+            buffered_writer.write({'id': 3})
+            buffered_writer.write({'id': 4})
+
+        with self.assertRaises(OSError):
+            buffered_writer.close()
+        self.assertFalse(buffered_writer.thread.is_alive())
+        self.assertEqual(writer.contents(), "")
+
+    def test_write_error_on_close(self):
+        with self.assertRaises(OSError):
+            with BufferedWriter(MockWriter()) as buffered_writer:
+                buffered_writer.write({'id': 1, 'fail': True})
+
+        # An exception in the import is raised instead of the write error
+        with self.assertRaisesRegex(ValueError, "Import failed"):
+            with BufferedWriter(MockWriter()) as buffered_writer:
+                buffered_writer.write({'id': 1, 'fail': True})
+                raise ValueError("Import failed")